@@ -9,25 +9,42 @@ Zona 4: Um único ponto de roteamento por intenção classificada.
 Nenhum agente é chamado diretamente de fora do roteador.
 
 Zona 6: Nó finalize executa obrigatoriamente ao final de TODOS os caminhos:
-  1. Deletar intent:{phone} do Redis (limpeza de estado)
-  2. Persistir no PostgreSQL
-  3. Salvar no histórico genérico Redis
-  4. Enviar resposta via WhatsApp
+  1. Enfileirar a resposta na fila de saída WhatsApp (exceto se o agente já a
+     entregou em streaming — agent_utils.invoke_llm)
+  2. Em paralelo ao envio, cada passo isolado:
+     - Deletar intent:{phone} do Redis (limpeza de estado)
+     - Salvar no histórico genérico Redis
+     - Persistir no PostgreSQL
 """
 
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Tuple
+
 from loguru import logger
 from langgraph.graph import StateGraph, END
-
-from app.agents.nodes.intent_node import identify_intent
-from app.agents.nodes.greeting_agent import greeting_agent
-from app.agents.nodes.scheduling_agent import scheduling_agent
-from app.agents.nodes.qualification_agent import qualification_agent
-from app.agents.nodes.documentation_agent import documentation_agent
-from app.agents.nodes.escalation_node import check_escalation, execute_escalation
+from langgraph.utils import RunnableCallable
+
+from app.agents.nodes.intent_node import identify_intent, aidentify_intent
+from app.agents.nodes.greeting_agent import greeting_agent, agreeting_agent
+from app.agents.nodes.scheduling_agent import scheduling_agent, ascheduling_agent
+from app.agents.nodes.qualification_agent import qualification_agent, aqualification_agent
+from app.agents.nodes.documentation_agent import documentation_agent, adocumentation_agent
+from app.agents.nodes.escalation_node import (
+    aexecute_escalation,
+    check_escalation,
+    execute_escalation,
+)
 from app.agents.nodes.unknown_agent import unknown_agent
+from app.agents.nodes.rag_node import search_rag, asearch_rag
 from app.services import memory_service, whatsapp_service
 from app.models.schemas import AgentState, Intent
-from app.core.redis_client import redis_client
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_client import redis_client, async_redis_client
 
 
 # ---------------------------------------------------------------------------
@@ -56,83 +73,236 @@ def _route_after_escalation_check(state: dict) -> str:
 
 # ---------------------------------------------------------------------------
 # Zona 6 — Finalização explícita
+# O envio da resposta sai primeiro; a contabilidade (Redis/Postgres) roda em
+# paralelo, cada passo isolado — a falha de um não impede os demais nem o envio.
 # ---------------------------------------------------------------------------
 
+_FALLBACK_REPLY = "Hmm, não consegui processar sua mensagem agora. Pode tentar novamente? 😊"
+
+# Cada turno em andamento submete 3 passos: com menos threads, um turno espera
+# a contabilidade dos outros e estoura _BOOKKEEPING_TIMEOUT sem motivo
+_bookkeeping_executor = ThreadPoolExecutor(
+    max_workers=max(settings.FINALIZE_BOOKKEEPING_WORKERS, settings.DEBOUNCE_WORKER_CONCURRENCY),
+    thread_name_prefix="finalize",
+)
+_BOOKKEEPING_TIMEOUT = 10  # segundos
+
+
+def _timed_step(phone: str, step: str, fn, *args) -> Tuple[str, float]:
+    """Executa um passo do finalize isolando falhas. Retorna (passo, duração em ms)."""
+    start = time.perf_counter()
+    try:
+        fn(*args)
+    except Exception as e:
+        logger.error(f"finalize: erro em {step} | phone={phone} | {e}")
+        metrics.inc("finalize_step_errors_total", step=step)
+    elapsed = time.perf_counter() - start
+    metrics.observe("finalize_step_seconds", elapsed, step=step)
+    return step, elapsed * 1000
+
+
+async def _atimed_step(phone: str, step: str, coro) -> Tuple[str, float]:
+    """Versão asyncio de _timed_step."""
+    start = time.perf_counter()
+    try:
+        await coro
+    except Exception as e:
+        logger.error(f"finalize: erro em {step} | phone={phone} | {e}")
+        metrics.inc("finalize_step_errors_total", step=step)
+    elapsed = time.perf_counter() - start
+    metrics.observe("finalize_step_seconds", elapsed, step=step)
+    return step, elapsed * 1000
+
+
+def _log_breakdown(phone: str, intent: str, timings: list) -> None:
+    breakdown = " | ".join(f"{step}={ms:.0f}ms" for step, ms in timings)
+    logger.info(f"Ciclo concluído | phone={phone} | intent={intent} | {breakdown}")
+
+
+def _intent_source(state: dict) -> str | None:
+    """Camada que classificou a intenção (rótulo de origem para treino do modelo local)."""
+    return (state.get("classified_intent") or {}).get("camada")
+
+
 def finalize(state: dict) -> dict:
     """
     Zona 6 — Executado ao final de TODOS os caminhos do grafo.
-    1. Deleta intent:{phone} do Redis
-    2. Persiste no PostgreSQL
-    3. Salva no histórico genérico Redis
-    4. Envia resposta via WhatsApp
+    1. Enfileira a resposta na fila de saída WhatsApp (outbound_worker), salvo
+       quando o agente já a entregou em streaming
+    2. Em paralelo: deleta intent:{phone}, salva o turno no histórico genérico
+       Redis e persiste no PostgreSQL
     """
     phone = state["phone"]
     phone_jid = state.get("phone_jid", "")
     message = state.get("message", "")
     intent = state.get("intent", Intent.indefinido.value)
-    response = state.get("response") or (
-        "Hmm, não consegui processar sua mensagem agora. Pode tentar novamente? 😊"
-    )
-
-    # 1. Limpar cache de intenção
-    cache_key = f"intent:{phone}"
-    redis_client.delete(cache_key)
-    logger.debug(f"intent:{phone} deletado do Redis")
+    response = state.get("response") or _FALLBACK_REPLY
+
+    bookkeeping = [
+        _bookkeeping_executor.submit(
+            _timed_step, phone, "intent_cache", redis_client.delete, f"intent:{phone}"
+        ),
+        _bookkeeping_executor.submit(
+            _timed_step, phone, "session", memory_service.save_turn, phone, message, response
+        ),
+        _bookkeeping_executor.submit(
+            _timed_step, phone, "persist",
+            memory_service.persist_conversation,
+            phone, message, response, intent, _intent_source(state),
+        ),
+    ]
+
+    timings = []
+    if not state.get("response_streamed"):
+        timings.append(
+            _timed_step(phone, "send", whatsapp_service.queue_message, phone_jid, response)
+        )
+    done, not_done = wait(bookkeeping, timeout=_BOOKKEEPING_TIMEOUT)
+    timings += [f.result() for f in bookkeeping if f in done]
+    if not_done:
+        logger.warning(f"finalize: {len(not_done)} passo(s) ainda em andamento | phone={phone}")
+
+    _log_breakdown(phone, intent, timings)
+    state["response"] = response
+    return state
 
-    # 2. Persistir no PostgreSQL
-    try:
-        memory_service.save_message(phone, "user", message)
-        memory_service.save_message(phone, "assistant", response)
-        memory_service.persist_conversation(phone, message, response, intent)
-    except Exception as e:
-        logger.error(f"finalize: erro ao persistir | phone={phone} | {e}")
 
-    # 3. Enviar resposta via WhatsApp
-    try:
-        whatsapp_service.send_message(phone_jid, response)
-        logger.info(f"Ciclo concluído | phone={phone} | intent={intent}")
-    except Exception as e:
-        logger.error(f"finalize: erro ao enviar mensagem | phone={phone} | {e}")
+async def afinalize(state: dict) -> dict:
+    """Versão asyncio de finalize — envio e contabilidade concorrentes via gather."""
+    phone = state["phone"]
+    phone_jid = state.get("phone_jid", "")
+    message = state.get("message", "")
+    intent = state.get("intent", Intent.indefinido.value)
+    response = state.get("response") or _FALLBACK_REPLY
+
+    steps = []
+    if not state.get("response_streamed"):
+        steps.append(
+            _atimed_step(phone, "send", whatsapp_service.aqueue_message(phone_jid, response))
+        )
+    timings = await asyncio.gather(
+        *steps,
+        _atimed_step(phone, "intent_cache", async_redis_client.delete(f"intent:{phone}")),
+        _atimed_step(phone, "session", memory_service.asave_turn(phone, message, response)),
+        _atimed_step(
+            phone, "persist",
+            memory_service.apersist_conversation(
+                phone, message, response, intent, _intent_source(state)
+            ),
+        ),
+    )
 
+    _log_breakdown(phone, intent, timings)
     state["response"] = response
     return state
 
 
 # ---------------------------------------------------------------------------
 # Construção e compilação do grafo
+# Cada nó recebe a implementação síncrona e a asyncio: o mesmo grafo compilado
+# atende invoke() (modo thread) e ainvoke() (modo async). Nós sem I/O rodam
+# inline no event loop, sem passar pelo executor de threads.
+# Toda execução de nó (e de roteador) observa graph_node_seconds{node, intent};
+# exceções que escapam do nó contam em graph_node_errors_total.
 # ---------------------------------------------------------------------------
 
-def _build_graph() -> StateGraph:
-    """Constrói e compila o grafo LangGraph com roteador central explícito."""
+def _intent_label(state: dict, result) -> str:
+    # O nó de intenção só conhece a intenção depois de rodar
+    source = result if isinstance(result, dict) else state
+    return source.get("intent") or "none"
+
+
+def _timed_node(func):
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(state):
+        start, result = time.perf_counter(), None
+        try:
+            result = func(state)
+            return result
+        except Exception:
+            metrics.inc("graph_node_errors_total", node=name)
+            raise
+        finally:
+            metrics.observe(
+                "graph_node_seconds", time.perf_counter() - start,
+                node=name, intent=_intent_label(state, result),
+            )
+
+    return wrapper
+
+
+def _atimed_node(afunc, name: str):
+    @functools.wraps(afunc)
+    async def wrapper(state):
+        start, result = time.perf_counter(), None
+        try:
+            result = await afunc(state)
+            return result
+        except Exception:
+            metrics.inc("graph_node_errors_total", node=name)
+            raise
+        finally:
+            metrics.observe(
+                "graph_node_seconds", time.perf_counter() - start,
+                node=name, intent=_intent_label(state, result),
+            )
+
+    return wrapper
+
+
+def _node(func, afunc=None) -> RunnableCallable:
+    name = func.__name__
+    return RunnableCallable(
+        _timed_node(func),
+        _atimed_node(afunc, name) if afunc is not None else None,
+        name=name,
+        trace=False,
+    )
+
+
+def _build_graph(with_rag: bool = False):
+    """
+    Constrói e compila o grafo LangGraph com roteador central explícito.
+    with_rag=True insere o nó search_rag entre a classificação e o roteador.
+    """
     graph = StateGraph(dict)
 
     # Zona 3 — Classificação
-    graph.add_node("intent", identify_intent)
+    graph.add_node("intent", _node(identify_intent, aidentify_intent))
 
     # Zona 4 — Roteamento
     # (sem nó próprio — implementado como conditional_edges a partir de intent)
 
     # Zona 5 — Agentes especializados
-    graph.add_node("greeting",          greeting_agent)
-    graph.add_node("scheduling",        scheduling_agent)
-    graph.add_node("qualification",     qualification_agent)
-    graph.add_node("documentation",     documentation_agent)
-    graph.add_node("check_escalation",  check_escalation)
-    graph.add_node("escalate",          execute_escalation)
-    graph.add_node("unknown",           unknown_agent)
-
-    # RAG (desabilitado — mantido no grafo caso seja reativado)
+    graph.add_node("greeting",          _node(greeting_agent, agreeting_agent))
+    graph.add_node("scheduling",        _node(scheduling_agent, ascheduling_agent))
+    graph.add_node("qualification",     _node(qualification_agent, aqualification_agent))
+    graph.add_node("documentation",     _node(documentation_agent, adocumentation_agent))
+    graph.add_node("check_escalation",  _node(check_escalation))
+    graph.add_node("escalate",          _node(execute_escalation, aexecute_escalation))
+    graph.add_node("unknown",           _node(unknown_agent))
+
+    # RAG (variante opcional — ativada por settings.RAG_ENABLED)
+    if with_rag:
+        graph.add_node("rag", _node(search_rag, asearch_rag))
 
     # Zona 6 — Finalização
-    graph.add_node("finalize", finalize)
+    graph.add_node("finalize", _node(finalize, afinalize))
 
     # --- Entry point ---
     graph.set_entry_point("intent")
 
     # --- Roteador central (Zona 4) ---
+    router_source = "intent"
+    if with_rag:
+        graph.add_edge("intent", "rag")
+        router_source = "rag"
+
     graph.add_conditional_edges(
-        "intent",
-        _route_by_intent,
+        router_source,
+        _node(_route_by_intent),
         {
             "greeting":         "greeting",
             "scheduling":       "scheduling",
@@ -146,7 +316,7 @@ def _build_graph() -> StateGraph:
     # Escalação: check → escalate ou unknown (fallback)
     graph.add_conditional_edges(
         "check_escalation",
-        _route_after_escalation_check,
+        _node(_route_after_escalation_check),
         {"escalate": "escalate", "unknown": "unknown"},
     )
 
@@ -160,10 +330,91 @@ def _build_graph() -> StateGraph:
     return graph.compile()
 
 
+# ---------------------------------------------------------------------------
+# Registro de grafos compilados
+# O grafo é imutável após compile() e pode ser invocado concorrentemente por
+# várias threads — compila-se uma única vez por variante e reutiliza-se.
+# ---------------------------------------------------------------------------
+
+GRAPH_VARIANTS = {
+    "default": {"with_rag": False},
+    "rag":     {"with_rag": True},
+}
+
+_compiled_graphs: dict = {}
+_graphs_lock = threading.Lock()
+
+
+def get_graph(variant: str = "default"):
+    """Retorna o grafo compilado da variante, compilando sob lock na primeira chamada."""
+    compiled = _compiled_graphs.get(variant)
+    if compiled is not None:
+        return compiled
+
+    with _graphs_lock:
+        compiled = _compiled_graphs.get(variant)
+        if compiled is None:
+            start = time.perf_counter()
+            compiled = _build_graph(**GRAPH_VARIANTS[variant])
+            _compiled_graphs[variant] = compiled
+            logger.info(
+                f"Grafo compilado | variante={variant} "
+                f"| {(time.perf_counter() - start) * 1000:.1f}ms"
+            )
+    return compiled
+
+
+def warm_up_graphs() -> None:
+    """Compila todas as variantes do grafo no startup da aplicação."""
+    start = time.perf_counter()
+    for variant in GRAPH_VARIANTS:
+        get_graph(variant)
+    logger.info(
+        f"Registro de grafos pronto | variantes={len(GRAPH_VARIANTS)} "
+        f"| {(time.perf_counter() - start) * 1000:.1f}ms"
+    )
+
+
+def _active_variant() -> str:
+    return "rag" if settings.RAG_ENABLED else "default"
+
+
 # ---------------------------------------------------------------------------
 # Ponto de entrada principal
 # ---------------------------------------------------------------------------
 
+def _initial_state(
+    phone: str,
+    phone_jid: str,
+    message: str,
+    name: str,
+    message_id: str,
+    history: list,
+) -> AgentState:
+    return {
+        "phone": phone,
+        "phone_jid": phone_jid,
+        "name": name,
+        "message": message,
+        "message_id": message_id,
+        "intent": None,
+        "classified_intent": None,
+        "rag_context": None,
+        "history": history,
+        "response": None,
+        "streamed_parts": 0,
+        "response_streamed": False,
+        "should_escalate": False,
+        "should_send_email": False,
+    }
+
+
+_ERROR_REPLY = (
+    "Desculpe, tive um problema técnico agora. 😊 "
+    "Pode tentar novamente em instantes?"
+)
+
+
 def run_agent(
     phone: str,
     phone_jid: str,
@@ -177,34 +428,36 @@ def run_agent(
     """
     try:
         history = memory_service.get_history(phone)
-
-        initial_state: AgentState = {
-            "phone": phone,
-            "phone_jid": phone_jid,
-            "name": name,
-            "message": message,
-            "message_id": message_id,
-            "intent": None,
-            "classified_intent": None,
-            "rag_context": None,
-            "history": history,
-            "response": None,
-            "should_escalate": False,
-            "should_send_email": False,
-        }
-
-        compiled_graph = _build_graph()
-        compiled_graph.invoke(initial_state)
+        initial_state = _initial_state(phone, phone_jid, message, name, message_id, history)
+        get_graph(_active_variant()).invoke(initial_state)
 
     except Exception as e:
         logger.critical(f"run_agent CRÍTICO | phone={phone} | {e}")
         # Garantir limpeza de estado mesmo em falha catastrófica
         redis_client.delete(f"intent:{phone}")
         try:
-            whatsapp_service.send_message(
-                phone_jid,
-                "Desculpe, tive um problema técnico agora. 😊 "
-                "Pode tentar novamente em instantes?",
-            )
+            whatsapp_service.queue_message(phone_jid, _ERROR_REPLY)
+        except Exception:
+            pass
+
+
+async def arun_agent(
+    phone: str,
+    phone_jid: str,
+    message: str,
+    name: str = "",
+    message_id: str = "",
+) -> None:
+    """Versão asyncio de run_agent — executa o grafo com ainvoke no event loop."""
+    try:
+        history = await memory_service.aget_history(phone)
+        initial_state = _initial_state(phone, phone_jid, message, name, message_id, history)
+        await get_graph(_active_variant()).ainvoke(initial_state)
+
+    except Exception as e:
+        logger.critical(f"run_agent CRÍTICO | phone={phone} | {e}")
+        try:
+            await async_redis_client.delete(f"intent:{phone}")
+            await whatsapp_service.aqueue_message(phone_jid, _ERROR_REPLY)
         except Exception:
             pass
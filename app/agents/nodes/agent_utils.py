@@ -0,0 +1,210 @@
+"""
+Utilitários compartilhados pelos agentes especializados da Zona 5.
+"""
+
+import re
+import time
+from typing import List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from loguru import logger
+
+from app.core import metrics
+from app.core.config import settings
+from app.services import response_cache, whatsapp_service
+
+
+def build_agent_messages(
+    system_prompt: str,
+    name: str,
+    history: List[dict],
+    message: str,
+    summary: Optional[str] = None,
+    rag_context: Optional[str] = None,
+) -> List[BaseMessage]:
+    """
+    Monta a lista de mensagens do agente: system prompt + trechos da base de
+    conhecimento (state['rag_context'], variante "rag" do grafo) + resumo das
+    mensagens antigas (se houver) + histórico isolado + mensagem atual.
+    """
+    name_hint = f"Nome do usuário: {name}\n" if name else ""
+    rag_messages = (
+        [SystemMessage(
+            content="Base de conhecimento (use apenas se for relevante para a pergunta; "
+                    f"nunca invente dados fora dela):\n{rag_context}"
+        )]
+        if rag_context else []
+    )
+    summary_messages = (
+        [SystemMessage(content=f"Resumo da conversa até aqui:\n{summary}")] if summary else []
+    )
+    return [
+        SystemMessage(content=name_hint + system_prompt),
+        *rag_messages,
+        *summary_messages,
+        *[
+            (HumanMessage if m["role"] == "user" else SystemMessage)(content=m["content"])
+            for m in history
+        ],
+        HumanMessage(content=message),
+    ]
+
+
+def lookup_cached_response(
+    agent_name: str,
+    system_prompt: str,
+    history: List[dict],
+    message: str,
+) -> Optional[str]:
+    """Consulta o cache de respostas — apenas em turnos sem histórico do agente."""
+    if history:
+        return None
+    return response_cache.lookup(agent_name, system_prompt, message)
+
+
+def store_cached_response(
+    agent_name: str,
+    system_prompt: str,
+    history: List[dict],
+    message: str,
+    response: str,
+    name: str,
+) -> None:
+    """Guarda a resposta do LLM no cache de respostas quando o turno não dependia de histórico."""
+    if not history:
+        response_cache.store(agent_name, system_prompt, message, response, name)
+
+
+# ---------------------------------------------------------------------------
+# Streaming com entrega parcial
+# Com STREAMING_REPLIES_ENABLED, a saída do LLM é consumida token a token e
+# cada frase/parágrafo completo entra na fila de saída do WhatsApp assim que
+# fica pronto (a fila preserva a ordem por número). O texto completo volta
+# para o agente e segue como um único turno no histórico e no PostgreSQL;
+# state["response_streamed"] (marcado já na primeira parte enviada) avisa o
+# finalize que o envio já foi feito e impede o fallback do agente. Se o stream
+# falhar depois de enviar alguma parte, o cliente recebe só uma continuação
+# curta (_INTERRUPTED_REPLY) e o erro sobe para o agente.
+# ---------------------------------------------------------------------------
+
+_INTERRUPTED_REPLY = "Desculpe, minha mensagem ficou incompleta. Pode me perguntar de novo? 😊"
+
+_BOUNDARY = re.compile(r"\n\s*\n|(?<=[.!?…])\s+")
+# Emojis/símbolos logo após o fim da frase ficam com ela ("Claro! 😊 Vou...")
+_TRAILING_SYMBOLS = re.compile(r"(?:[^\w\s\x00-\x7f]+\s*)+")
+
+
+def split_ready_parts(buffer: str, min_chars: int) -> Tuple[List[str], str]:
+    """
+    Separa do buffer as partes prontas para envio: frases terminadas (agrupadas
+    até min_chars) ou parágrafos. Uma parte só sai quando a próxima já começou.
+    Retorna (partes, restante).
+    """
+    parts: List[str] = []
+    start = 0
+    for match in _BOUNDARY.finditer(buffer):
+        cut = match.end()
+        symbols = _TRAILING_SYMBOLS.match(buffer, cut)
+        if symbols:
+            cut = symbols.end()
+        if cut >= len(buffer):
+            break
+        paragraph = "\n" in match.group()
+        part = buffer[start:cut].strip()
+        if part and (paragraph or len(part) >= min_chars):
+            parts.append(part)
+            start = cut
+    return parts, buffer[start:]
+
+
+def _streaming_target(state: dict) -> Optional[str]:
+    if not settings.STREAMING_REPLIES_ENABLED:
+        return None
+    return state.get("phone_jid") or None
+
+
+def _record_part(state: dict, started: float, sent: List[str], part: str) -> None:
+    if not sent:
+        metrics.observe("streaming_first_part_seconds", time.perf_counter() - started)
+    sent.append(part)
+    state["streamed_parts"] = len(sent)
+    state["response_streamed"] = True
+    metrics.inc("streaming_parts_total")
+
+
+def _interrupted(state: dict, sent: List[str], error: Exception) -> None:
+    # Histórico e PostgreSQL guardam o que o cliente de fato recebeu
+    state["response"] = "\n".join([*sent, _INTERRUPTED_REPLY])
+    metrics.inc("streaming_interrupted_total")
+    logger.error(
+        f"Streaming interrompido após {len(sent)} parte(s) | phone={state['phone']} | {error}"
+    )
+
+
+def set_fallback_response(state: dict, fallback: str) -> None:
+    """Fallback do agente em caso de erro — salvo se parte da resposta já foi entregue em streaming."""
+    if not state.get("response_streamed"):
+        state["response"] = fallback
+
+
+def invoke_llm(llm: BaseChatModel, messages: List[BaseMessage], state: dict) -> str:
+    """llm.invoke ou, no modo streaming, llm.stream com envio frase a frase. Retorna o texto completo."""
+    phone_jid = _streaming_target(state)
+    if phone_jid is None:
+        return llm.invoke(messages).content.strip()
+
+    started = time.perf_counter()
+    chunks: List[str] = []
+    sent: List[str] = []
+    buffer = ""
+    try:
+        for chunk in llm.stream(messages):
+            chunks.append(chunk.content)
+            buffer += chunk.content
+            parts, buffer = split_ready_parts(buffer, settings.STREAMING_MIN_CHARS)
+            for part in parts:
+                whatsapp_service.queue_message(phone_jid, part)
+                _record_part(state, started, sent, part)
+        if buffer.strip():
+            whatsapp_service.queue_message(phone_jid, buffer.strip())
+            _record_part(state, started, sent, buffer.strip())
+    except Exception as e:
+        if sent:
+            _interrupted(state, sent, e)
+            whatsapp_service.queue_message(phone_jid, _INTERRUPTED_REPLY)
+        raise
+
+    logger.info(f"Resposta entregue em streaming | phone={state['phone']} | partes={len(sent)}")
+    return "".join(chunks).strip()
+
+
+async def ainvoke_llm(llm: BaseChatModel, messages: List[BaseMessage], state: dict) -> str:
+    """Versão asyncio de invoke_llm (llm.astream / aqueue_message)."""
+    phone_jid = _streaming_target(state)
+    if phone_jid is None:
+        return (await llm.ainvoke(messages)).content.strip()
+
+    started = time.perf_counter()
+    chunks: List[str] = []
+    sent: List[str] = []
+    buffer = ""
+    try:
+        async for chunk in llm.astream(messages):
+            chunks.append(chunk.content)
+            buffer += chunk.content
+            parts, buffer = split_ready_parts(buffer, settings.STREAMING_MIN_CHARS)
+            for part in parts:
+                await whatsapp_service.aqueue_message(phone_jid, part)
+                _record_part(state, started, sent, part)
+        if buffer.strip():
+            await whatsapp_service.aqueue_message(phone_jid, buffer.strip())
+            _record_part(state, started, sent, buffer.strip())
+    except Exception as e:
+        if sent:
+            _interrupted(state, sent, e)
+            await whatsapp_service.aqueue_message(phone_jid, _INTERRUPTED_REPLY)
+        raise
+
+    logger.info(f"Resposta entregue em streaming | phone={state['phone']} | partes={len(sent)}")
+    return "".join(chunks).strip()
@@ -5,11 +5,23 @@ Responsabilidade: receber documentos e responder dúvidas sobre documentação.
 Redis: {phone}_documentacao | TTL: 600s | Janela: 10 mensagens
 """
 
-from langchain_core.messages import SystemMessage, HumanMessage
 from loguru import logger
 
-from app.services.ai_service import llm_flash
-from app.services.memory_service import get_agent_history, save_agent_message
+from app.agents.nodes.agent_utils import (
+    ainvoke_llm,
+    build_agent_messages,
+    invoke_llm,
+    lookup_cached_response,
+    set_fallback_response,
+    store_cached_response,
+)
+from app.services.ai_service import get_llm_flash
+from app.services.memory_service import (
+    aget_agent_history,
+    asave_agent_turn,
+    get_agent_history,
+    save_agent_turn,
+)
 
 AGENT_NAME = "documentacao"
 AGENT_TTL = 600
@@ -33,6 +45,13 @@ _SYSTEM_PROMPT = (
 )
 
 
+def _fallback_response(name: str) -> str:
+    return (
+        "Recebi sua mensagem! 📄 Se quiser enviar algum documento, "
+        "pode mandar aqui mesmo — estou por aqui para ajudar."
+    )
+
+
 def documentation_agent(state: dict) -> dict:
     """Zona 5 — Agente de documentação."""
     phone = state["phone"]
@@ -40,31 +59,54 @@ def documentation_agent(state: dict) -> dict:
 
     try:
         history = get_agent_history(phone, AGENT_NAME, MAX_HISTORY)
-        name_hint = f"Nome do usuário: {name}\n" if name else ""
+        response = lookup_cached_response(AGENT_NAME, _SYSTEM_PROMPT, history, state["message"])
+        if response is None:
+            messages = build_agent_messages(
+                _SYSTEM_PROMPT, name, history, state["message"],
+                rag_context=state.get("rag_context"),
+            )
+            response = invoke_llm(get_llm_flash(), messages, state)
+            store_cached_response(
+                AGENT_NAME, _SYSTEM_PROMPT, history, state["message"], response, name
+            )
 
-        messages = [
-            SystemMessage(content=name_hint + _SYSTEM_PROMPT),
-            *[
-                (HumanMessage if m["role"] == "user" else SystemMessage)(content=m["content"])
-                for m in history
-            ],
-            HumanMessage(content=state["message"]),
-        ]
+        save_agent_turn(phone, AGENT_NAME, state["message"], response, AGENT_TTL)
 
-        result = llm_flash.invoke(messages)
-        response = result.content.strip()
+        state["response"] = response
+        logger.info(f"Agente documentação respondeu | phone={phone}")
+
+    except Exception as e:
+        logger.error(f"documentation_agent error | phone={phone} | {e}")
+        set_fallback_response(state, _fallback_response(name))
+
+    return state
+
+
+async def adocumentation_agent(state: dict) -> dict:
+    """Versão asyncio de documentation_agent."""
+    phone = state["phone"]
+    name = state.get("name", "")
+
+    try:
+        history = await aget_agent_history(phone, AGENT_NAME, MAX_HISTORY)
+        response = lookup_cached_response(AGENT_NAME, _SYSTEM_PROMPT, history, state["message"])
+        if response is None:
+            messages = build_agent_messages(
+                _SYSTEM_PROMPT, name, history, state["message"],
+                rag_context=state.get("rag_context"),
+            )
+            response = await ainvoke_llm(get_llm_flash(), messages, state)
+            store_cached_response(
+                AGENT_NAME, _SYSTEM_PROMPT, history, state["message"], response, name
+            )
 
-        save_agent_message(phone, AGENT_NAME, "user", state["message"], AGENT_TTL)
-        save_agent_message(phone, AGENT_NAME, "assistant", response, AGENT_TTL)
+        await asave_agent_turn(phone, AGENT_NAME, state["message"], response, AGENT_TTL)
 
         state["response"] = response
         logger.info(f"Agente documentação respondeu | phone={phone}")
 
     except Exception as e:
         logger.error(f"documentation_agent error | phone={phone} | {e}")
-        state["response"] = (
-            "Recebi sua mensagem! 📄 Se quiser enviar algum documento, "
-            "pode mandar aqui mesmo — estou por aqui para ajudar."
-        )
+        set_fallback_response(state, _fallback_response(name))
 
     return state
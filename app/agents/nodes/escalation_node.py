@@ -6,34 +6,24 @@ Mantém lógica existente com linguagem humanizada.
 """
 
 from loguru import logger
-from app.services import escalation_service
+from app.services import escalation_rules, escalation_service
 from app.models.schemas import Intent
 
-ESCALATION_TRIGGERS = [
-    "falar com pessoa",
-    "atendente",
-    "humano",
-    "gerente",
-    "urgente",
-    "reclamação",
-    "corretor",
-]
-
 
 def check_escalation(state: dict) -> dict:
     """
     Zona 5 — Detecta se a mensagem exige escalação para humano.
-    Verifica triggers no texto e a intenção classificada.
+    Verifica a intenção classificada e as regras de escalação (escalation_rules).
     """
-    message_lower = state["message"].lower()
     intent_is_escalation = state.get("intent") == Intent.atendimento_humano.value
-    trigger_found = any(trigger in message_lower for trigger in ESCALATION_TRIGGERS)
+    evaluation = escalation_rules.evaluate(state["message"])
 
-    if intent_is_escalation or trigger_found:
+    if intent_is_escalation or evaluation.escalate:
         state["should_escalate"] = True
         logger.info(
             f"Escalação ativada | phone={state['phone']} "
-            f"| intent={state.get('intent')} | trigger={trigger_found}"
+            f"| intent={state.get('intent')} | trigger={evaluation.escalate} "
+            f"| score={evaluation.score:.2f} | regras={evaluation.matched}"
         )
     else:
         state["should_escalate"] = False
@@ -54,10 +44,28 @@ def execute_escalation(state: dict) -> dict:
     except Exception as e:
         logger.error(f"execute_escalation error | phone={state['phone']} | {e}")
 
-    name = state.get("name", "")
+    state["response"] = _escalation_response(state.get("name", ""))
+    return state
+
+
+async def aexecute_escalation(state: dict) -> dict:
+    """Versão asyncio de execute_escalation."""
+    try:
+        await escalation_service.atrigger_escalation(
+            phone=state["phone"],
+            name=state.get("name", ""),
+            last_message=state["message"],
+        )
+    except Exception as e:
+        logger.error(f"execute_escalation error | phone={state['phone']} | {e}")
+
+    state["response"] = _escalation_response(state.get("name", ""))
+    return state
+
+
+def _escalation_response(name: str) -> str:
     name_txt = f", {name.split()[0]}" if name else ""
-    state["response"] = (
+    return (
         f"Claro{name_txt}! Vou chamar um dos nossos corretores agora. 🙏 "
         "Em breve alguém da equipe vai entrar em contato com você. Obrigada pela paciência!"
     )
-    return state
@@ -5,11 +5,21 @@ Responsabilidade: receber o usuário com acolhimento e direcionar para o próxim
 Redis: {phone}_cumprimento | TTL: 180s | Janela: 5 mensagens
 """
 
-from langchain_core.messages import SystemMessage, HumanMessage
 from loguru import logger
 
-from app.services.ai_service import llm_flash
-from app.services.memory_service import get_agent_history, save_agent_message
+from app.agents.nodes.agent_utils import (
+    ainvoke_llm,
+    build_agent_messages,
+    invoke_llm,
+    set_fallback_response,
+)
+from app.services.ai_service import get_llm_flash
+from app.services.memory_service import (
+    aget_agent_history,
+    asave_agent_turn,
+    get_agent_history,
+    save_agent_turn,
+)
 
 AGENT_NAME = "cumprimento"
 AGENT_TTL = 180
@@ -32,6 +42,13 @@ _SYSTEM_PROMPT = (
 )
 
 
+def _fallback_response(name: str) -> str:
+    return (
+        f"Oi{', ' + name if name else ''}! 😊 Tudo bem? Sou a Ana, corretora virtual. "
+        "Como posso te ajudar hoje?"
+    )
+
+
 def greeting_agent(state: dict) -> dict:
     """Zona 5 — Agente de cumprimento e abertura de atendimento."""
     phone = state["phone"]
@@ -39,31 +56,46 @@ def greeting_agent(state: dict) -> dict:
 
     try:
         history = get_agent_history(phone, AGENT_NAME, MAX_HISTORY)
-        name_hint = f"Nome do usuário: {name}\n" if name else ""
-
-        messages = [
-            SystemMessage(content=name_hint + _SYSTEM_PROMPT),
-            *[
-                (HumanMessage if m["role"] == "user" else SystemMessage)(content=m["content"])
-                for m in history
-            ],
-            HumanMessage(content=state["message"]),
-        ]
+        messages = build_agent_messages(
+            _SYSTEM_PROMPT, name, history, state["message"],
+            rag_context=state.get("rag_context"),
+        )
 
-        result = llm_flash.invoke(messages)
-        response = result.content.strip()
+        response = invoke_llm(get_llm_flash(), messages, state)
 
-        save_agent_message(phone, AGENT_NAME, "user", state["message"], AGENT_TTL)
-        save_agent_message(phone, AGENT_NAME, "assistant", response, AGENT_TTL)
+        save_agent_turn(phone, AGENT_NAME, state["message"], response, AGENT_TTL)
 
         state["response"] = response
         logger.info(f"Agente cumprimento respondeu | phone={phone}")
 
     except Exception as e:
         logger.error(f"greeting_agent error | phone={phone} | {e}")
-        state["response"] = (
-            f"Oi{', ' + name if name else ''}! 😊 Tudo bem? Sou a Ana, corretora virtual. "
-            "Como posso te ajudar hoje?"
+        set_fallback_response(state, _fallback_response(name))
+
+    return state
+
+
+async def agreeting_agent(state: dict) -> dict:
+    """Versão asyncio de greeting_agent."""
+    phone = state["phone"]
+    name = state.get("name", "")
+
+    try:
+        history = await aget_agent_history(phone, AGENT_NAME, MAX_HISTORY)
+        messages = build_agent_messages(
+            _SYSTEM_PROMPT, name, history, state["message"],
+            rag_context=state.get("rag_context"),
         )
 
+        response = await ainvoke_llm(get_llm_flash(), messages, state)
+
+        await asave_agent_turn(phone, AGENT_NAME, state["message"], response, AGENT_TTL)
+
+        state["response"] = response
+        logger.info(f"Agente cumprimento respondeu | phone={phone}")
+
+    except Exception as e:
+        logger.error(f"greeting_agent error | phone={phone} | {e}")
+        set_fallback_response(state, _fallback_response(name))
+
     return state
@@ -1,11 +1,16 @@
 """
-ZONA 3 — Classificação de intenção com cache de sessão Redis
+ZONA 3 — Classificação de intenção em cascata com cache de sessão Redis
 
 Fluxo:
-1. Verificar chave intent:{phone} no Redis — reusar se existir
-2. Classificar com gpt-4o-mini, saída JSON estruturada
-3. Salvar em intent:{phone} com TTL 60s
-4. Popular state["intent"] e state["classified_intent"]
+1. Camadas sem LLM (intent_rules): tabela exata, padrões e léxico sobre o
+   texto normalizado — casos inequívocos decididos em microssegundos;
+   depois o modelo local treinado com o histórico (intent_model), quando
+   a confiança calibrada é suficiente
+2. Verificar chave intent:{phone} no Redis — reusar se existir
+3. Classificar com gpt-4o-mini, saída JSON estruturada
+4. Salvar em intent:{phone} com TTL 60s
+5. Popular state["intent"] e state["classified_intent"]
+   (classified_intent["camada"] registra quem decidiu)
 """
 
 import json
@@ -13,9 +18,12 @@ import json
 from langchain_core.prompts import ChatPromptTemplate
 from loguru import logger
 
-from app.services.ai_service import llm_flash
+from app.agents.nodes.intent_rules import classify_fast
+from app.core import metrics, redis_cache
+from app.services import intent_model
+from app.services.ai_service import get_llm_flash
 from app.models.schemas import Intent, ClassifiedIntent
-from app.core.redis_client import redis_client
+from app.core.redis_client import redis_client, async_redis_client
 
 INTENT_CACHE_TTL = 60  # segundos
 
@@ -40,64 +48,129 @@ _prompt = ChatPromptTemplate.from_messages([
 _valid_intents = {i.value for i in Intent}
 
 
+def _apply_cached(state: dict, cached: str) -> bool:
+    """Popula o state a partir do cache Redis. Retorna False se o cache estiver corrompido."""
+    try:
+        data: ClassifiedIntent = json.loads(cached)
+        state["intent"] = data["intencao"]
+        state["classified_intent"] = data
+        logger.info(f"Intenção do cache Redis | {state['phone']} | {data['intencao']}")
+        return True
+    except Exception:
+        return False  # Cache corrompido — classificar normalmente
+
+
+def _parse_classification(raw: str) -> ClassifiedIntent:
+    """Converte a saída do LLM em ClassifiedIntent com intenção garantidamente válida."""
+    raw = raw.strip()
+
+    # Limpar markdown se houver (```json ... ```)
+    if raw.startswith("```"):
+        raw = raw.split("```")[1]
+        if raw.startswith("json"):
+            raw = raw[4:]
+
+    data: ClassifiedIntent = json.loads(raw)
+    intencao = data.get("intencao", "indefinido")
+
+    # Garantir que a intenção é válida
+    if intencao not in _valid_intents:
+        intencao = Intent.indefinido.value
+    data["intencao"] = intencao
+    data["camada"] = "llm"
+    return data
+
+
+def _apply_classification(state: dict, data: ClassifiedIntent) -> None:
+    state["intent"] = data["intencao"]
+    state["classified_intent"] = data
+    metrics.inc("intent_classifications_total", camada=data["camada"])
+    logger.info(
+        f"Intenção classificada | phone={state['phone']} | {data['intencao']} "
+        f"| confianca={data.get('confianca')} | camada={data['camada']}"
+    )
+
+
+def _apply_fallback(state: dict, error: Exception) -> None:
+    logger.error(f"identify_intent error | phone={state['phone']} | {error}")
+    fallback: ClassifiedIntent = {
+        "intencao": Intent.indefinido.value,
+        "confianca": "baixa",
+        "entidades": {},
+        "camada": "fallback",
+    }
+    metrics.inc("intent_classifications_total", camada="fallback")
+    state["intent"] = Intent.indefinido.value
+    state["classified_intent"] = fallback
+
+
+def _classify_local(message: str) -> ClassifiedIntent | None:
+    """Camadas sem I/O: regras e, se não decidirem, o modelo local."""
+    try:
+        return classify_fast(message) or intent_model.classify(message)
+    except Exception as e:
+        logger.error(f"Erro na classificação local | {e}")
+        return None
+
+
 def identify_intent(state: dict) -> dict:
     """
     Zona 3 — Nó LangGraph de classificação de intenção.
-    Verifica cache Redis antes de chamar o LLM.
+    Tenta as camadas sem LLM e o cache Redis antes de chamar o LLM.
     """
-    phone = state["phone"]
-    cache_key = f"intent:{phone}"
-
-    # 1. Tentar cache Redis
-    cached = redis_client.get(cache_key)
-    if cached:
-        try:
-            data: ClassifiedIntent = json.loads(cached)
-            state["intent"] = data["intencao"]
-            state["classified_intent"] = data
-            logger.info(f"Intenção do cache Redis | {phone} | {data['intencao']}")
-            return state
-        except Exception:
-            pass  # Cache corrompido — classificar normalmente
-
-    # 2. Classificar com LLM
+    # 1. Camadas sem LLM — sem I/O
+    fast = _classify_local(state["message"])
+    if fast:
+        _apply_classification(state, fast)
+        return state
+
+    cache_key = f"intent:{state['phone']}"
+
+    # 2. Tentar cache Redis (e o cache no cliente, se habilitado)
+    cached = redis_cache.cached_read(cache_key, "GET", lambda: redis_client.get(cache_key))
+    if cached and _apply_cached(state, cached):
+        return state
+
+    # 3. Classificar com LLM
     try:
-        chain = _prompt | llm_flash
+        chain = _prompt | get_llm_flash()
         result = chain.invoke({"message": state["message"]})
-        raw = result.content.strip()
+        data = _parse_classification(result.content)
 
-        # Limpar markdown se houver (```json ... ```)
-        if raw.startswith("```"):
-            raw = raw.split("```")[1]
-            if raw.startswith("json"):
-                raw = raw[4:]
+        # 4. Salvar no cache Redis com TTL 60s
+        redis_client.setex(cache_key, INTENT_CACHE_TTL, json.dumps(data))
+        _apply_classification(state, data)
 
-        data: ClassifiedIntent = json.loads(raw)
-        intencao = data.get("intencao", "indefinido")
+    except Exception as e:
+        _apply_fallback(state, e)
 
-        # Garantir que a intenção é válida
-        if intencao not in _valid_intents:
-            intencao = Intent.indefinido.value
-        data["intencao"] = intencao
+    return state
 
-        # 3. Salvar no cache Redis com TTL 60s
-        redis_client.setex(cache_key, INTENT_CACHE_TTL, json.dumps(data))
 
-        state["intent"] = intencao
-        state["classified_intent"] = data
-        logger.info(
-            f"Intenção classificada | phone={phone} | {intencao} "
-            f"| confianca={data.get('confianca')}"
-        )
+async def aidentify_intent(state: dict) -> dict:
+    """Versão asyncio de identify_intent (redis.asyncio + ainvoke)."""
+    fast = _classify_local(state["message"])
+    if fast:
+        _apply_classification(state, fast)
+        return state
+
+    cache_key = f"intent:{state['phone']}"
+
+    cached = await redis_cache.acached_read(
+        cache_key, "GET", lambda: async_redis_client.get(cache_key)
+    )
+    if cached and _apply_cached(state, cached):
+        return state
+
+    try:
+        chain = _prompt | get_llm_flash()
+        result = await chain.ainvoke({"message": state["message"]})
+        data = _parse_classification(result.content)
+
+        await async_redis_client.setex(cache_key, INTENT_CACHE_TTL, json.dumps(data))
+        _apply_classification(state, data)
 
     except Exception as e:
-        logger.error(f"identify_intent error | phone={phone} | {e}")
-        fallback: ClassifiedIntent = {
-            "intencao": Intent.indefinido.value,
-            "confianca": "baixa",
-            "entidades": {},
-        }
-        state["intent"] = Intent.indefinido.value
-        state["classified_intent"] = fallback
+        _apply_fallback(state, e)
 
     return state
@@ -0,0 +1,123 @@
+"""
+ZONA 3 — Camadas sem LLM da classificação de intenção
+
+Cascata aplicada sobre o texto normalizado (app.core.text.normalize):
+1. exata   → tabela das mensagens mais frequentes ("oi", "bom dia", ...)
+2. padrao  → expressões de saudação/despedida/pedido de corretor
+3. lexico  → pontuação por léxico de cada intenção; decide só quando uma
+             intenção domina e não há negação
+Qualquer caso ambíguo retorna None e segue para o LLM.
+"""
+
+import re
+from typing import Dict, Optional
+
+from app.core.text import normalize
+from app.models.schemas import ClassifiedIntent, Intent
+
+# Camada 1 — mensagens frequentes, já normalizadas
+_EXACT: Dict[str, str] = {
+    **dict.fromkeys(
+        (
+            "oi", "ola", "opa", "e ai", "eai", "oi tudo bem", "ola tudo bem", "oi tudo bom",
+            "bom dia", "boa tarde", "boa noite", "tudo bem", "tudo bom",
+            "obrigado", "obrigada", "muito obrigado", "muito obrigada", "valeu", "vlw",
+            "tchau", "ate mais", "ate logo", "ok obrigado", "ok obrigada",
+        ),
+        Intent.cumprimento.value,
+    ),
+    **dict.fromkeys(
+        (
+            "corretor", "atendente", "humano", "falar com corretor", "falar com atendente",
+            "quero falar com um corretor", "quero falar com o corretor",
+            "quero falar com uma pessoa", "quero falar com um atendente",
+        ),
+        Intent.atendimento_humano.value,
+    ),
+    **dict.fromkeys(
+        ("agendar visita", "quero agendar uma visita", "marcar visita", "quero marcar uma visita"),
+        Intent.agendamento.value,
+    ),
+}
+
+# Camada 2 — padrões sobre o texto normalizado
+_GREETING = r"(oi|ola|opa|e ai|eai|hey|bom dia|boa tarde|boa noite|tudo bem|tudo bom|td bem|como vai|blz|beleza)"
+_ADDRESS = r"(pessoal|amigo|amiga|moca|moco|querid[oa])"
+_THANKS = r"(obrigad[oa]|muito obrigad[oa]|valeu|vlw|tchau|ate mais|ate logo|ate amanha|flw|abracos?)"
+
+_PATTERNS = (
+    (re.compile(rf"^{_GREETING}( ({_GREETING}|{_ADDRESS}))*$"), Intent.cumprimento.value),
+    (re.compile(rf"^(ok |certo |beleza |ta )?{_THANKS}( ({_THANKS}|{_ADDRESS}|pela ajuda))*$"),
+     Intent.cumprimento.value),
+    (re.compile(
+        r"\b(falar|conversar|atendimento|contato) (com )?(um |uma |o |a |algum |alguma )?"
+        r"(corretor|corretora|atendente|pessoa|humano|alguem|gerente)\b"
+    ), Intent.atendimento_humano.value),
+)
+
+# Camada 3 — léxico ponderado; substantivos genéricos de imóvel pesam menos
+_LEXICON: Dict[str, Dict[str, float]] = {
+    Intent.agendamento.value: {
+        "agendar": 1, "agendamento": 1, "visita": 1, "visitar": 1, "marcar": 1,
+        "horario": 1, "agenda": 0.5, "conhecer": 0.5,
+    },
+    Intent.qualificacao.value: {
+        "preco": 1, "valor": 1, "quanto": 1, "custa": 1, "quartos": 1, "quarto": 1,
+        "aluguel": 1, "alugar": 1, "comprar": 1, "compra": 1, "venda": 1,
+        "financiamento": 1, "financiar": 1, "bairro": 1, "metragem": 1, "m2": 1,
+        "condominio": 1, "iptu": 1, "suite": 1, "suites": 1, "garagem": 1, "vaga": 0.5,
+        "apartamento": 0.5, "apto": 0.5, "casa": 0.5, "imovel": 0.5, "imoveis": 0.5,
+    },
+    Intent.documentacao.value: {
+        "documento": 1, "documentos": 1, "documentacao": 1, "contrato": 1, "escritura": 1,
+        "rg": 1, "cpf": 1, "comprovante": 1, "certidao": 1, "matricula": 1, "itbi": 1,
+        "assinatura": 1, "assinar": 1,
+    },
+    Intent.atendimento_humano.value: {
+        "corretor": 1, "corretora": 1, "atendente": 1, "humano": 1, "reclamacao": 1,
+        "reclamar": 1, "urgente": 1, "gerente": 1,
+    },
+}
+
+_NEGATIONS = frozenset({"nao", "nem", "nunca", "cancelar", "cancela", "desmarcar", "remarcar"})
+_LEXICON_MAX_TOKENS = 20
+
+
+def _result(intencao: str, confianca: str, camada: str) -> ClassifiedIntent:
+    return {"intencao": intencao, "confianca": confianca, "entidades": {}, "camada": camada}
+
+
+def _classify_lexicon(tokens: list) -> Optional[ClassifiedIntent]:
+    if len(tokens) > _LEXICON_MAX_TOKENS:
+        return None
+
+    scores = sorted(
+        ((sum(weights.get(t, 0) for t in tokens), intent) for intent, weights in _LEXICON.items()),
+        reverse=True,
+    )
+    (top, intent), (second, _) = scores[0], scores[1]
+    if top < 1 or top < 2 * second:
+        return None
+    return _result(intent, "alta" if top >= 2 else "media", "lexico")
+
+
+def classify_fast(message: str) -> Optional[ClassifiedIntent]:
+    """Classifica sem LLM os casos inequívocos. None → seguir para o LLM."""
+    text = normalize(message)
+    if not text:
+        return None
+
+    intent = _EXACT.get(text)
+    if intent:
+        return _result(intent, "alta", "exata")
+
+    # Negação ("não quero falar com corretor") sempre vai para o LLM
+    tokens = text.split()
+    if _NEGATIONS.intersection(tokens):
+        return None
+
+    for pattern, intent in _PATTERNS:
+        if pattern.search(text):
+            return _result(intent, "alta", "padrao")
+
+    return _classify_lexicon(tokens)
@@ -2,18 +2,27 @@
 ZONA 5 — Agente de Qualificação de Lead
 
 Responsabilidade: coletar perfil do comprador/locatário de forma progressiva e natural.
-Redis: {phone}_qualificacao | TTL: 900s | Janela: 20 mensagens
+Redis: {phone}_qualificacao | TTL: 900s | Janela: 20 mensagens / 1200 tokens + resumo
 """
 
-from langchain_core.messages import SystemMessage, HumanMessage
 from loguru import logger
 
-from app.services.ai_service import llm_flash
-from app.services.memory_service import get_agent_history, save_agent_message
+from app.agents.nodes.agent_utils import (
+    ainvoke_llm,
+    build_agent_messages,
+    invoke_llm,
+    lookup_cached_response,
+    set_fallback_response,
+    store_cached_response,
+)
+from app.services import history_compactor
+from app.services.ai_service import get_llm_flash
+from app.services.memory_service import asave_agent_turn, save_agent_turn
 
 AGENT_NAME = "qualificacao"
 AGENT_TTL = 900
 MAX_HISTORY = 20
+HISTORY_TOKEN_BUDGET = 1200
 
 _SYSTEM_PROMPT = (
     "Você é Ana, corretora virtual especializada em entender o que o cliente busca.\n\n"
@@ -38,38 +47,74 @@ _SYSTEM_PROMPT = (
 )
 
 
+def _fallback_response(name: str) -> str:
+    return (
+        "Pra eu te indicar as melhores opções, me conta um pouco mais "
+        "sobre o que você está buscando? Pode ser à vontade! 😊"
+    )
+
+
 def qualification_agent(state: dict) -> dict:
     """Zona 5 — Agente de qualificação de lead."""
     phone = state["phone"]
     name = state.get("name", "")
 
     try:
-        history = get_agent_history(phone, AGENT_NAME, MAX_HISTORY)
-        name_hint = f"Nome do usuário: {name}\n" if name else ""
+        compact = history_compactor.load_history(
+            phone, AGENT_NAME, MAX_HISTORY, HISTORY_TOKEN_BUDGET, AGENT_TTL
+        )
+        history = compact.messages
+        response = lookup_cached_response(AGENT_NAME, _SYSTEM_PROMPT, history, state["message"])
+        if response is None:
+            messages = build_agent_messages(
+                _SYSTEM_PROMPT, name, history, state["message"], compact.summary,
+                rag_context=state.get("rag_context"),
+            )
+            response = invoke_llm(get_llm_flash(), messages, state)
+            store_cached_response(
+                AGENT_NAME, _SYSTEM_PROMPT, history, state["message"], response, name
+            )
+
+        save_agent_turn(phone, AGENT_NAME, state["message"], response, AGENT_TTL)
 
-        messages = [
-            SystemMessage(content=name_hint + _SYSTEM_PROMPT),
-            *[
-                (HumanMessage if m["role"] == "user" else SystemMessage)(content=m["content"])
-                for m in history
-            ],
-            HumanMessage(content=state["message"]),
-        ]
+        state["response"] = response
+        logger.info(f"Agente qualificação respondeu | phone={phone}")
 
-        result = llm_flash.invoke(messages)
-        response = result.content.strip()
+    except Exception as e:
+        logger.error(f"qualification_agent error | phone={phone} | {e}")
+        set_fallback_response(state, _fallback_response(name))
 
-        save_agent_message(phone, AGENT_NAME, "user", state["message"], AGENT_TTL)
-        save_agent_message(phone, AGENT_NAME, "assistant", response, AGENT_TTL)
+    return state
+
+
+async def aqualification_agent(state: dict) -> dict:
+    """Versão asyncio de qualification_agent."""
+    phone = state["phone"]
+    name = state.get("name", "")
+
+    try:
+        compact = await history_compactor.aload_history(
+            phone, AGENT_NAME, MAX_HISTORY, HISTORY_TOKEN_BUDGET, AGENT_TTL
+        )
+        history = compact.messages
+        response = lookup_cached_response(AGENT_NAME, _SYSTEM_PROMPT, history, state["message"])
+        if response is None:
+            messages = build_agent_messages(
+                _SYSTEM_PROMPT, name, history, state["message"], compact.summary,
+                rag_context=state.get("rag_context"),
+            )
+            response = await ainvoke_llm(get_llm_flash(), messages, state)
+            store_cached_response(
+                AGENT_NAME, _SYSTEM_PROMPT, history, state["message"], response, name
+            )
+
+        await asave_agent_turn(phone, AGENT_NAME, state["message"], response, AGENT_TTL)
 
         state["response"] = response
         logger.info(f"Agente qualificação respondeu | phone={phone}")
 
     except Exception as e:
         logger.error(f"qualification_agent error | phone={phone} | {e}")
-        state["response"] = (
-            "Pra eu te indicar as melhores opções, me conta um pouco mais "
-            "sobre o que você está buscando? Pode ser à vontade! 😊"
-        )
+        set_fallback_response(state, _fallback_response(name))
 
     return state
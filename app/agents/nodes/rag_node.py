@@ -20,3 +20,20 @@ def search_rag(state: dict) -> dict:
         state["rag_context"] = None
 
     return state
+
+
+async def asearch_rag(state: dict) -> dict:
+    """Versão asyncio de search_rag."""
+    try:
+        context = await rag_service.asearch_context(state["message"])
+        state["rag_context"] = context
+
+        if context:
+            logger.info(f"RAG encontrou contexto | phone={state['phone']}")
+        else:
+            logger.info(f"RAG sem resultado relevante | phone={state['phone']}")
+    except Exception as e:
+        logger.error(f"search_rag error | phone={state['phone']} | {e}")
+        state["rag_context"] = None
+
+    return state
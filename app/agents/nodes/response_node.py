@@ -2,7 +2,10 @@ from typing import List
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage
 from loguru import logger
-from app.services.ai_service import llm_pro
+from app.services import history_compactor
+from app.services.ai_service import get_llm_pro
+
+HISTORY_TOKEN_BUDGET = 600
 
 
 def generate_response(state: dict) -> dict:
@@ -29,7 +32,7 @@ def generate_response(state: dict) -> dict:
 
         history: list = state.get("history", [])
         if history:
-            recent = history[-6:]
+            recent = history_compactor.trim_to_budget(history[-6:], HISTORY_TOKEN_BUDGET)
             history_text = "\n".join(
                 f"{msg['role']}: {msg['content']}" for msg in recent
             )
@@ -44,7 +47,7 @@ def generate_response(state: dict) -> dict:
             HumanMessage(content=state["message"]),
         ]
 
-        result = llm_pro.invoke(messages)
+        result = get_llm_pro().invoke(messages)
         state["response"] = result.content.strip()
         logger.info(f"Resposta gerada | phone={state['phone']}")
 
@@ -2,18 +2,25 @@
 ZONA 5 — Agente de Agendamento
 
 Responsabilidade: coletar dia/horário e confirmar visita ao imóvel.
-Redis: {phone}_agendamento | TTL: 600s | Janela: 15 mensagens
+Redis: {phone}_agendamento | TTL: 600s | Janela: 15 mensagens / 900 tokens + resumo
 """
 
-from langchain_core.messages import SystemMessage, HumanMessage
 from loguru import logger
 
-from app.services.ai_service import llm_flash
-from app.services.memory_service import get_agent_history, save_agent_message
+from app.agents.nodes.agent_utils import (
+    ainvoke_llm,
+    build_agent_messages,
+    invoke_llm,
+    set_fallback_response,
+)
+from app.services import history_compactor
+from app.services.ai_service import get_llm_flash
+from app.services.memory_service import asave_agent_turn, save_agent_turn
 
 AGENT_NAME = "agendamento"
 AGENT_TTL = 600
 MAX_HISTORY = 15
+HISTORY_TOKEN_BUDGET = 900
 
 _SYSTEM_PROMPT = (
     "Você é Ana, corretora virtual especializada em agendamento de visitas.\n\n"
@@ -34,38 +41,66 @@ _SYSTEM_PROMPT = (
 )
 
 
+def _fallback_response(name: str) -> str:
+    return (
+        "Que ótimo que você quer conhecer o imóvel! 🏠 "
+        "Qual dia da semana costuma ser melhor pra você?"
+    )
+
+
 def scheduling_agent(state: dict) -> dict:
     """Zona 5 — Agente de agendamento de visitas."""
     phone = state["phone"]
     name = state.get("name", "")
 
     try:
-        history = get_agent_history(phone, AGENT_NAME, MAX_HISTORY)
-        name_hint = f"Nome do usuário: {name}\n" if name else ""
-
-        messages = [
-            SystemMessage(content=name_hint + _SYSTEM_PROMPT),
-            *[
-                (HumanMessage if m["role"] == "user" else SystemMessage)(content=m["content"])
-                for m in history
-            ],
-            HumanMessage(content=state["message"]),
-        ]
+        compact = history_compactor.load_history(
+            phone, AGENT_NAME, MAX_HISTORY, HISTORY_TOKEN_BUDGET, AGENT_TTL
+        )
+        history = compact.messages
+        messages = build_agent_messages(
+            _SYSTEM_PROMPT, name, history, state["message"], compact.summary,
+            rag_context=state.get("rag_context"),
+        )
 
-        result = llm_flash.invoke(messages)
-        response = result.content.strip()
+        response = invoke_llm(get_llm_flash(), messages, state)
 
-        save_agent_message(phone, AGENT_NAME, "user", state["message"], AGENT_TTL)
-        save_agent_message(phone, AGENT_NAME, "assistant", response, AGENT_TTL)
+        save_agent_turn(phone, AGENT_NAME, state["message"], response, AGENT_TTL)
 
         state["response"] = response
         logger.info(f"Agente agendamento respondeu | phone={phone}")
 
     except Exception as e:
         logger.error(f"scheduling_agent error | phone={phone} | {e}")
-        state["response"] = (
-            "Que ótimo que você quer conhecer o imóvel! 🏠 "
-            "Qual dia da semana costuma ser melhor pra você?"
+        set_fallback_response(state, _fallback_response(name))
+
+    return state
+
+
+async def ascheduling_agent(state: dict) -> dict:
+    """Versão asyncio de scheduling_agent."""
+    phone = state["phone"]
+    name = state.get("name", "")
+
+    try:
+        compact = await history_compactor.aload_history(
+            phone, AGENT_NAME, MAX_HISTORY, HISTORY_TOKEN_BUDGET, AGENT_TTL
+        )
+        history = compact.messages
+        messages = build_agent_messages(
+            _SYSTEM_PROMPT, name, history, state["message"], compact.summary,
+            rag_context=state.get("rag_context"),
         )
 
+        response = await ainvoke_llm(get_llm_flash(), messages, state)
+
+        await asave_agent_turn(phone, AGENT_NAME, state["message"], response, AGENT_TTL)
+
+        state["response"] = response
+        logger.info(f"Agente agendamento respondeu | phone={phone}")
+
+    except Exception as e:
+        logger.error(f"scheduling_agent error | phone={phone} | {e}")
+        set_fallback_response(state, _fallback_response(name))
+
     return state
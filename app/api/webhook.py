@@ -1,7 +1,20 @@
+import json
+import time
+from typing import Iterator, List
+
 from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import Response
 from loguru import logger
 
-from app.workers.message_worker import enqueue_message
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+from app.core import metrics
+from app.workers.message_worker import aenqueue_messages
 from app.models.context import MessageContext
 
 router = APIRouter()
@@ -11,18 +24,37 @@ router = APIRouter()
 # ZONA 1 — Entrada e normalização
 # Responsabilidade exclusiva: extrair dados do payload Evolution API, montar
 # o MessageContext e delegar para o worker. Zero lógica de negócio aqui.
+#
+# Caminho rápido: eventos que não são messages.upsert (presence.update,
+# chats.update, ...) são descartados por busca nos bytes, sem decodificar o
+# JSON; o resto é decodificado com orjson e enfileirado num único round trip
+# assíncrono ao Redis. Aceita payloads em lote: lista de eventos e/ou `data`
+# como lista de mensagens.
 # ---------------------------------------------------------------------------
 
+_UPSERT_EVENT = "messages.upsert"
+_UPSERT_MARKER = _UPSERT_EVENT.encode()
+
+# Corpos de resposta pré-serializados — sem jsonable_encoder por requisição
+_IGNORED = b'{"status":"ignored"}'
+_QUEUED = b'{"status":"queued"}'
+
+
+def _iter_message_data(body) -> Iterator[dict]:
+    """Itens `data` de messages.upsert — evento único, lista de eventos ou data em lista."""
+    events = body if isinstance(body, list) else [body]
+    for event in events:
+        if not isinstance(event, dict) or event.get("event") != _UPSERT_EVENT:
+            continue
+        data = event.get("data") or {}
+        yield from (d for d in (data if isinstance(data, list) else [data]) if isinstance(d, dict))
 
-def _build_context(body: dict) -> MessageContext | None:
+
+def _build_context(data: dict) -> MessageContext | None:
     """
-    Extrai e valida os campos relevantes do webhook Evolution API.
+    Extrai e valida os campos relevantes de uma mensagem do webhook Evolution API.
     Retorna MessageContext ou None se a mensagem deve ser ignorada.
     """
-    if body.get("event") != "messages.upsert":
-        return None
-
-    data = body.get("data", {})
     key = data.get("key", {})
 
     # Ignorar mensagens enviadas pelo bot
@@ -61,17 +93,37 @@ def _build_context(body: dict) -> MessageContext | None:
     )
 
 
+def _build_contexts(raw: bytes) -> List[MessageContext]:
+    """Pré-filtro nos bytes + decodificação e normalização de todas as mensagens do POST."""
+    if _UPSERT_MARKER not in raw:
+        return []
+    contexts = []
+    for data in _iter_message_data(_loads(raw)):
+        ctx = _build_context(data)
+        if ctx is not None:
+            contexts.append(ctx)
+    return contexts
+
+
+async def _ingest(request: Request, endpoint: str) -> Response:
+    start = time.perf_counter()
+    contexts = _build_contexts(await request.body())
+    for ctx in contexts:
+        logger.info(f"Webhook recebido | {endpoint} | phone={ctx.phone} | msg={ctx.content[:50]}")
+    if contexts:
+        await aenqueue_messages(contexts)
+    metrics.observe("webhook_handler_seconds", time.perf_counter() - start, endpoint=endpoint)
+    metrics.inc(
+        "webhook_requests_total", endpoint=endpoint, result="queued" if contexts else "ignored"
+    )
+    return Response(content=_QUEUED if contexts else _IGNORED, media_type="application/json")
+
+
 @router.post("/webhook/agente-imobiliaria")
 async def webhook_agente(request: Request):
     """Endpoint principal do webhook (Evolution API)."""
     try:
-        body = await request.json()
-        ctx = _build_context(body)
-        if ctx is None:
-            return {"status": "ignored"}
-        logger.info(f"Webhook recebido | phone={ctx.phone} | msg={ctx.content[:50]}")
-        enqueue_message(ctx)
-        return {"status": "queued"}
+        return await _ingest(request, "agente")
     except Exception as e:
         logger.error(f"webhook_agente error: {e}")
         raise HTTPException(status_code=500, detail="Erro interno no webhook")
@@ -81,13 +133,7 @@ async def webhook_agente(request: Request):
 async def webhook_evolution(request: Request):
     """Endpoint alternativo — compatibilidade com Evolution API v2."""
     try:
-        body = await request.json()
-        ctx = _build_context(body)
-        if ctx is None:
-            return {"status": "ignored"}
-        logger.info(f"Webhook evolution | phone={ctx.phone} | msg={ctx.content[:50]}")
-        enqueue_message(ctx)
-        return {"status": "queued"}
+        return await _ingest(request, "evolution")
     except Exception as e:
         logger.error(f"webhook_evolution error: {e}")
         raise HTTPException(status_code=500, detail="Erro interno no webhook")
@@ -0,0 +1,69 @@
+"""
+Clientes construídos sob demanda.
+
+LazyClient(name, factory) é um accessor memoizado: a primeira chamada
+constrói o cliente (sob lock — uma única construção mesmo com várias threads)
+e as seguintes retornam a mesma instância. Assim importar um módulo não
+importa o SDK nem abre clientes HTTP; o custo fica para o primeiro uso ou para
+o pré-aquecimento no startup (prewarm_all).
+
+Cada construção registra client_init_seconds{client}; initialized() permite
+ao relatório de startup dizer o que já foi aquecido.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
+from loguru import logger
+
+from app.core import metrics
+
+T = TypeVar("T")
+
+_registry: Dict[str, "LazyClient"] = {}
+
+
+class LazyClient(Generic[T]):
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def __call__(self) -> T:
+        value = self._value
+        if value is not None:
+            return value
+        with self._lock:
+            if self._value is None:
+                start = time.perf_counter()
+                self._value = self._factory()
+                elapsed = time.perf_counter() - start
+                metrics.observe("client_init_seconds", elapsed, client=self.name)
+                logger.info(f"Cliente inicializado | {self.name} | {elapsed * 1000:.1f}ms")
+            return self._value
+
+    def initialized(self) -> bool:
+        return self._value is not None
+
+    def override(self, value: T) -> None:
+        """Substitui o cliente (benchmarks e dublês locais) sem chamar a factory."""
+        with self._lock:
+            self._value = value
+
+
+def prewarm_all(names: Optional[List[str]] = None) -> Dict[str, float]:
+    """Constrói os clientes registrados (ou só `names`). Retorna {nome: segundos}."""
+    timings: Dict[str, float] = {}
+    for name, client in list(_registry.items()):
+        if names is not None and name not in names:
+            continue
+        start = time.perf_counter()
+        try:
+            client()
+        except Exception as e:
+            logger.warning(f"Pré-aquecimento falhou | {name} | {e}")
+        timings[name] = time.perf_counter() - start
+    return timings
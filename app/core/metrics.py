@@ -0,0 +1,159 @@
+"""
+Métricas internas do processo — contadores, gauges e histogramas.
+
+Registro em memória, thread-safe, sem dependências externas. Cada série é
+identificada pelo nome da métrica + labels (kwargs). Histogramas usam buckets
+cumulativos no mesmo formato do Prometheus.
+
+render_prometheus() exporta tudo no formato texto do Prometheus (0.0.4).
+Valores que só fazem sentido no momento da coleta (ex: profundidade de fila
+no Redis) entram por register_collector: a função roda a cada scrape e
+atualiza seus gauges antes da renderização.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+from loguru import logger
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_lock = threading.Lock()
+_counters: Dict[_SeriesKey, float] = {}
+_gauges: Dict[_SeriesKey, float] = {}
+_histograms: Dict[_SeriesKey, dict] = {}
+_collectors: List[Callable[[], None]] = []
+
+
+def _key(name: str, labels: dict) -> _SeriesKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, amount: float = 1.0, **labels) -> None:
+    """Incrementa um contador."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + amount
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Define o valor atual de um gauge."""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def add_gauge(name: str, amount: float, **labels) -> None:
+    """Soma (ou subtrai) um valor de um gauge."""
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0.0) + amount
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Registra uma observação (em segundos, por convenção) num histograma."""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = {"buckets": [0] * len(DEFAULT_BUCKETS), "sum": 0.0, "count": 0}
+            _histograms[key] = hist
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Mede a duração do bloco e registra no histograma `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def snapshot() -> dict:
+    """Cópia consistente de todas as séries registradas."""
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "histograms": {
+                k: {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]}
+                for k, v in _histograms.items()
+            },
+        }
+
+
+# ---------------------------------------------------------------------------
+# Exportação no formato texto do Prometheus
+# ---------------------------------------------------------------------------
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def register_collector(fn: Callable[[], None]) -> None:
+    """Registra uma função chamada a cada render_prometheus() (idempotente)."""
+    with _lock:
+        if fn not in _collectors:
+            _collectors.append(fn)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return {"inf": "+Inf", "-inf": "-Inf", "nan": "NaN"}.get(repr(value), repr(value))
+
+
+def render_prometheus() -> str:
+    """Todas as séries no formato de exposição texto do Prometheus."""
+    for collector in list(_collectors):
+        try:
+            collector()
+        except Exception as e:
+            logger.warning(f"Coletor de métricas falhou | {getattr(collector, '__name__', collector)} | {e}")
+
+    data = snapshot()
+    lines: List[str] = []
+
+    def _grouped(series: dict):
+        by_name: Dict[str, list] = {}
+        for (name, labels), value in sorted(series.items()):
+            by_name.setdefault(name, []).append((labels, value))
+        return by_name.items()
+
+    for kind, series in (("counter", data["counters"]), ("gauge", data["gauges"])):
+        for name, items in _grouped(series):
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_labels(labels)} {_format_value(value)}" for labels, value in items)
+
+    for name, items in _grouped(data["histograms"]):
+        lines.append(f"# TYPE {name} histogram")
+        for labels, hist in items:
+            for bound, count in zip(DEFAULT_BUCKETS, hist["buckets"]):
+                lines.append(f"{name}_bucket{_labels(labels, (('le', str(bound)),))} {count}")
+            lines.append(f"{name}_bucket{_labels(labels, (('le', '+Inf'),))} {hist['count']}")
+            lines.append(f"{name}_sum{_labels(labels)} {_format_value(hist['sum'])}")
+            lines.append(f"{name}_count{_labels(labels)} {hist['count']}")
+
+    return "\n".join(lines) + "\n"
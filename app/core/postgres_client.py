@@ -1,44 +1,383 @@
+"""
+Acesso ao PostgreSQL com pool de conexões.
+
+- Síncrono (psycopg2): ThreadedConnectionPool com limite de aquisição por
+  semáforo, timeout de espera, health check de conexões ociosas e tempo de
+  vida máximo por conexão.
+- Assíncrono (asyncpg): pool equivalente para código asyncio, com a mesma SQL
+  (placeholders %s são convertidos para $1, $2, ...; %% vira %).
+
+Tamanhos e limites vêm de Settings (POSTGRES_POOL_*).
+"""
+
+import asyncio
+import functools
+import re
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
 from typing import List, Optional, Tuple
+
 import psycopg2
 import psycopg2.extras
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 from loguru import logger
+
+from app.core import metrics
 from app.core.config import settings
 
+# ---------------------------------------------------------------------------
+# Pool síncrono (psycopg2)
+# ---------------------------------------------------------------------------
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+_slots: Optional[threading.BoundedSemaphore] = None
+
+# conn → (criada_em, última_devolução) — base do max lifetime e health check.
+# Chave fraca: a entrada some com a conexão (um id() poderia ser reutilizado
+# por outra conexão depois do garbage collection)
+_conn_times: "weakref.WeakKeyDictionary[psycopg2.extensions.connection, Tuple[float, float]]" = (
+    weakref.WeakKeyDictionary()
+)
+# conn → semáforo de onde saiu a vaga. _pool e _slots são recriados juntos após
+# close_pool(): a devolução libera o semáforo da geração que emprestou a conexão
+_conn_slots: "weakref.WeakKeyDictionary[psycopg2.extensions.connection, threading.BoundedSemaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_pool() -> Tuple[ThreadedConnectionPool, threading.BoundedSemaphore]:
+    global _pool, _slots
+    pool, slots = _pool, _slots
+    if pool is not None and slots is not None:
+        return pool, slots
+    with _pool_lock:
+        if _pool is None:
+            _slots = threading.BoundedSemaphore(settings.POSTGRES_POOL_MAX_SIZE)
+            _pool = ThreadedConnectionPool(
+                settings.POSTGRES_POOL_MIN_SIZE,
+                settings.POSTGRES_POOL_MAX_SIZE,
+                settings.POSTGRES_URL,
+                connect_timeout=settings.POSTGRES_CONNECT_TIMEOUT_SECONDS,
+            )
+            logger.info(
+                f"Pool PostgreSQL criado | min={settings.POSTGRES_POOL_MIN_SIZE} "
+                f"| max={settings.POSTGRES_POOL_MAX_SIZE}"
+            )
+        return _pool, _slots
+
+
+def _is_healthy(conn: psycopg2.extensions.connection) -> bool:
+    """Descarta conexões fechadas, vencidas ou que falham no ping após ociosidade."""
+    if conn.closed:
+        return False
+
+    now = time.monotonic()
+    created_at, released_at = _conn_times.setdefault(conn, (now, now))
+    if now - created_at > settings.POSTGRES_POOL_MAX_LIFETIME_SECONDS:
+        metrics.inc("postgres_pool_recycled_total", pool="sync", reason="lifetime")
+        return False
+
+    if now - released_at > settings.POSTGRES_POOL_HEALTHCHECK_SECONDS:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+        except Exception:
+            metrics.inc("postgres_pool_recycled_total", pool="sync", reason="healthcheck")
+            return False
+    return True
+
+
+def _discard(pool: ThreadedConnectionPool, conn: psycopg2.extensions.connection) -> None:
+    _conn_times.pop(conn, None)
+    try:
+        pool.putconn(conn, close=True)
+    except Exception as e:
+        logger.warning(f"Erro ao descartar conexão do pool: {e}")
+
 
 def get_connection() -> psycopg2.extensions.connection:
-    """Retorna uma conexão psycopg2 ao PostgreSQL."""
+    """
+    Retorna uma conexão psycopg2 do pool.
+    Deve ser devolvida com release_connection() — prefira o context manager connection().
+    Levanta PoolError se nenhuma conexão ficar livre em POSTGRES_POOL_TIMEOUT_SECONDS.
+    """
+    try:
+        pool, slots = _get_pool()
+    except Exception as e:
+        logger.error(f"Erro ao conectar ao PostgreSQL: {e}")
+        raise
+
+    start = time.perf_counter()
+    if not slots.acquire(timeout=settings.POSTGRES_POOL_TIMEOUT_SECONDS):
+        metrics.inc("postgres_pool_timeouts_total", pool="sync")
+        raise PoolError(
+            f"Timeout de {settings.POSTGRES_POOL_TIMEOUT_SECONDS}s aguardando conexão do pool"
+        )
+
     try:
-        conn = psycopg2.connect(settings.POSTGRES_URL)
-        return conn
+        conn = pool.getconn()
+        while not _is_healthy(conn):
+            _discard(pool, conn)
+            conn = pool.getconn()
     except Exception as e:
+        slots.release()
         logger.error(f"Erro ao conectar ao PostgreSQL: {e}")
         raise
 
+    _conn_slots[conn] = slots
+    metrics.observe("postgres_pool_acquire_seconds", time.perf_counter() - start, pool="sync")
+    metrics.add_gauge("postgres_pool_in_use", 1, pool="sync")
+    return conn
+
+
+def release_connection(conn: psycopg2.extensions.connection, discard: bool = False) -> None:
+    """Devolve a conexão ao pool (ou a descarta se quebrada)."""
+    slots = _conn_slots.pop(conn, None)
+    pool = _pool
+    try:
+        if slots is None or slots is not _slots:
+            # Emprestada antes de close_pool(): o pool de origem já foi fechado
+            _conn_times.pop(conn, None)
+            if not conn.closed:
+                conn.close()
+            return
+        if discard or conn.closed:
+            _discard(pool, conn)
+            return
+        if conn.status != psycopg2.extensions.STATUS_READY:
+            conn.rollback()
+        created_at, _ = _conn_times.get(conn, (time.monotonic(), 0.0))
+        _conn_times[conn] = (created_at, time.monotonic())
+        pool.putconn(conn)
+    except Exception as e:
+        logger.warning(f"Erro ao devolver conexão ao pool: {e}")
+        _discard(pool, conn)
+    finally:
+        metrics.add_gauge("postgres_pool_in_use", -1, pool="sync")
+        if slots is not None:
+            slots.release()
+
+
+@contextmanager
+def connection():
+    """Context manager que empresta uma conexão do pool e sempre a devolve."""
+    conn = get_connection()
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        release_connection(conn, discard=broken)
+
+
+def _observe(operation: str, pool: str, start: float, failed: bool = False) -> None:
+    """Duração da operação, incluindo a espera por conexão do pool."""
+    metrics.observe(
+        "postgres_query_seconds", time.perf_counter() - start, operation=operation, pool=pool
+    )
+    if failed:
+        metrics.inc("postgres_errors_total", operation=operation, pool=pool)
+
 
 def execute_query(sql: str, params: Optional[Tuple] = None) -> List[dict]:
     """Executa uma query SELECT e retorna lista de dicts."""
+    start = time.perf_counter()
     try:
-        conn = get_connection()
-        with conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                cur.execute(sql, params)
-                results = cur.fetchall()
-        conn.close()
+        with connection() as conn:
+            with conn:
+                with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                    cur.execute(sql, params)
+                    results = cur.fetchall()
+        _observe("query", "sync", start)
         return [dict(row) for row in results]
     except Exception as e:
+        _observe("query", "sync", start, failed=True)
         logger.error(f"Erro ao executar query: {e} | SQL: {sql}")
         return []
 
 
 def execute_write(sql: str, params: Optional[Tuple] = None) -> bool:
     """Executa INSERT, UPDATE ou DELETE. Retorna True se bem-sucedido."""
+    start = time.perf_counter()
     try:
-        conn = get_connection()
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(sql, params)
-        conn.close()
+        with connection() as conn:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(sql, params)
+        _observe("write", "sync", start)
+        return True
+    except Exception as e:
+        _observe("write", "sync", start, failed=True)
+        logger.error(f"Erro ao executar escrita: {e} | SQL: {sql}")
+        return False
+
+
+def pool_stats() -> dict:
+    """Resumo do pool síncrono para logs e health checks."""
+    snapshot = metrics.snapshot()
+    labels = (("pool", "sync"),)
+    acquire = snapshot["histograms"].get(("postgres_pool_acquire_seconds", labels))
+    return {
+        "max_size": settings.POSTGRES_POOL_MAX_SIZE,
+        "in_use": snapshot["gauges"].get(("postgres_pool_in_use", labels), 0),
+        "acquisitions": acquire["count"] if acquire else 0,
+        "acquire_wait_avg_ms": (
+            acquire["sum"] / acquire["count"] * 1000 if acquire and acquire["count"] else 0.0
+        ),
+        "timeouts": snapshot["counters"].get(("postgres_pool_timeouts_total", labels), 0),
+    }
+
+
+def close_pool() -> None:
+    """Fecha todas as conexões do pool síncrono (shutdown)."""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _slots = None
+            _conn_times.clear()
+            logger.info("Pool PostgreSQL encerrado")
+
+
+# ---------------------------------------------------------------------------
+# Pool assíncrono (asyncpg)
+# asyncpg recicla conexões ociosas (max_inactive_connection_lifetime) e descarta
+# as quebradas na devolução; o tempo máximo de vida é aproximado por max_queries.
+# ---------------------------------------------------------------------------
+
+_async_pool = None
+_async_pool_lock = asyncio.Lock()
+
+# Literais e comentários SQL (onde %s não é placeholder) ou um token de %
+_SQL_TOKEN_RE = re.compile(
+    r"""
+    (?P<quoted>
+        (?<!\w)[Ee]'(?:[^'\\]|\\.|'')*'         # string com escapes (E'...')
+      | '(?:[^']|'')*'                           # string
+      | "(?:[^"]|"")*"                           # identificador
+      | \$(?P<tag>[A-Za-z_]\w*)?\$.*?\$(?P=tag)\$  # dollar-quoted ($$...$$, $f$...$f$)
+      | --[^\n]*                                 # comentário de linha
+      | /\*.*?\*/                                # comentário de bloco
+    )
+    | (?P<percent>%%|%s|%\(\w+\)s)
+    """,
+    re.S | re.X,
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _to_asyncpg_sql(sql: str) -> str:
+    """
+    Converte placeholders psycopg2 (%s) para o formato asyncpg ($1, $2, ...)
+    fora de strings, identificadores e comentários; %% vira %.
+    Levanta ValueError para %s dentro de literal (o psycopg2 o substituiria —
+    escreva %%s) e para placeholders nomeados %(nome)s.
+    """
+    counter = iter(range(1, 10_000))
+
+    def replace(match: re.Match) -> str:
+        quoted = match.group("quoted")
+        if quoted is not None:
+            if re.search(r"(?<!%)(?:%%)*%s", quoted):
+                raise ValueError(f"Placeholder %s dentro de literal/comentário SQL: {quoted[:60]}")
+            return quoted.replace("%%", "%")
+        token = match.group("percent")
+        if token == "%%":
+            return "%"
+        if token == "%s":
+            return f"${next(counter)}"
+        raise ValueError(f"Placeholder nomeado não suportado no modo async: {token}")
+
+    return _SQL_TOKEN_RE.sub(replace, sql)
+
+
+def _asyncpg_sql(sql: str, params: Optional[Tuple]) -> str:
+    # psycopg2 só interpreta % quando recebe parâmetros
+    return sql if params is None else _to_asyncpg_sql(sql)
+
+
+async def _get_async_pool():
+    global _async_pool
+    if _async_pool is None:
+        async with _async_pool_lock:
+            if _async_pool is None:
+                import asyncpg
+
+                _async_pool = await asyncpg.create_pool(
+                    dsn=settings.POSTGRES_URL,
+                    min_size=settings.POSTGRES_POOL_MIN_SIZE,
+                    max_size=settings.POSTGRES_POOL_MAX_SIZE,
+                    max_inactive_connection_lifetime=settings.POSTGRES_POOL_MAX_IDLE_SECONDS,
+                    timeout=settings.POSTGRES_CONNECT_TIMEOUT_SECONDS,
+                )
+                logger.info(
+                    f"Pool PostgreSQL async criado | min={settings.POSTGRES_POOL_MIN_SIZE} "
+                    f"| max={settings.POSTGRES_POOL_MAX_SIZE}"
+                )
+    return _async_pool
+
+
+@asynccontextmanager
+async def aconnection():
+    """Versão asyncio de connection(): empresta uma conexão asyncpg do pool."""
+    pool = await _get_async_pool()
+    start = time.perf_counter()
+    try:
+        conn = await pool.acquire(timeout=settings.POSTGRES_POOL_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        metrics.inc("postgres_pool_timeouts_total", pool="async")
+        raise PoolError(
+            f"Timeout de {settings.POSTGRES_POOL_TIMEOUT_SECONDS}s aguardando conexão do pool"
+        )
+
+    metrics.observe("postgres_pool_acquire_seconds", time.perf_counter() - start, pool="async")
+    metrics.add_gauge("postgres_pool_in_use", 1, pool="async")
+    try:
+        yield conn
+    finally:
+        metrics.add_gauge("postgres_pool_in_use", -1, pool="async")
+        await pool.release(conn)
+
+
+async def aexecute_query(sql: str, params: Optional[Tuple] = None) -> List[dict]:
+    """Versão asyncio de execute_query."""
+    start = time.perf_counter()
+    try:
+        async with aconnection() as conn:
+            rows = await conn.fetch(_asyncpg_sql(sql, params), *(params or ()))
+        _observe("query", "async", start)
+        return [dict(row) for row in rows]
+    except Exception as e:
+        _observe("query", "async", start, failed=True)
+        logger.error(f"Erro ao executar query: {e} | SQL: {sql}")
+        return []
+
+
+async def aexecute_write(sql: str, params: Optional[Tuple] = None) -> bool:
+    """Versão asyncio de execute_write."""
+    start = time.perf_counter()
+    try:
+        async with aconnection() as conn:
+            await conn.execute(_asyncpg_sql(sql, params), *(params or ()))
+        _observe("write", "async", start)
         return True
     except Exception as e:
+        _observe("write", "async", start, failed=True)
         logger.error(f"Erro ao executar escrita: {e} | SQL: {sql}")
         return False
+
+
+async def aclose_pool() -> None:
+    """Fecha o pool assíncrono (shutdown)."""
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+        logger.info("Pool PostgreSQL async encerrado")
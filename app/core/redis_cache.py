@@ -0,0 +1,242 @@
+"""
+Cache no cliente (client-side caching) para chaves quentes do Redis.
+
+Leituras de chaves com os prefixos de REDIS_CLIENT_CACHE_PREFIXES (ex:
+intent:, session:) passam por cached_read/acached_read: o valor fica num LRU
+em memória do processo até o Redis avisar que a chave mudou.
+
+Invalidação pelo próprio servidor (CLIENT TRACKING, modo broadcast):
+- uma conexão dedicada assina __redis__:invalidate
+- outra conexão liga CLIENT TRACKING ON REDIRECT <id> BCAST PREFIX ... —
+  qualquer escrita, de qualquer processo, numa chave dos prefixos gera uma
+  mensagem de invalidação (FLUSHDB/FLUSHALL: tudo)
+- escritas feitas por este processo também invalidam localmente assim que
+  terminam (note_write) — o processo sempre lê o que acabou de escrever
+
+Segurança:
+- sem a conexão de invalidação saudável o cache fica inativo (leituras vão
+  direto ao Redis) e é esvaziado a cada queda; a thread reconecta sozinha
+- entradas expiram em REDIS_CLIENT_CACHE_TTL_SECONDS mesmo sem aviso
+- leitura em andamento quando chega uma invalidação não é armazenada
+
+Valores em cache são compartilhados: os loaders devem devolver objetos
+imutáveis (str, tuple).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+
+import redis
+from loguru import logger
+
+from app.core import metrics
+from app.core.config import settings
+
+T = TypeVar("T")
+
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+_PING_INTERVAL = 5.0
+_RECONNECT_DELAY = 1.0
+
+# Comandos de leitura que não invalidam a chave (o resto, sobre uma chave
+# com prefixo cacheado, é tratado como escrita)
+_READ_COMMANDS = frozenset({
+    "GET", "MGET", "LRANGE", "LLEN", "LINDEX", "HGET", "HGETALL", "HMGET",
+    "EXISTS", "TTL", "PTTL", "TYPE", "STRLEN", "ZRANGE", "ZCARD", "SMEMBERS", "SCARD",
+})
+
+_prefixes: Tuple[str, ...] = tuple(
+    p.strip() for p in settings.REDIS_CLIENT_CACHE_PREFIXES.split(",") if p.strip()
+)
+
+_lock = threading.Lock()
+# chave → {variante (comando + argumentos): (expira_em, valor)}
+_cache: "OrderedDict[str, Dict[str, Tuple[float, Any]]]" = OrderedDict()
+_pending: Dict[str, object] = {}
+_active = threading.Event()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+
+
+def _cacheable(key: str) -> bool:
+    return _active.is_set() and key.startswith(_prefixes)
+
+
+def _lookup(key: str, variant: str) -> Tuple[bool, Any]:
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and variant in entry:
+            expires_at, value = entry[variant]
+            if expires_at > time.monotonic():
+                _cache.move_to_end(key)
+                return True, value
+            del entry[variant]
+    return False, None
+
+
+def _begin(key: str) -> object:
+    token = object()
+    with _lock:
+        _pending[key] = token
+    return token
+
+
+def _store(key: str, variant: str, token: object, value: Any) -> None:
+    with _lock:
+        # Invalidação (ou outra leitura) chegou durante a leitura: não armazena
+        if _pending.get(key) is not token or not _active.is_set():
+            return
+        del _pending[key]
+        _cache.setdefault(key, {})[variant] = (
+            time.monotonic() + settings.REDIS_CLIENT_CACHE_TTL_SECONDS, value
+        )
+        _cache.move_to_end(key)
+        while len(_cache) > settings.REDIS_CLIENT_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def cached_read(key: str, variant: str, load: Callable[[], T]) -> T:
+    """Valor de load() para (key, variant), servido do cache enquanto a chave não mudar."""
+    if not _cacheable(key):
+        return load()
+    hit, value = _lookup(key, variant)
+    if hit:
+        metrics.inc("redis_client_cache_requests_total", result="hit")
+        return value
+    metrics.inc("redis_client_cache_requests_total", result="miss")
+    token = _begin(key)
+    value = load()
+    _store(key, variant, token, value)
+    return value
+
+
+async def acached_read(key: str, variant: str, load: Callable[[], Awaitable[T]]) -> T:
+    """Versão asyncio de cached_read (mesmo cache, loader assíncrono)."""
+    if not _cacheable(key):
+        return await load()
+    hit, value = _lookup(key, variant)
+    if hit:
+        metrics.inc("redis_client_cache_requests_total", result="hit")
+        return value
+    metrics.inc("redis_client_cache_requests_total", result="miss")
+    token = _begin(key)
+    value = await load()
+    _store(key, variant, token, value)
+    return value
+
+
+def invalidate(keys: Optional[Iterable[str]]) -> None:
+    """Remove as chaves do cache (None = tudo)."""
+    with _lock:
+        if keys is None:
+            _cache.clear()
+            _pending.clear()
+            return
+        for key in keys:
+            _cache.pop(key, None)
+            _pending.pop(key, None)
+
+
+def note_write(args: tuple) -> None:
+    """Chamado pelo cliente instrumentado após cada comando: invalida escritas locais."""
+    if (
+        _active.is_set()
+        and len(args) > 1
+        and isinstance(args[1], str)
+        and args[1].startswith(_prefixes)
+        and str(args[0]).upper() not in _READ_COMMANDS
+    ):
+        invalidate((args[1],))
+
+
+# ---------------------------------------------------------------------------
+# Conexões de invalidação (CLIENT TRACKING + __redis__:invalidate)
+# ---------------------------------------------------------------------------
+
+def _connect():
+    pool = redis.ConnectionPool.from_url(
+        settings.REDIS_URL,
+        decode_responses=True,
+        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT_SECONDS,
+    )
+    listener = pool.make_connection()
+    listener.connect()
+    listener.send_command("CLIENT", "ID")
+    client_id = listener.read_response()
+    listener.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+    listener.read_response()
+
+    tracker = pool.make_connection()
+    tracker.connect()
+    prefix_args = [arg for prefix in _prefixes for arg in ("PREFIX", prefix)]
+    tracker.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST", *prefix_args)
+    tracker.read_response()
+    return listener, tracker
+
+
+def _handle(message) -> None:
+    # ['message', '__redis__:invalidate', [chaves] | None]; PING no modo
+    # assinante responde ['pong', '']
+    if not isinstance(message, list) or len(message) != 3 or message[0] != "message":
+        return
+    keys = message[2]
+    invalidate(None if keys is None else [keys] if isinstance(keys, str) else keys)
+    metrics.inc("redis_client_cache_invalidations_total")
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        listener = tracker = None
+        try:
+            listener, tracker = _connect()
+            _active.set()
+            logger.info(f"Cache no cliente do Redis ativo | prefixos={','.join(_prefixes)}")
+            last_ping = time.monotonic()
+            while not _stop.is_set():
+                if listener.can_read(timeout=1.0):
+                    _handle(listener.read_response())
+                if time.monotonic() - last_ping >= _PING_INTERVAL:
+                    tracker.send_command("PING")
+                    tracker.read_response()
+                    listener.send_command("PING")
+                    last_ping = time.monotonic()
+        except redis.ResponseError as e:
+            # Servidor sem CLIENT TRACKING (Redis < 6 ou compatível): não adianta reconectar
+            logger.error(f"Redis sem suporte a CLIENT TRACKING — cache no cliente desativado | {e}")
+            return
+        except Exception as e:
+            logger.warning(f"Cache no cliente do Redis inativo — reconectando | {e}")
+        finally:
+            _active.clear()
+            invalidate(None)
+            for conn in (listener, tracker):
+                if conn is not None:
+                    conn.disconnect()
+        _stop.wait(_RECONNECT_DELAY)
+
+
+def start() -> None:
+    """Inicia a thread de invalidação, se REDIS_CLIENT_CACHE_ENABLED (idempotente)."""
+    global _thread
+    if not settings.REDIS_CLIENT_CACHE_ENABLED or not _prefixes:
+        return
+    if _thread is not None and _thread.is_alive():
+        return
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _stop.clear()
+            _thread = threading.Thread(target=_run, name="redis-client-cache", daemon=True)
+            _thread.start()
+
+
+def stop(timeout: float = 5.0) -> None:
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=timeout)
+        _thread = None
+    _active.clear()
+    invalidate(None)
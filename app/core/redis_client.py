@@ -1,9 +1,194 @@
+"""
+Camada única de acesso ao Redis — clientes compartilhados sync e asyncio,
+com e sem decode.
+
+- Pools com limite (REDIS_MAX_CONNECTIONS): quando todas as conexões estão em
+  uso, o chamador espera até REDIS_POOL_TIMEOUT_SECONDS por uma livre em vez
+  de abrir conexões sem limite
+- Timeouts de conexão e de comando (REDIS_CONNECT_TIMEOUT_SECONDS,
+  REDIS_SOCKET_TIMEOUT_SECONDS) e health check de conexões ociosas
+- pipelined/apipelined: vários comandos num round trip
+- Cache no cliente para chaves quentes: ver app.core.redis_cache
+
+Todos instrumentados: cada comando observa redis_command_seconds{command} e
+falhas de rede/servidor contam em redis_errors_total{command}. Pipelines são
+medidos como um único round trip (command="PIPELINE"); scripts Lua aparecem
+como EVALSHA.
+"""
+
+import time
+from typing import Any, Callable, List, Optional
+
 import redis
+import redis.asyncio
+import redis.asyncio.client
+import redis.client
+
+from app.core import metrics, redis_cache
 from app.core.config import settings
 
-redis_client: redis.Redis = redis.from_url(
-    settings.REDIS_URL,
-    decode_responses=True,
-)
 
-__all__ = ["redis_client"]
+def _observe(command, start: float, failed: bool) -> None:
+    name = str(command).upper()
+    metrics.observe("redis_command_seconds", time.perf_counter() - start, command=name)
+    if failed:
+        metrics.inc("redis_errors_total", command=name)
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error: bool = True):
+        start, failed = time.perf_counter(), False
+        commands = [args for args, _ in self.command_stack]
+        try:
+            return super().execute(raise_on_error)
+        except redis.RedisError:
+            failed = True
+            raise
+        finally:
+            _observe("PIPELINE", start, failed)
+            for args in commands:
+                redis_cache.note_write(args)
+
+
+class InstrumentedRedis(redis.Redis):
+    def execute_command(self, *args, **options):
+        start, failed = time.perf_counter(), False
+        try:
+            return super().execute_command(*args, **options)
+        except redis.RedisError:
+            failed = True
+            raise
+        finally:
+            _observe(args[0], start, failed)
+            redis_cache.note_write(args)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+class AsyncInstrumentedPipeline(redis.asyncio.client.Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start, failed = time.perf_counter(), False
+        commands = [args for args, _ in self.command_stack]
+        try:
+            return await super().execute(raise_on_error)
+        except redis.RedisError:
+            failed = True
+            raise
+        finally:
+            _observe("PIPELINE", start, failed)
+            for args in commands:
+                redis_cache.note_write(args)
+
+
+class AsyncInstrumentedRedis(redis.asyncio.Redis):
+    async def execute_command(self, *args, **options):
+        start, failed = time.perf_counter(), False
+        try:
+            return await super().execute_command(*args, **options)
+        except redis.RedisError:
+            failed = True
+            raise
+        finally:
+            _observe(args[0], start, failed)
+            redis_cache.note_write(args)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> AsyncInstrumentedPipeline:
+        return AsyncInstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+def _pool_options(decode_responses: bool) -> dict:
+    return {
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "timeout": settings.REDIS_POOL_TIMEOUT_SECONDS,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT_SECONDS,
+        "socket_keepalive": True,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+        "decode_responses": decode_responses,
+    }
+
+
+def _client(decode_responses: bool) -> redis.Redis:
+    pool = redis.BlockingConnectionPool.from_url(settings.REDIS_URL, **_pool_options(decode_responses))
+    return InstrumentedRedis(connection_pool=pool)
+
+
+def _async_client(decode_responses: bool) -> redis.asyncio.Redis:
+    pool = redis.asyncio.BlockingConnectionPool.from_url(
+        settings.REDIS_URL, **_pool_options(decode_responses)
+    )
+    return AsyncInstrumentedRedis(connection_pool=pool)
+
+
+redis_client: redis.Redis = _client(decode_responses=True)
+
+# Cliente asyncio — usado apenas no event loop do modo de execução assíncrono
+async_redis_client: redis.asyncio.Redis = _async_client(decode_responses=True)
+
+# Clientes sem decode — valores binários (ex: embeddings float32)
+redis_binary_client: redis.Redis = _client(decode_responses=False)
+async_redis_binary_client: redis.asyncio.Redis = _async_client(decode_responses=False)
+
+
+# ---------------------------------------------------------------------------
+# Pipelines
+# ---------------------------------------------------------------------------
+
+def pipelined(
+    build: Callable[[redis.client.Pipeline], Any],
+    transaction: bool = False,
+    raise_on_error: bool = True,
+    client: Optional[redis.Redis] = None,
+) -> List[Any]:
+    """
+    Enfileira os comandos de build(pipe) e executa num único round trip.
+    Ex: pipelined(lambda p: p.lrange(k, -20, -1).get(s)) → [itens, resumo]
+    """
+    pipe = (client or redis_client).pipeline(transaction=transaction)
+    build(pipe)
+    return pipe.execute(raise_on_error=raise_on_error)
+
+
+async def apipelined(
+    build: Callable[[redis.asyncio.client.Pipeline], Any],
+    transaction: bool = False,
+    raise_on_error: bool = True,
+    client: Optional[redis.asyncio.Redis] = None,
+) -> List[Any]:
+    """Versão asyncio de pipelined."""
+    pipe = (client or async_redis_client).pipeline(transaction=transaction)
+    build(pipe)
+    return await pipe.execute(raise_on_error=raise_on_error)
+
+
+# ---------------------------------------------------------------------------
+# Encerramento
+# ---------------------------------------------------------------------------
+
+def close_clients() -> None:
+    """Fecha as conexões dos pools síncronos (shutdown)."""
+    for client in (redis_client, redis_binary_client):
+        client.connection_pool.disconnect()
+
+
+async def aclose_clients() -> None:
+    """Fecha as conexões dos pools asyncio (shutdown, no event loop que as usou)."""
+    for client in (async_redis_client, async_redis_binary_client):
+        await client.connection_pool.disconnect()
+
+
+__all__ = [
+    "redis_client",
+    "async_redis_client",
+    "redis_binary_client",
+    "async_redis_binary_client",
+    "pipelined",
+    "apipelined",
+    "close_clients",
+    "aclose_clients",
+]
@@ -0,0 +1,56 @@
+"""
+Perfil de inicialização do processo.
+
+StartupProfile mede cada etapa do startup (imports pesados, compilação do
+grafo, carga de modelos, workers, pré-aquecimento) e quantos módulos novos cada
+uma importou — o relatório sai numa linha de log, ordenado por duração, e em
+startup_step_seconds{step}. Para o detalhamento módulo a módulo dos imports,
+ver scripts/startup_profile.py.
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, NamedTuple
+
+from loguru import logger
+
+from app.core import metrics
+
+
+class StartupStep(NamedTuple):
+    name: str
+    seconds: float
+    new_modules: int
+
+
+class StartupProfile:
+    def __init__(self, started_at: float):
+        """started_at: time.perf_counter() no início do processo (topo do main.py)."""
+        self.started_at = started_at
+        self.steps: List[StartupStep] = []
+
+    @contextmanager
+    def step(self, name: str):
+        modules_before = len(sys.modules)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.steps.append(StartupStep(name, elapsed, len(sys.modules) - modules_before))
+            metrics.set_gauge("startup_step_seconds", elapsed, step=name)
+
+    def record(self, name: str, seconds: float) -> None:
+        """Etapa medida fora do profile (ex: import do main antes do profile existir)."""
+        self.steps.append(StartupStep(name, seconds, 0))
+        metrics.set_gauge("startup_step_seconds", seconds, step=name)
+
+    def report(self) -> None:
+        total = time.perf_counter() - self.started_at
+        metrics.set_gauge("startup_total_seconds", total)
+        breakdown = " | ".join(
+            f"{s.name}={s.seconds * 1000:.0f}ms" + (f" (+{s.new_modules} módulos)" if s.new_modules else "")
+            for s in sorted(self.steps, key=lambda s: s.seconds, reverse=True)
+        )
+        logger.info(f"Startup concluído | total={total * 1000:.0f}ms | {breakdown}")
@@ -1,6 +1,35 @@
-from supabase import create_client, Client
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from app.core import metrics
 from app.core.config import settings
+from app.core.lazy import LazyClient
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+
+def _create() -> "Client":
+    from supabase import create_client
+
+    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+
+
+get_supabase: LazyClient["Client"] = LazyClient("supabase", _create)
+
+
+@contextmanager
+def instrumented(operation: str):
+    """Mede uma requisição ao Supabase: supabase_request_seconds e supabase_errors_total."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        metrics.inc("supabase_errors_total", operation=operation)
+        raise
+    finally:
+        metrics.observe("supabase_request_seconds", time.perf_counter() - start, operation=operation)
 
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
 
-__all__ = ["supabase"]
+__all__ = ["get_supabase", "instrumented"]
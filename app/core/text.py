@@ -0,0 +1,56 @@
+"""
+Normalização de texto para regras e índices.
+
+Tudo que compara texto do usuário com tabelas/léxicos usa a mesma forma
+normalizada: minúsculas, sem acentos (ç → c), sem pontuação/emoji,
+letras repetidas colapsadas ("oiiii" → "oi") e espaços únicos.
+"""
+
+import re
+import unicodedata
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_REPEATED = re.compile(r"([a-z])\1{2,}")
+
+
+def fold_accents(text: str) -> str:
+    """Remove acentos/diacríticos preservando as letras base (NFKD)."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize(text: str) -> str:
+    """Forma canônica usada nas comparações: 'Olááá, Bom DIA!!' → 'ola bom dia'."""
+    folded = fold_accents(text.lower())
+    folded = _REPEATED.sub(r"\1", folded)
+    return _NON_WORD.sub(" ", folded).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens da forma normalizada."""
+    return normalize(text).split()
+
+
+def hashed_ngram_features(text: str, dim: int, n: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Features esparsas do texto normalizado: n-gramas de caracteres + palavras,
+    projetados em `dim` posições por hash estável (crc32 — igual entre
+    processos, então serve para modelos serializados).
+    Retorna (índices únicos, valores L2-normalizados).
+    """
+    text = normalize(text)
+    if not text:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    padded = f" {text} "
+    features = [padded[i:i + n] for i in range(len(padded) - n + 1)]
+    features += [f"w:{w}" for w in text.split()]
+    hashed = np.fromiter((zlib.crc32(f.encode()) % dim for f in features), dtype=np.int64)
+    indices, counts = np.unique(hashed, return_counts=True)
+    values = counts.astype(np.float32)
+    return indices, values / np.linalg.norm(values)
+
@@ -18,6 +18,7 @@ class ClassifiedIntent(TypedDict):
     intencao: str
     confianca: str          # "alta" | "media" | "baixa"
     entidades: Dict[str, Any]
+    camada: str             # "exata" | "padrao" | "lexico" | "modelo" | "llm" | "fallback"
 
 
 class IncomingMessage(BaseModel):
@@ -51,6 +52,9 @@ class AgentState(TypedDict):
 
     # Resultado do agente
     response: Optional[str]
+    # Modo streaming: partes já enfileiradas e se a resposta inteira já foi enviada
+    streamed_parts: int
+    response_streamed: bool
 
     # Flags de controle de fluxo
     should_escalate: bool
@@ -1,7 +1,8 @@
+import hashlib
 import uuid
-from typing import List, Optional
+from typing import Iterable, List, Optional, Set, Tuple
 from loguru import logger
-from app.core.supabase_client import supabase
+from app.core.supabase_client import get_supabase, instrumented
 from app.core.config import settings
 
 
@@ -16,14 +17,15 @@ def search_knowledge(
     """
     try:
         match_threshold = threshold if threshold is not None else settings.RAG_SIMILARITY_THRESHOLD
-        response = supabase.rpc(
-            "match_knowledge",
-            {
-                "query_embedding": embedding,
-                "match_threshold": match_threshold,
-                "match_count": count,
-            },
-        ).execute()
+        with instrumented("match_knowledge"):
+            response = get_supabase().rpc(
+                "match_knowledge",
+                {
+                    "query_embedding": embedding,
+                    "match_threshold": match_threshold,
+                    "match_count": count,
+                },
+            ).execute()
         if response.data:
             return [
                 {
@@ -40,6 +42,11 @@ def search_knowledge(
         return []
 
 
+def content_hash(content: str) -> str:
+    """Hash de dedupe do chunk: sha256 do conteúdo com espaços colapsados."""
+    return hashlib.sha256(" ".join(content.split()).encode()).hexdigest()
+
+
 def insert_knowledge(
     content: str,
     embedding: List[float],
@@ -51,13 +58,93 @@ def insert_knowledge(
         payload = {
             "id": str(uuid.uuid4()),
             "content": content,
-            "embedding": embedding,
+            settings.KNOWLEDGE_EMBEDDING_COLUMN: embedding,
             "category": category,
             "metadata": metadata or {},
+            "content_hash": content_hash(content),
         }
-        supabase.table("knowledge_base").insert(payload).execute()
+        with instrumented("insert"):
+            get_supabase().table("knowledge_base").insert(payload).execute()
         logger.info(f"Conhecimento inserido | category={category}")
         return True
     except Exception as e:
         logger.error(f"insert_knowledge error: {e}")
         return False
+
+
+def existing_content_hashes(hashes: Iterable[str]) -> Set[str]:
+    """Quais dos hashes já existem na knowledge_base (1 requisição por lote). Levanta exceção em falha."""
+    hashes = list(hashes)
+    if not hashes:
+        return set()
+    with instrumented("existing_hashes"):
+        response = (
+            get_supabase().table("knowledge_base")
+            .select("content_hash")
+            .in_("content_hash", hashes)
+            .execute()
+        )
+    return {row["content_hash"] for row in response.data or []}
+
+
+def upsert_knowledge_batch(rows: List[dict]) -> int:
+    """
+    Insere um lote de chunks numa única requisição, ignorando conteúdo já
+    existente (on_conflict=content_hash). Cada row: content, embedding,
+    category, metadata. Retorna quantas linhas foram de fato inseridas
+    (duplicatas ignoradas pelo ON CONFLICT não contam). Levanta exceção em
+    caso de falha (o chamador reenvia).
+    """
+    if not rows:
+        return 0
+    payload = [
+        {
+            "id": str(uuid.uuid4()),
+            "content": row["content"],
+            settings.KNOWLEDGE_EMBEDDING_COLUMN: row["embedding"],
+            "category": row.get("category"),
+            "metadata": row.get("metadata") or {},
+            "content_hash": row.get("content_hash") or content_hash(row["content"]),
+        }
+        for row in rows
+    ]
+    query = get_supabase().table("knowledge_base").upsert(
+        payload,
+        on_conflict="content_hash",
+        ignore_duplicates=True,
+    )
+    # A representação devolve só as linhas inseridas; select enxuto para não
+    # trazer os embeddings de volta
+    query.params = query.params.set("select", "content_hash")
+    with instrumented("upsert"):
+        response = query.execute()
+    return len(response.data or [])
+
+
+def fetch_knowledge_page(
+    after: Optional[Tuple[str, str]] = None,
+    limit: int = 1000,
+) -> Optional[List[dict]]:
+    """
+    Página de chunks em ordem de (updated_at, id), para o índice em memória.
+    after é o cursor (updated_at, id) da última linha vista: só volta o que vem
+    estritamente depois dele (linhas novas, editadas e re-embedadas pelo
+    backfill), usando knowledge_base_updated_at_idx. embedding nulo = linha
+    aguardando (re)embedding. Retorna None em caso de erro (lista vazia = sem mais linhas).
+    """
+    try:
+        query = get_supabase().table("knowledge_base").select(
+            f"id, content, category, embedding:{settings.KNOWLEDGE_EMBEDDING_COLUMN}, updated_at"
+        )
+        if after:
+            updated_at, row_id = after
+            query = query.or_(
+                f'updated_at.gt."{updated_at}",'
+                f'and(updated_at.eq."{updated_at}",id.gt."{row_id}")'
+            )
+        with instrumented("fetch_page"):
+            response = query.order("updated_at").order("id").limit(limit).execute()
+        return response.data or []
+    except Exception as e:
+        logger.error(f"fetch_knowledge_page error | after={after} | {e}")
+        return None
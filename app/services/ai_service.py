@@ -1,16 +1,80 @@
-from langchain_openai import ChatOpenAI
+import time
+from typing import TYPE_CHECKING, Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from app.core import metrics
 from app.core.config import settings
+from app.core.lazy import LazyClient
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Mede cada chamada ao modelo: llm_request_seconds{llm}, llm_first_token_seconds{llm}
+    (streaming), llm_tokens_total{llm, kind} e llm_errors_total{llm}.
+    Roda inline — só contabiliza, sem I/O.
+    """
+
+    run_inline = True
+
+    def __init__(self, llm: str):
+        self.llm = llm
+        self._started: Dict[UUID, float] = {}
+        self._first_token_seen: set = set()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if run_id in self._first_token_seen or run_id not in self._started:
+            return
+        self._first_token_seen.add(run_id)
+        metrics.observe(
+            "llm_first_token_seconds", time.perf_counter() - self._started[run_id], llm=self.llm
+        )
+
+    def _finish(self, run_id: UUID) -> None:
+        self._first_token_seen.discard(run_id)
+        start = self._started.pop(run_id, None)
+        if start is not None:
+            metrics.observe("llm_request_seconds", time.perf_counter() - start, llm=self.llm)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        if prompt is None and response.generations and response.generations[0]:
+            message = getattr(response.generations[0][0], "message", None)
+            metadata = getattr(message, "usage_metadata", None) or {}
+            prompt, completion = metadata.get("input_tokens"), metadata.get("output_tokens")
+        if prompt:
+            metrics.inc("llm_tokens_total", prompt, llm=self.llm, kind="prompt")
+        if completion:
+            metrics.inc("llm_tokens_total", completion, llm=self.llm, kind="completion")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+        metrics.inc("llm_errors_total", llm=self.llm, error=type(error).__name__)
+
+
+def _chat_model(llm: str, temperature: float) -> "ChatOpenAI":
+    # SDK da OpenAI importado só na primeira construção (~0,4s de import)
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model="gpt-4o-mini",
+        openai_api_key=settings.OPENAI_API_KEY,
+        temperature=temperature,
+        callbacks=[LLMMetricsHandler(llm)],
+    )
 
-llm_pro: ChatOpenAI = ChatOpenAI(
-    model="gpt-4o-mini",
-    openai_api_key=settings.OPENAI_API_KEY,
-    temperature=0.1,
-)
 
-llm_flash: ChatOpenAI = ChatOpenAI(
-    model="gpt-4o-mini",
-    openai_api_key=settings.OPENAI_API_KEY,
-    temperature=0.0,
-)
+get_llm_pro: LazyClient["ChatOpenAI"] = LazyClient("llm_pro", lambda: _chat_model("pro", 0.1))
+get_llm_flash: LazyClient["ChatOpenAI"] = LazyClient("llm_flash", lambda: _chat_model("flash", 0.0))
 
-__all__ = ["llm_pro", "llm_flash"]
+__all__ = ["get_llm_pro", "get_llm_flash"]
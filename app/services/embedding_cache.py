@@ -0,0 +1,119 @@
+"""
+Cache de embeddings de consulta em 2 níveis.
+
+- Chave: hash do texto normalizado (app.core.text.normalize) + modelo de
+  embedding — trocar o modelo invalida tudo automaticamente
+- Nível 1: LRU em memória do processo (EMBEDDING_CACHE_LOCAL_SIZE entradas)
+- Nível 2: Redis, vetor em bytes float32 compactos (1536 dims → 6 KB),
+  compartilhado entre processos, TTL EMBEDDING_CACHE_TTL_SECONDS
+- Miss nos dois níveis → chama o provedor e grava nos dois
+- Métricas embedding_cache_requests_total{tier=local|redis|miss} e
+  embedding_request_seconds{model} (chamadas ao provedor)
+
+Falhas do Redis nunca impedem a geração do embedding.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_client import async_redis_binary_client, redis_binary_client
+from app.core.text import normalize
+
+_local: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def cache_key(query: str, model: str) -> str:
+    digest = hashlib.sha1(normalize(query).encode()).hexdigest()
+    return f"emb:{model}:{digest}"
+
+
+def _local_get(key: str) -> Optional[np.ndarray]:
+    with _lock:
+        vector = _local.get(key)
+        if vector is not None:
+            _local.move_to_end(key)
+        return vector
+
+
+def _local_put(key: str, vector: np.ndarray) -> None:
+    with _lock:
+        _local[key] = vector
+        _local.move_to_end(key)
+        while len(_local) > settings.EMBEDDING_CACHE_LOCAL_SIZE:
+            _local.popitem(last=False)
+
+
+def _encode(embedding: List[float]) -> np.ndarray:
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def get_embedding(query: str, model: str, embed: Callable[[str], List[float]]) -> List[float]:
+    """Embedding da query via LRU → Redis → provedor (embed)."""
+    key = cache_key(query, model)
+
+    vector = _local_get(key)
+    if vector is not None:
+        metrics.inc("embedding_cache_requests_total", tier="local")
+        return vector.tolist()
+
+    try:
+        raw = redis_binary_client.get(key)
+        if raw:
+            vector = np.frombuffer(raw, dtype=np.float32)
+            _local_put(key, vector)
+            metrics.inc("embedding_cache_requests_total", tier="redis")
+            return vector.tolist()
+    except Exception as e:
+        logger.warning(f"Cache de embedding indisponível (leitura) | {e}")
+
+    metrics.inc("embedding_cache_requests_total", tier="miss")
+    with metrics.timer("embedding_request_seconds", model=model):
+        vector = _encode(embed(query))
+    _local_put(key, vector)
+    try:
+        redis_binary_client.setex(key, settings.EMBEDDING_CACHE_TTL_SECONDS, vector.tobytes())
+    except Exception as e:
+        logger.warning(f"Cache de embedding indisponível (escrita) | {e}")
+    return vector.tolist()
+
+
+async def aget_embedding(
+    query: str, model: str, aembed: Callable[[str], Awaitable[List[float]]]
+) -> List[float]:
+    """Versão asyncio de get_embedding (redis.asyncio + aembed)."""
+    key = cache_key(query, model)
+
+    vector = _local_get(key)
+    if vector is not None:
+        metrics.inc("embedding_cache_requests_total", tier="local")
+        return vector.tolist()
+
+    try:
+        raw = await async_redis_binary_client.get(key)
+        if raw:
+            vector = np.frombuffer(raw, dtype=np.float32)
+            _local_put(key, vector)
+            metrics.inc("embedding_cache_requests_total", tier="redis")
+            return vector.tolist()
+    except Exception as e:
+        logger.warning(f"Cache de embedding indisponível (leitura) | {e}")
+
+    metrics.inc("embedding_cache_requests_total", tier="miss")
+    with metrics.timer("embedding_request_seconds", model=model):
+        vector = _encode(await aembed(query))
+    _local_put(key, vector)
+    try:
+        await async_redis_binary_client.setex(
+            key, settings.EMBEDDING_CACHE_TTL_SECONDS, vector.tobytes()
+        )
+    except Exception as e:
+        logger.warning(f"Cache de embedding indisponível (escrita) | {e}")
+    return vector.tolist()
@@ -0,0 +1,256 @@
+"""
+Motor de regras de escalação — gatilhos compilados num autômato Aho-Corasick.
+
+- Texto e gatilhos na mesma forma normalizada (app.core.text.normalize):
+  "Reclamação!!" e "reclamacao" casam igual
+- Todos os gatilhos viram um único autômato: a busca é linear no tamanho da
+  mensagem, independente da quantidade de regras
+- Gatilho casa palavras inteiras; terminado em "*" casa prefixo de palavra
+  ("urgent*" → "urgente", "urgentemente")
+- Cada regra tem peso (negativo reduz a pontuação); a mensagem escala
+  quando a soma dos pesos das regras casadas ≥ threshold
+- Negação: termo de negação até `negation_window` palavras antes do gatilho,
+  na mesma oração, anula o casamento ("não é urgente"). A janela para na
+  pontuação de oração (, . ; ! ?): "não, quero um humano" escala. Regras
+  com negatable=false nunca são anuladas — pedidos explícitos de humano ou
+  atendente escalam mesmo com negação por perto
+- Regras ficam em JSON no Redis (RULES_KEY); uma thread daemon confere a
+  cada ESCALATION_RULES_REFRESH_SECONDS e recompila só quando o JSON muda.
+  Sem regras no Redis (ou JSON inválido), valem as DEFAULT_RULES
+- Cada compilação publica um snapshot imutável — avaliação não usa lock
+"""
+
+import bisect
+import hashlib
+import json
+import re
+import threading
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.core.text import normalize
+
+RULES_KEY = "escalation:rules"
+
+# Pontuação que encerra a oração — a janela de negação não atravessa
+_CLAUSE_BREAK = re.compile(r"[,.;!?]+")
+
+DEFAULT_RULES: dict = {
+    "threshold": 1.0,
+    "negation_window": 3,
+    "negations": ["nao", "nem", "nunca", "sem"],
+    "rules": [
+        {"pattern": "falar com pessoa", "weight": 1.0},
+        {"pattern": "atendente*", "weight": 1.0, "negatable": False},
+        {"pattern": "humano*", "weight": 1.0, "negatable": False},
+        {"pattern": "gerente*", "weight": 1.0},
+        {"pattern": "urgent*", "weight": 1.0},
+        {"pattern": "reclama*", "weight": 1.0},
+        {"pattern": "corretor*", "weight": 1.0},
+    ],
+}
+
+
+class Rule(NamedTuple):
+    pattern: str
+    weight: float
+    negatable: bool
+
+
+class Evaluation(NamedTuple):
+    score: float
+    matched: List[str]
+    negated: List[str]
+    escalate: bool
+
+
+class _Automaton:
+    """Aho-Corasick sobre caracteres: goto em dicts, falhas por BFS, saídas mescladas."""
+
+    def __init__(self, keywords: List[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[int]] = [[]]
+        for index, keyword in enumerate(keywords):
+            state = 0
+            for char in keyword:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = nxt
+            self.out[state].append(index)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(char, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter_matches(self, text: str):
+        """(índice da palavra-chave, posição final) de cada ocorrência, inclusive sobrepostas."""
+        state = 0
+        goto, fail, out = self.goto, self.fail, self.out
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                yield index, position
+
+
+class RuleSet:
+    """Regras compiladas. Palavra-chave = ' padrão ' (inteira) ou ' padrão' (prefixo)."""
+
+    def __init__(self, config: dict):
+        self.threshold = float(config.get("threshold", 1.0))
+        self.negation_window = int(config.get("negation_window", 3))
+        self.negations = frozenset(normalize(n) for n in config.get("negations", []) if normalize(n))
+
+        rules: List[Rule] = []
+        keywords: List[str] = []
+        for raw in config.get("rules", []):
+            pattern = str(raw["pattern"]).strip()
+            prefix = pattern.endswith("*")
+            text = normalize(pattern.rstrip("*"))
+            if not text:
+                continue
+            rules.append(Rule(text + ("*" if prefix else ""), float(raw.get("weight", 1.0)),
+                              bool(raw.get("negatable", True))))
+            keywords.append(f" {text}" if prefix else f" {text} ")
+        self.rules = rules
+        self._keywords = keywords
+        self._automaton = _Automaton(keywords)
+
+    def _negated(
+        self, words: List[str], word_clauses: List[int], word_starts: List[int], start: int
+    ) -> bool:
+        word_index = bisect.bisect_left(word_starts, start)
+        clause = word_clauses[word_index]
+        return any(
+            words[i] in self.negations and word_clauses[i] == clause
+            for i in range(max(0, word_index - self.negation_window), word_index)
+        )
+
+    def evaluate(self, message: str) -> Evaluation:
+        # Orações separadas antes de normalizar (normalize remove a pontuação)
+        clauses = [c for c in (normalize(part) for part in _CLAUSE_BREAK.split(message)) if c]
+        text = f" {' '.join(clauses)} "
+        words, word_clauses = [], []
+        for clause_index, clause in enumerate(clauses):
+            clause_words = clause.split()
+            words += clause_words
+            word_clauses += [clause_index] * len(clause_words)
+        # Posição (no texto com padding) do espaço que antecede cada palavra
+        word_starts, position = [], 0
+        for word in words:
+            position = text.index(word, position)
+            word_starts.append(position - 1)
+            position += len(word)
+
+        matched: Dict[int, bool] = {}
+        for index, end in self._automaton.iter_matches(text):
+            start = end - len(self._keywords[index]) + 1
+            rule = self.rules[index]
+            negated = rule.negatable and self._negated(words, word_clauses, word_starts, start)
+            # Basta uma ocorrência não negada para a regra valer
+            matched[index] = matched.get(index, False) or not negated
+
+        score = sum(self.rules[i].weight for i, ok in matched.items() if ok)
+        return Evaluation(
+            score=score,
+            matched=[self.rules[i].pattern for i, ok in matched.items() if ok],
+            negated=[self.rules[i].pattern for i, ok in matched.items() if not ok],
+            escalate=score >= self.threshold,
+        )
+
+
+_ruleset: RuleSet = RuleSet(DEFAULT_RULES)
+_source_digest: Optional[str] = None
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+
+
+def evaluate(message: str) -> Evaluation:
+    """Avalia a mensagem contra o snapshot de regras vigente."""
+    return _ruleset.evaluate(message)
+
+
+def reload() -> bool:
+    """Lê RULES_KEY e recompila se o JSON mudou. Retorna True se recompilou."""
+    global _ruleset, _source_digest
+    raw = redis_client.get(RULES_KEY)
+    digest = hashlib.sha1(raw.encode()).hexdigest() if raw else None
+    if digest == _source_digest:
+        return False
+
+    try:
+        config = json.loads(raw) if raw else DEFAULT_RULES
+        ruleset = RuleSet(config)
+    except (ValueError, KeyError, TypeError) as e:
+        logger.error(f"Regras de escalação inválidas em {RULES_KEY} — mantendo as atuais | {e}")
+        _source_digest = digest
+        return False
+
+    _ruleset, _source_digest = ruleset, digest
+    metrics.set_gauge("escalation_rules_loaded", len(ruleset.rules))
+    logger.info(
+        f"Regras de escalação compiladas | {len(ruleset.rules)} regra(s) "
+        f"| threshold={ruleset.threshold} | origem={'redis' if raw else 'padrao'}"
+    )
+    return True
+
+
+def publish(config: dict) -> Tuple[int, float]:
+    """Valida (compila) e grava as regras no Redis. Retorna (regras, threshold)."""
+    ruleset = RuleSet(config)
+    redis_client.set(RULES_KEY, json.dumps(config, ensure_ascii=False))
+    return len(ruleset.rules), ruleset.threshold
+
+
+# ---------------------------------------------------------------------------
+# Ciclo de vida da thread de recarga
+# ---------------------------------------------------------------------------
+
+def _run() -> None:
+    while True:
+        try:
+            reload()
+        except Exception as e:
+            logger.error(f"Erro ao recarregar regras de escalação | {e}")
+        if _stop.wait(settings.ESCALATION_RULES_REFRESH_SECONDS):
+            return
+
+
+def start() -> None:
+    """Carrega as regras do Redis e inicia a recarga em thread daemon (idempotente)."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _stop.clear()
+            _thread = threading.Thread(target=_run, name="escalation-rules", daemon=True)
+            _thread.start()
+
+
+def stop(timeout: float = 5.0) -> None:
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=timeout)
+        _thread = None
@@ -18,3 +18,18 @@ def trigger_escalation(phone: str, name: str, last_message: str) -> None:
         )
     except Exception as e:
         logger.error(f"trigger_escalation error | phone={phone} | {e}")
+
+
+async def atrigger_escalation(phone: str, name: str, last_message: str) -> None:
+    """Versão asyncio de trigger_escalation."""
+    try:
+        await whatsapp_service.aforward_to_human(
+            from_phone=phone,
+            human_phone=settings.HUMAN_PHONE,
+            context=last_message,
+        )
+        logger.info(
+            f"Escalação disparada | phone={phone} | name={name or 'desconhecido'}"
+        )
+    except Exception as e:
+        logger.error(f"trigger_escalation error | phone={phone} | {e}")
@@ -0,0 +1,310 @@
+"""
+Compactação do histórico dos agentes por orçamento de tokens.
+
+O prompt de cada agente leva:
+- as mensagens mais recentes, literais, até caber no orçamento do agente
+  (token_budget menos o espaço reservado ao resumo); sempre ao menos o
+  último turno
+- um resumo acumulado das mensagens mais antigas, guardado no Redis em
+  summary:{phone}_{agent} como {"text", "until_ts"}
+
+O resumo é atualizado de forma incremental e fora do caminho crítico: quando
+há mensagens fora da janela literal mais novas que until_ts, o turno usa o
+resumo que já existe — com essas mensagens ainda literais no prompt, até o
+resumo cobri-las — e agenda num pool de threads a incorporação delas (uma
+atualização por chave por vez, via lock no Redis).
+Mensagens são identificadas pelo campo ts gravado em memory_service; as
+gravadas antes dele recebem um ts sintético na leitura (_with_ts).
+
+Tokens contados com tiktoken (encoding do modelo). O encoding é carregado
+no aquecimento (load_tokenizer — pode baixar o arquivo BPE), nunca no
+caminho do turno: até lá, ou se não carregar, vale a estimativa de ~4
+caracteres por token.
+"""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+import redis
+from langchain_core.messages import HumanMessage, SystemMessage
+from loguru import logger
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_client import apipelined, pipelined, redis_client
+from app.services import memory_service
+from app.services.ai_service import get_llm_flash
+
+_TOKENIZER_MODEL = "gpt-4o-mini"
+_MESSAGE_OVERHEAD_TOKENS = 4
+_MIN_VERBATIM = 2
+_LOCK_TTL = 120
+# ts sintético das mensagens sem ts: abaixo de qualquer timestamp real, acima
+# do until_ts inicial (0.0)
+_LEGACY_TS = 1.0
+_LEGACY_TS_STEP = 1e-6
+
+_SUMMARY_PROMPT = (
+    "Você mantém o resumo de uma conversa entre um cliente e a Ana, corretora virtual "
+    "de uma imobiliária. Atualize o resumo existente incorporando as novas mensagens.\n"
+    "Preserve fatos úteis para o atendimento: o que o cliente busca (tipo, finalidade, "
+    "bairro, quartos, faixa de valor), datas e horários combinados, documentos "
+    "mencionados, dúvidas em aberto e o que já foi respondido.\n"
+    "Escreva em português, em tópicos curtos, no máximo {max_tokens} tokens. "
+    "Responda apenas com o resumo atualizado."
+)
+
+
+class CompactHistory(NamedTuple):
+    summary: Optional[str]
+    messages: List[dict]
+
+
+# ---------------------------------------------------------------------------
+# Contagem de tokens
+# ---------------------------------------------------------------------------
+
+_encoding = None
+_encoding_loaded = False
+_encoding_loading = False
+_encoding_lock = threading.Lock()
+
+
+def load_tokenizer() -> bool:
+    """
+    Carrega o encoding do tiktoken (bloqueante — o primeiro uso pode baixar o
+    arquivo BPE). Chamado no aquecimento do web e do worker. Retorna False se
+    ficou na estimativa por caracteres.
+    """
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.encoding_for_model(_TOKENIZER_MODEL)
+            except Exception as e:
+                logger.warning(f"tiktoken indisponível — estimando tokens por caracteres | {e}")
+            _encoding_loaded = True
+    return _encoding is not None
+
+
+def _get_encoding():
+    global _encoding_loading
+    if _encoding_loaded:
+        return _encoding
+    # Sem aquecimento: carrega numa thread e estima enquanto isso — o turno
+    # (e o event loop, no modo async) nunca espera pelo download do BPE
+    with _encoding_lock:
+        if not _encoding_loading:
+            _encoding_loading = True
+            threading.Thread(target=load_tokenizer, name="tiktoken-load", daemon=True).start()
+    return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _message_tokens(message: dict) -> int:
+    return count_tokens(message.get("content", "")) + _MESSAGE_OVERHEAD_TOKENS
+
+
+# ---------------------------------------------------------------------------
+# Seleção da janela literal
+# ---------------------------------------------------------------------------
+
+def _summary_key(phone: str, agent_name: str) -> str:
+    return f"summary:{phone}_{agent_name}"
+
+
+def _lock_key(phone: str, agent_name: str) -> str:
+    return f"summary:lock:{phone}_{agent_name}"
+
+
+def _parse_summary(raw: Optional[str]) -> Tuple[Optional[str], float]:
+    if not raw:
+        return None, 0.0
+    data = json.loads(raw)
+    return data.get("text") or None, float(data.get("until_ts", 0.0))
+
+
+def _with_ts(history: List[dict]) -> List[dict]:
+    """
+    Mensagens gravadas antes do campo ts formam um prefixo da lista (toda
+    mensagem nova tem ts). Recebem ts crescentes contados a partir do fim desse
+    prefixo — estáveis entre leituras com janelas diferentes e após o LTRIM —
+    para entrarem no resumo como as demais.
+    """
+    legacy = next((i for i, m in enumerate(history) if "ts" in m), len(history))
+    for i in range(legacy):
+        history[i]["ts"] = _LEGACY_TS - (legacy - 1 - i) * _LEGACY_TS_STEP
+    return history
+
+
+def _split(history: List[dict], budget: int) -> Tuple[List[dict], List[dict]]:
+    """(mais antigas, literais): a cauda que cabe no orçamento, mínimo _MIN_VERBATIM."""
+    used, cut = 0, len(history)
+    for i in range(len(history) - 1, -1, -1):
+        used += _message_tokens(history[i])
+        if used > budget and len(history) - i > _MIN_VERBATIM:
+            break
+        cut = i
+    return history[:cut], history[cut:]
+
+
+def trim_to_budget(history: List[dict], token_budget: int) -> List[dict]:
+    """Só a cauda literal que cabe em token_budget (sem resumo)."""
+    return _split(history, token_budget)[1]
+
+
+def _compact(
+    phone: str,
+    agent_name: str,
+    history: List[dict],
+    raw_summary: Optional[str],
+    token_budget: int,
+    max_msgs: int,
+    ttl: int,
+) -> CompactHistory:
+    history = _with_ts(history)
+    summary, until_ts = _parse_summary(raw_summary)
+    reserved = count_tokens(summary) + _MESSAGE_OVERHEAD_TOKENS if summary else 0
+    older, verbatim = _split(history, max(token_budget - reserved, 0))
+
+    # Fora da janela, mas ainda não incorporadas ao resumo: seguem literais no
+    # prompt até a atualização em background cobri-las
+    unsummarized = [m for m in older if m["ts"] > until_ts]
+    summarized = older[:len(older) - len(unsummarized)]
+    if summarized:
+        saved = sum(_message_tokens(m) for m in summarized) - reserved
+        metrics.inc("history_compacted_turns_total", agent=agent_name)
+        if saved > 0:
+            metrics.inc("history_tokens_saved_total", saved, agent=agent_name)
+
+    # Mensagens antes da janela literal ainda não resumidas (inclusive as que
+    # já saíram da janela de leitura de max_msgs)
+    pending = unsummarized or (len(history) >= max_msgs and history[0]["ts"] > until_ts)
+    if pending and verbatim:
+        _executor.submit(_update_summary, phone, agent_name, verbatim[0]["ts"], ttl)
+
+    return CompactHistory(summary, unsummarized + verbatim)
+
+
+def load_history(
+    phone: str,
+    agent_name: str,
+    max_msgs: int,
+    token_budget: int,
+    ttl: int,
+) -> CompactHistory:
+    """
+    Histórico compactado do agente: resumo das mensagens antigas + cauda literal
+    dentro de token_budget. Lê lista e resumo num único round trip.
+    """
+    if not settings.HISTORY_COMPACTION_ENABLED:
+        return CompactHistory(None, memory_service.get_agent_history(phone, agent_name, max_msgs))
+    try:
+        raw_items, raw_summary = pipelined(
+            lambda p: p.lrange(f"{phone}_{agent_name}", -max_msgs, -1)
+            .get(_summary_key(phone, agent_name)),
+            raise_on_error=False,
+        )
+        if isinstance(raw_items, redis.ResponseError):
+            history = memory_service.get_agent_history(phone, agent_name, max_msgs)
+        else:
+            history = [json.loads(r) for r in raw_items]
+        if isinstance(raw_summary, Exception):
+            raw_summary = None
+        return _compact(phone, agent_name, history, raw_summary, token_budget, max_msgs, ttl)
+    except Exception as e:
+        logger.error(f"load_history error | phone={phone} | agent={agent_name} | {e}")
+        return CompactHistory(None, [])
+
+
+async def aload_history(
+    phone: str,
+    agent_name: str,
+    max_msgs: int,
+    token_budget: int,
+    ttl: int,
+) -> CompactHistory:
+    """Versão asyncio de load_history (o resumo continua sendo gerado no pool de threads)."""
+    if not settings.HISTORY_COMPACTION_ENABLED:
+        return CompactHistory(
+            None, await memory_service.aget_agent_history(phone, agent_name, max_msgs)
+        )
+    try:
+        raw_items, raw_summary = await apipelined(
+            lambda p: p.lrange(f"{phone}_{agent_name}", -max_msgs, -1)
+            .get(_summary_key(phone, agent_name)),
+            raise_on_error=False,
+        )
+        if isinstance(raw_items, redis.ResponseError):
+            history = await memory_service.aget_agent_history(phone, agent_name, max_msgs)
+        else:
+            history = [json.loads(r) for r in raw_items]
+        if isinstance(raw_summary, Exception):
+            raw_summary = None
+        return _compact(phone, agent_name, history, raw_summary, token_budget, max_msgs, ttl)
+    except Exception as e:
+        logger.error(f"load_history error | phone={phone} | agent={agent_name} | {e}")
+        return CompactHistory(None, [])
+
+
+# ---------------------------------------------------------------------------
+# Atualização incremental do resumo (fora do caminho crítico)
+# ---------------------------------------------------------------------------
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.HISTORY_SUMMARY_WORKERS, thread_name_prefix="history-summary"
+)
+
+
+def _format_messages(messages: List[dict]) -> str:
+    labels = {"user": "Cliente", "assistant": "Ana"}
+    return "\n".join(f"{labels.get(m['role'], m['role'])}: {m['content']}" for m in messages)
+
+
+def _update_summary(phone: str, agent_name: str, boundary_ts: float, ttl: int) -> None:
+    """Incorpora ao resumo as mensagens com until_ts < ts < boundary_ts."""
+    lock_key = _lock_key(phone, agent_name)
+    if not redis_client.set(lock_key, "1", nx=True, ex=_LOCK_TTL):
+        return
+    try:
+        summary, until_ts = _parse_summary(redis_client.get(_summary_key(phone, agent_name)))
+        history = _with_ts(memory_service.get_agent_history(
+            phone, agent_name, memory_service.AGENT_HISTORY_MAX
+        ))
+        new_messages = [m for m in history if until_ts < m["ts"] < boundary_ts]
+        if not new_messages:
+            return
+
+        prompt = [
+            SystemMessage(content=_SUMMARY_PROMPT.format(
+                max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS
+            )),
+            HumanMessage(content=(
+                f"Resumo atual:\n{summary or '(vazio)'}\n\n"
+                f"Novas mensagens:\n{_format_messages(new_messages)}"
+            )),
+        ]
+        result = get_llm_flash().invoke(prompt, max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS)
+        payload = {"text": result.content.strip(), "until_ts": new_messages[-1]["ts"]}
+        redis_client.set(_summary_key(phone, agent_name), json.dumps(payload), ex=ttl)
+
+        metrics.inc("history_summary_updates_total", agent=agent_name, result="ok")
+        logger.info(
+            f"Resumo do histórico atualizado | phone={phone} | agent={agent_name} "
+            f"| +{len(new_messages)} mensagem(ns)"
+        )
+    except Exception as e:
+        metrics.inc("history_summary_updates_total", agent=agent_name, result="error")
+        logger.error(f"Erro ao atualizar resumo | phone={phone} | agent={agent_name} | {e}")
+    finally:
+        redis_client.delete(lock_key)
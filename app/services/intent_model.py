@@ -0,0 +1,229 @@
+"""
+Modelo local de intenção — regressão softmax sobre n-gramas com hash.
+
+Treinado com os rótulos que o LLM gravou na tabela messages
+(scripts/train_intent_model.py) e servido dentro de identify_intent como
+camada "modelo", entre as regras e o LLM:
+- Features: hashed_ngram_features (crc32, estáveis entre processos)
+- Predição: W[índices]ᵀ·valores + b → softmax com temperatura calibrada
+  num conjunto de validação (probabilidade ≈ taxa de acerto)
+- Só decide quando a probabilidade calibrada ≥ INTENT_MODEL_MIN_CONFIDENCE;
+  abaixo disso a mensagem segue para o LLM
+- Serializado em .npz (INTENT_MODEL_PATH); sem arquivo, a camada fica inativa
+"""
+
+import json
+import os
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.core.text import hashed_ngram_features
+from app.models.schemas import ClassifiedIntent
+
+DEFAULT_DIM = 2 ** 14
+
+# Probabilidade calibrada → escala de confiança usada pelo classificador LLM
+_CONFIDENCE_LEVELS = ((0.85, "alta"), (0.6, "media"))
+
+
+def confidence_label(probability: float) -> str:
+    for threshold, label in _CONFIDENCE_LEVELS:
+        if probability >= threshold:
+            return label
+    return "baixa"
+
+
+class SparseBatch:
+    """Matriz esparsa CSR mínima das features de um lote de textos."""
+
+    def __init__(self, texts: Sequence[str], dim: int):
+        features = [hashed_ngram_features(t, dim) for t in texts]
+        lengths = np.array([len(idx) for idx, _ in features], dtype=np.int64)
+        self.rows = len(texts)
+        self.indptr = np.concatenate(([0], np.cumsum(lengths)))
+        self.indices = np.concatenate([idx for idx, _ in features] or [np.zeros(0, np.int64)])
+        self.values = np.concatenate([val for _, val in features] or [np.zeros(0, np.float32)])
+        self.row_of = np.repeat(np.arange(self.rows), lengths)
+
+    def dot(self, weights: np.ndarray) -> np.ndarray:
+        """X · W → (linhas, classes)."""
+        out = np.zeros((self.rows, weights.shape[1]), dtype=np.float32)
+        np.add.at(out, self.row_of, weights[self.indices] * self.values[:, None])
+        return out
+
+    def tdot(self, grad: np.ndarray, dim: int) -> np.ndarray:
+        """Xᵀ · G → (dim, classes)."""
+        out = np.zeros((dim, grad.shape[1]), dtype=np.float32)
+        np.add.at(out, self.indices, grad[self.row_of] * self.values[:, None])
+        return out
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class IntentModel:
+    def __init__(
+        self,
+        weights: np.ndarray,
+        bias: np.ndarray,
+        labels: List[str],
+        temperature: float = 1.0,
+        metadata: Optional[dict] = None,
+    ):
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.labels = list(labels)
+        self.temperature = float(temperature)
+        self.metadata = metadata or {}
+        self.dim = self.weights.shape[0]
+
+    def logits(self, batch: SparseBatch) -> np.ndarray:
+        return batch.dot(self.weights) + self.bias
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        return _softmax(self.logits(SparseBatch(texts, self.dim)) / self.temperature)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Intenção mais provável e sua probabilidade calibrada (caminho de 1 mensagem)."""
+        indices, values = hashed_ngram_features(text, self.dim)
+        logits = values @ self.weights[indices] + self.bias
+        probabilities = _softmax(logits[None, :] / self.temperature)[0]
+        best = int(np.argmax(probabilities))
+        return self.labels[best], float(probabilities[best])
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            labels=np.array(self.labels),
+            temperature=np.array(self.temperature),
+            metadata=np.array(json.dumps(self.metadata)),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IntentModel":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                weights=data["weights"],
+                bias=data["bias"],
+                labels=[str(label) for label in data["labels"]],
+                temperature=float(data["temperature"]),
+                metadata=json.loads(str(data["metadata"])),
+            )
+
+
+# ---------------------------------------------------------------------------
+# Treino
+# ---------------------------------------------------------------------------
+
+def train(
+    texts: Sequence[str],
+    labels: Sequence[str],
+    dim: int = DEFAULT_DIM,
+    epochs: int = 150,
+    learning_rate: float = 0.1,
+    l2: float = 1e-5,
+) -> IntentModel:
+    """Regressão softmax em lote completo com Adam + L2. Temperatura fica em 1.0."""
+    classes = sorted(set(labels))
+    y = np.array([classes.index(label) for label in labels])
+    batch = SparseBatch(texts, dim)
+    onehot = np.eye(len(classes), dtype=np.float32)[y]
+
+    weights = np.zeros((dim, len(classes)), dtype=np.float32)
+    bias = np.log(onehot.mean(axis=0) + 1e-9).astype(np.float32)
+    m_w, v_w = np.zeros_like(weights), np.zeros_like(weights)
+    m_b, v_b = np.zeros_like(bias), np.zeros_like(bias)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+    for step in range(1, epochs + 1):
+        grad_logits = (_softmax(batch.dot(weights) + bias) - onehot) / len(y)
+        grad_w = batch.tdot(grad_logits, dim) + l2 * weights
+        grad_b = grad_logits.sum(axis=0)
+
+        for param, grad, m, v in ((weights, grad_w, m_w, v_w), (bias, grad_b, m_b, v_b)):
+            m *= beta1
+            m += (1 - beta1) * grad
+            v *= beta2
+            v += (1 - beta2) * grad * grad
+            m_hat = m / (1 - beta1 ** step)
+            v_hat = v / (1 - beta2 ** step)
+            param -= learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+
+    return IntentModel(weights, bias, classes)
+
+
+def calibrate(model: IntentModel, texts: Sequence[str], labels: Sequence[str]) -> float:
+    """Escolhe a temperatura que minimiza a log-loss na validação (temperature scaling)."""
+    logits = model.logits(SparseBatch(texts, model.dim))
+    index = {label: i for i, label in enumerate(model.labels)}
+    known = [i for i, label in enumerate(labels) if label in index]
+    if not known:
+        return model.temperature
+    y = np.array([index[labels[i]] for i in known])
+    logits = logits[known]
+
+    best_t, best_nll = 1.0, float("inf")
+    for t in np.geomspace(0.05, 10.0, 120):
+        probabilities = _softmax(logits / t)
+        nll = -np.mean(np.log(probabilities[np.arange(len(y)), y] + 1e-12))
+        if nll < best_nll:
+            best_t, best_nll = float(t), nll
+    model.temperature = best_t
+    return best_t
+
+
+# ---------------------------------------------------------------------------
+# Serviço — camada "modelo" do identify_intent
+# ---------------------------------------------------------------------------
+
+_model: Optional[IntentModel] = None
+_loaded = False
+_load_lock = threading.Lock()
+
+
+def get_model() -> Optional[IntentModel]:
+    """Carrega o modelo de INTENT_MODEL_PATH uma única vez. None se ausente/desabilitado."""
+    global _model, _loaded
+    if _loaded:
+        return _model
+    with _load_lock:
+        if not _loaded:
+            path = settings.INTENT_MODEL_PATH
+            if settings.INTENT_MODEL_ENABLED and os.path.exists(path):
+                try:
+                    _model = IntentModel.load(path)
+                    logger.info(
+                        f"Modelo local de intenção carregado | {path} "
+                        f"| classes={len(_model.labels)} | T={_model.temperature:.2f}"
+                    )
+                except Exception as e:
+                    logger.error(f"Erro ao carregar modelo de intenção | {path} | {e}")
+            _loaded = True
+    return _model
+
+
+def classify(message: str) -> Optional[ClassifiedIntent]:
+    """Classifica com o modelo local quando a confiança calibrada é suficiente."""
+    model = get_model()
+    if model is None:
+        return None
+
+    intent, probability = model.predict(message)
+    if probability < settings.INTENT_MODEL_MIN_CONFIDENCE:
+        return None
+    return {
+        "intencao": intent,
+        "confianca": confidence_label(probability),
+        "entidades": {},
+        "camada": "modelo",
+    }
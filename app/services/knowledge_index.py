@@ -0,0 +1,252 @@
+"""
+Índice vetorial em memória espelhando a tabela knowledge_base.
+
+A base de conhecimento é pequena: manter os embeddings numa matriz NumPy
+normalizada troca a RPC match_knowledge (HTTP por turno) por um produto
+matriz-vetor no próprio processo, com a mesma semântica:
+similaridade de cosseno >= threshold, ordenada, limitada a count.
+
+- start() carrega a tabela inteira em background (paginada); até ficar
+  pronto — ou enquanto estiver vazio — search() retorna None e o chamador
+  usa a RPC
+- Refresh incremental a cada KNOWLEDGE_INDEX_REFRESH_SECONDS por keyset
+  (updated_at, id) > última linha vista: linhas novas, editadas e re-embedadas
+  pelo scripts/migrate_embeddings.py (embedding nulo tira a linha do índice)
+- Recarga completa a cada KNOWLEDGE_INDEX_FULL_RELOAD_SECONDS para refletir
+  remoções
+- Cada carga publica um snapshot imutável — leituras não usam lock
+"""
+
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.core import metrics
+from app.core.config import settings
+from app.repositories import knowledge_repo
+
+_PAGE_SIZE = 1000
+
+
+class _Snapshot:
+    def __init__(self, rows: Dict[str, dict], cursor: Optional[Tuple[str, str]]):
+        self.rows = list(rows.values())
+        self.by_id = dict(rows)
+        vectors = [r["vector"] for r in self.rows]
+        self.matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        self.dim = self.matrix.shape[1] if vectors else 0
+        # (updated_at, id) da última linha lida, indexada ou não: o refresh segue daqui
+        self.cursor = cursor
+
+
+_snapshot: Optional[_Snapshot] = None
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+
+
+def _parse_row(row: dict) -> Optional[dict]:
+    """Linha do PostgREST → entrada do índice (pgvector chega como texto '[...]'). None = fora do índice."""
+    embedding = row.get("embedding")
+    if embedding is None or not row.get("content"):
+        return None
+    if isinstance(embedding, str):
+        embedding = json.loads(embedding)
+
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if not norm:
+        return None
+    return {
+        "id": row["id"],
+        "content": row["content"],
+        "category": row.get("category"),
+        "updated_at": row.get("updated_at"),
+        "vector": vector / norm,
+    }
+
+
+def _fetch(
+    after: Optional[Tuple[str, str]],
+) -> Optional[Tuple[Dict[str, dict], Set[str], Optional[Tuple[str, str]]]]:
+    """
+    Lê todas as páginas depois do cursor after (keyset em (updated_at, id)):
+    (linhas indexáveis, ids sem embedding/conteúdo, novo cursor). None se
+    alguma página falhar.
+    """
+    rows: Dict[str, dict] = {}
+    dropped: Set[str] = set()
+    cursor = after
+    while True:
+        page = knowledge_repo.fetch_knowledge_page(cursor, _PAGE_SIZE)
+        if page is None:
+            return None
+        for raw in page:
+            parsed = _parse_row(raw)
+            if parsed:
+                rows[parsed["id"]] = parsed
+                dropped.discard(parsed["id"])
+            else:
+                rows.pop(raw["id"], None)
+                dropped.add(raw["id"])
+        if page:
+            cursor = (page[-1]["updated_at"], page[-1]["id"])
+        if len(page) < _PAGE_SIZE:
+            return rows, dropped, cursor
+
+
+def _publish(rows: Dict[str, dict], cursor: Optional[Tuple[str, str]]) -> None:
+    global _snapshot
+    dims = {len(r["vector"]) for r in rows.values()}
+    if len(dims) > 1:
+        # Coluna em migração: mantém só a dimensão majoritária
+        majority = max(dims, key=lambda d: sum(len(r["vector"]) == d for r in rows.values()))
+        rows = {k: r for k, r in rows.items() if len(r["vector"]) == majority}
+    _snapshot = _Snapshot(rows, cursor)
+    metrics.set_gauge("knowledge_index_rows", len(_snapshot.rows))
+
+
+def reload() -> bool:
+    """Recarga completa. Mantém o snapshot anterior se a leitura falhar."""
+    start_time = time.perf_counter()
+    fetched = _fetch(None)
+    if fetched is None:
+        return False
+    _publish(fetched[0], fetched[2])
+    logger.info(
+        f"Índice de conhecimento carregado | {len(_snapshot.rows)} chunk(s) "
+        f"| dim={_snapshot.dim} | {time.perf_counter() - start_time:.2f}s"
+    )
+    return True
+
+
+def refresh() -> int:
+    """
+    Incremental: incorpora linhas depois do cursor (updated_at, id) e tira as
+    que perderam o embedding. Retorna quantas linhas mudaram no índice.
+    """
+    current = _snapshot
+    if current is None:
+        reload()
+        return 0
+
+    fetched = _fetch(current.cursor)
+    if fetched is None:
+        return 0
+    rows, dropped, cursor = fetched
+    removed = [k for k in dropped if k in current.by_id]
+    if not rows and not removed:
+        # Só linhas ainda sem embedding: avança o cursor para não relê-las
+        current.cursor = cursor
+        return 0
+    merged = {**current.by_id, **rows}
+    for key in removed:
+        del merged[key]
+    _publish(merged, cursor)
+    logger.info(
+        f"Índice de conhecimento atualizado | {len(rows)} chunk(s) novos/alterados "
+        f"| -{len(removed)} sem embedding"
+    )
+    return len(rows) + len(removed)
+
+
+def is_ready() -> bool:
+    return _snapshot is not None
+
+
+def search(
+    embedding: List[float],
+    threshold: Optional[float] = None,
+    count: int = 3,
+) -> Optional[List[dict]]:
+    """
+    Mesma semântica de knowledge_repo.search_knowledge (match_knowledge).
+    Retorna None se o índice não estiver pronto, estiver vazio ou a dimensão
+    não bater — o chamador deve usar a RPC nesse caso.
+    """
+    current = _snapshot
+    if current is None or not current.rows:
+        return None
+
+    query = np.asarray(embedding, dtype=np.float32)
+    if query.shape[0] != current.dim:
+        logger.warning(
+            f"Dimensão do embedding ({query.shape[0]}) difere do índice ({current.dim})"
+        )
+        return None
+    norm = np.linalg.norm(query)
+    if not norm:
+        return []
+
+    match_threshold = threshold if threshold is not None else settings.RAG_SIMILARITY_THRESHOLD
+    similarities = current.matrix @ (query / norm)
+
+    candidates = np.flatnonzero(similarities >= match_threshold)
+    if len(candidates) > count:
+        top = np.argpartition(-similarities[candidates], count - 1)[:count]
+        candidates = candidates[top]
+    ordered = candidates[np.argsort(-similarities[candidates])]
+
+    return [
+        {
+            "id": current.rows[i]["id"],
+            "content": current.rows[i]["content"],
+            "category": current.rows[i]["category"],
+            "similarity": float(similarities[i]),
+        }
+        for i in ordered
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Ciclo de vida da thread de refresh
+# ---------------------------------------------------------------------------
+
+def _load_initial() -> bool:
+    try:
+        return reload()
+    except Exception as e:
+        logger.error(f"Erro ao carregar índice de conhecimento | {e}")
+        return False
+
+
+def _run() -> None:
+    # Sem carga inicial o RAG fica na RPC: tenta de novo até conseguir
+    while not _load_initial():
+        if _stop.wait(settings.KNOWLEDGE_INDEX_REFRESH_SECONDS):
+            return
+
+    last_full = time.monotonic()
+    while not _stop.wait(settings.KNOWLEDGE_INDEX_REFRESH_SECONDS):
+        try:
+            if time.monotonic() - last_full >= settings.KNOWLEDGE_INDEX_FULL_RELOAD_SECONDS:
+                if reload():
+                    last_full = time.monotonic()
+            else:
+                refresh()
+        except Exception as e:
+            logger.error(f"Erro ao atualizar índice de conhecimento | {e}")
+
+
+def start() -> None:
+    """Carrega o índice e inicia o refresh em thread daemon (idempotente)."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _stop.clear()
+            _thread = threading.Thread(target=_run, name="knowledge-index", daemon=True)
+            _thread.start()
+
+
+def stop(timeout: float = 5.0) -> None:
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=timeout)
+        _thread = None
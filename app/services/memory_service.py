@@ -7,14 +7,114 @@ Memória em 2 camadas:
 
 Funções por agente usam chaves isoladas no formato {phone}_{agent_name}.
 Funções genéricas (get_history / save_message) mantidas para compatibilidade.
+Cada função tem uma variante asyncio com prefixo "a" (ex: aget_history).
 """
 
 import json
-from typing import List
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+import redis
 from loguru import logger
 
-from app.core.redis_client import redis_client
+from app.core import redis_cache
+from app.core.redis_client import apipelined, async_redis_client, pipelined, redis_client
 from app.core import postgres_client
+from app.core.config import settings
+from app.workers import persistence_worker
+
+
+# ---------------------------------------------------------------------------
+# Listas Redis append-only
+# Cada histórico é uma lista com uma mensagem JSON por item:
+#   escrita → RPUSH + LTRIM + EXPIRE num único pipeline (O(1) no tamanho do histórico)
+#   leitura → LRANGE apenas das últimas N entradas (session:{phone} passa pelo
+#             cache no cliente quando REDIS_CLIENT_CACHE_ENABLED)
+# Chaves no formato antigo (string JSON) são lidas via GET e convertidas em
+# lista na próxima escrita.
+# ---------------------------------------------------------------------------
+
+AGENT_HISTORY_MAX = 100
+SESSION_HISTORY_MAX = 20
+SESSION_TTL = 1800
+
+
+def _entries(*messages: tuple) -> List[str]:
+    # ts identifica a mensagem (ordem estável) para o resumo do history_compactor
+    now = time.time()
+    return [
+        json.dumps({"role": role, "content": content, "ts": round(now + i * 1e-6, 6)})
+        for i, (role, content) in enumerate(messages)
+    ]
+
+
+def _is_wrongtype(error: Exception) -> bool:
+    return isinstance(error, redis.ResponseError) and "WRONGTYPE" in str(error)
+
+
+def _load_tail(key: str, max_msgs: int) -> Tuple[str, ...]:
+    try:
+        return tuple(redis_client.lrange(key, -max_msgs, -1))
+    except redis.ResponseError as e:
+        if not _is_wrongtype(e):
+            raise
+        legacy = json.loads(redis_client.get(key) or "[]")[-max_msgs:]
+        return tuple(json.dumps(m) for m in legacy)
+
+
+def _read_tail(key: str, max_msgs: int) -> List[dict]:
+    raw_items = redis_cache.cached_read(key, f"tail:{max_msgs}", lambda: _load_tail(key, max_msgs))
+    return [json.loads(r) for r in raw_items]
+
+
+def _append(key: str, entries: List[str], max_len: int, ttl: int) -> None:
+    for attempt in range(2):
+        try:
+            pipelined(
+                lambda p: p.rpush(key, *entries).ltrim(key, -max_len, -1).expire(key, ttl),
+                transaction=True,
+            )
+            return
+        except redis.ResponseError as e:
+            if attempt or not _is_wrongtype(e):
+                raise
+            # Chave legada (string JSON): converte preservando o histórico
+            legacy = json.loads(redis_client.get(key) or "[]")
+            redis_client.delete(key)
+            entries = [json.dumps(m) for m in legacy] + entries
+
+
+async def _aload_tail(key: str, max_msgs: int) -> Tuple[str, ...]:
+    try:
+        return tuple(await async_redis_client.lrange(key, -max_msgs, -1))
+    except redis.ResponseError as e:
+        if not _is_wrongtype(e):
+            raise
+        legacy = json.loads(await async_redis_client.get(key) or "[]")[-max_msgs:]
+        return tuple(json.dumps(m) for m in legacy)
+
+
+async def _aread_tail(key: str, max_msgs: int) -> List[dict]:
+    raw_items = await redis_cache.acached_read(
+        key, f"tail:{max_msgs}", lambda: _aload_tail(key, max_msgs)
+    )
+    return [json.loads(r) for r in raw_items]
+
+
+async def _aappend(key: str, entries: List[str], max_len: int, ttl: int) -> None:
+    for attempt in range(2):
+        try:
+            await apipelined(
+                lambda p: p.rpush(key, *entries).ltrim(key, -max_len, -1).expire(key, ttl),
+                transaction=True,
+            )
+            return
+        except redis.ResponseError as e:
+            if attempt or not _is_wrongtype(e):
+                raise
+            legacy = json.loads(await async_redis_client.get(key) or "[]")
+            await async_redis_client.delete(key)
+            entries = [json.dumps(m) for m in legacy] + entries
 
 
 # ---------------------------------------------------------------------------
@@ -27,12 +127,7 @@ def get_agent_history(phone: str, agent_name: str, max_msgs: int = 10) -> List[d
     Chave: {phone}_{agent_name} | Retorna [] se vazio ou expirado.
     """
     try:
-        key = f"{phone}_{agent_name}"
-        raw = redis_client.get(key)
-        if raw:
-            history = json.loads(raw)
-            return history[-max_msgs:]
-        return []
+        return _read_tail(f"{phone}_{agent_name}", max_msgs)
     except Exception as e:
         logger.error(f"get_agent_history error | phone={phone} | agent={agent_name} | {e}")
         return []
@@ -50,16 +145,70 @@ def save_agent_message(
     Chave: {phone}_{agent_name}
     """
     try:
-        key = f"{phone}_{agent_name}"
-        history = get_agent_history(phone, agent_name, max_msgs=100)
-        history.append({"role": role, "content": content})
-        redis_client.setex(key, ttl, json.dumps(history))
+        _append(f"{phone}_{agent_name}", _entries((role, content)), AGENT_HISTORY_MAX, ttl)
+    except Exception as e:
+        logger.error(
+            f"save_agent_message error | phone={phone} | agent={agent_name} | {e}"
+        )
+
+
+def save_agent_turn(
+    phone: str,
+    agent_name: str,
+    user_msg: str,
+    response: str,
+    ttl: int,
+) -> None:
+    """Salva pergunta e resposta do turno na memória do agente num único round trip."""
+    try:
+        entries = _entries(("user", user_msg), ("assistant", response))
+        _append(f"{phone}_{agent_name}", entries, AGENT_HISTORY_MAX, ttl)
+    except Exception as e:
+        logger.error(f"save_agent_turn error | phone={phone} | agent={agent_name} | {e}")
+
+
+async def aget_agent_history(phone: str, agent_name: str, max_msgs: int = 10) -> List[dict]:
+    """Versão asyncio de get_agent_history."""
+    try:
+        return await _aread_tail(f"{phone}_{agent_name}", max_msgs)
+    except Exception as e:
+        logger.error(f"get_agent_history error | phone={phone} | agent={agent_name} | {e}")
+        return []
+
+
+async def asave_agent_message(
+    phone: str,
+    agent_name: str,
+    role: str,
+    content: str,
+    ttl: int,
+) -> None:
+    """Versão asyncio de save_agent_message."""
+    try:
+        await _aappend(
+            f"{phone}_{agent_name}", _entries((role, content)), AGENT_HISTORY_MAX, ttl
+        )
     except Exception as e:
         logger.error(
             f"save_agent_message error | phone={phone} | agent={agent_name} | {e}"
         )
 
 
+async def asave_agent_turn(
+    phone: str,
+    agent_name: str,
+    user_msg: str,
+    response: str,
+    ttl: int,
+) -> None:
+    """Versão asyncio de save_agent_turn."""
+    try:
+        entries = _entries(("user", user_msg), ("assistant", response))
+        await _aappend(f"{phone}_{agent_name}", entries, AGENT_HISTORY_MAX, ttl)
+    except Exception as e:
+        logger.error(f"save_agent_turn error | phone={phone} | agent={agent_name} | {e}")
+
+
 # ---------------------------------------------------------------------------
 # Memória genérica de sessão — chave session:{phone}
 # Mantida para compatibilidade com o fluxo geral
@@ -68,11 +217,7 @@ def save_agent_message(
 def get_history(phone: str) -> List[dict]:
     """Retorna histórico genérico de sessão do Redis (até 20 msgs)."""
     try:
-        key = f"session:{phone}"
-        raw = redis_client.get(key)
-        if raw:
-            return json.loads(raw)
-        return []
+        return _read_tail(f"session:{phone}", SESSION_HISTORY_MAX)
     except Exception as e:
         logger.error(f"get_history error | phone={phone} | {e}")
         return []
@@ -84,34 +229,117 @@ def save_message(phone: str, role: str, content: str) -> None:
     Mantém apenas as últimas 20 mensagens.
     """
     try:
-        key = f"session:{phone}"
-        history = get_history(phone)
-        history.append({"role": role, "content": content})
-        history = history[-20:]
-        redis_client.setex(key, 1800, json.dumps(history))
+        _append(f"session:{phone}", _entries((role, content)), SESSION_HISTORY_MAX, SESSION_TTL)
     except Exception as e:
         logger.error(f"save_message error | phone={phone} | role={role} | {e}")
 
 
+def save_turn(phone: str, user_msg: str, response: str) -> None:
+    """Salva pergunta e resposta no histórico genérico num único round trip."""
+    try:
+        entries = _entries(("user", user_msg), ("assistant", response))
+        _append(f"session:{phone}", entries, SESSION_HISTORY_MAX, SESSION_TTL)
+    except Exception as e:
+        logger.error(f"save_turn error | phone={phone} | {e}")
+
+
+async def aget_history(phone: str) -> List[dict]:
+    """Versão asyncio de get_history."""
+    try:
+        return await _aread_tail(f"session:{phone}", SESSION_HISTORY_MAX)
+    except Exception as e:
+        logger.error(f"get_history error | phone={phone} | {e}")
+        return []
+
+
+async def asave_message(phone: str, role: str, content: str) -> None:
+    """Versão asyncio de save_message."""
+    try:
+        await _aappend(
+            f"session:{phone}", _entries((role, content)), SESSION_HISTORY_MAX, SESSION_TTL
+        )
+    except Exception as e:
+        logger.error(f"save_message error | phone={phone} | role={role} | {e}")
+
+
+async def asave_turn(phone: str, user_msg: str, response: str) -> None:
+    """Versão asyncio de save_turn."""
+    try:
+        entries = _entries(("user", user_msg), ("assistant", response))
+        await _aappend(f"session:{phone}", entries, SESSION_HISTORY_MAX, SESSION_TTL)
+    except Exception as e:
+        logger.error(f"save_turn error | phone={phone} | {e}")
+
+
 # ---------------------------------------------------------------------------
 # Persistência de longo prazo — PostgreSQL
 # ---------------------------------------------------------------------------
 
 def persist_conversation(
-    phone: str, user_msg: str, bot_response: str, intent: str
+    phone: str,
+    user_msg: str,
+    bot_response: str,
+    intent: str,
+    intent_source: Optional[str] = None,
 ) -> None:
-    """Persiste a troca de mensagens no PostgreSQL para memória de longo prazo."""
+    """
+    Persiste a troca de mensagens no PostgreSQL para memória de longo prazo.
+    Com PERSIST_WRITE_BEHIND, apenas enfileira o turno — o INSERT ocorre em lote
+    na thread de flush do persistence_worker.
+    """
     try:
-        postgres_client.execute_write(
-            "INSERT INTO messages (phone, role, content, intent, created_at) "
-            "VALUES (%s, %s, %s, %s, NOW())",
-            (phone, "user", user_msg, intent),
+        if settings.PERSIST_WRITE_BEHIND:
+            persistence_worker.enqueue_turn(
+                phone, user_msg, bot_response, intent, intent_source
+            )
+            logger.info(f"Conversa enfileirada para persistência | phone={phone}")
+            return
+
+        rows = persistence_worker.build_turn_rows(
+            phone, user_msg, bot_response, intent, intent_source
         )
-        postgres_client.execute_write(
-            "INSERT INTO messages (phone, role, content, intent, created_at) "
-            "VALUES (%s, %s, %s, %s, NOW())",
-            (phone, "assistant", bot_response, intent),
+        for row in rows:
+            postgres_client.execute_write(
+                "INSERT INTO messages (id, phone, role, content, intent, intent_source, created_at) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                (
+                    row["id"], phone, row["role"], row["content"], intent, intent_source,
+                    row["created_at"],
+                ),
+            )
+        logger.info(f"Conversa persistida no PostgreSQL | phone={phone}")
+    except Exception as e:
+        logger.error(f"persist_conversation error | phone={phone} | {e}")
+
+
+async def apersist_conversation(
+    phone: str,
+    user_msg: str,
+    bot_response: str,
+    intent: str,
+    intent_source: Optional[str] = None,
+) -> None:
+    """Versão asyncio de persist_conversation (Redis asyncio / asyncpg)."""
+    try:
+        if settings.PERSIST_WRITE_BEHIND:
+            await persistence_worker.aenqueue_turn(
+                phone, user_msg, bot_response, intent, intent_source
+            )
+            logger.info(f"Conversa enfileirada para persistência | phone={phone}")
+            return
+
+        rows = persistence_worker.build_turn_rows(
+            phone, user_msg, bot_response, intent, intent_source
         )
+        for row in rows:
+            await postgres_client.aexecute_write(
+                "INSERT INTO messages (id, phone, role, content, intent, intent_source, created_at) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                (
+                    row["id"], phone, row["role"], row["content"], intent, intent_source,
+                    datetime.fromisoformat(row["created_at"]),
+                ),
+            )
         logger.info(f"Conversa persistida no PostgreSQL | phone={phone}")
     except Exception as e:
         logger.error(f"persist_conversation error | phone={phone} | {e}")
@@ -1,31 +1,59 @@
-from typing import Optional
+import asyncio
+from typing import TYPE_CHECKING, Optional
 from loguru import logger
-from langchain_openai import OpenAIEmbeddings
 from app.core.config import settings
+from app.core.lazy import LazyClient
 from app.repositories import knowledge_repo
+from app.services import embedding_cache, knowledge_index
 
-# TEMPORARIAMENTE DESABILITADO: text-embedding-3-small gera vetores de 1536 dimensões,
-# mas o schema do Supabase está configurado com vector(768) (Gemini text-embedding-004).
-# O search_context retorna sempre None até que o schema seja migrado para vector(1536).
-# Para reativar: remova o bloco de retorno antecipado e recrie a coluna no Supabase.
+# text-embedding-3-small gera vetores de 1536 dimensões (coluna embedding_v2).
+# Bancos ainda em vector(768): migrar com scripts/migrate_embeddings.py.
 
-embeddings = OpenAIEmbeddings(
-    model="text-embedding-3-small",
-    openai_api_key=settings.OPENAI_API_KEY,
-)
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+if TYPE_CHECKING:
+    from langchain_openai import OpenAIEmbeddings
+
+
+def _embeddings() -> "OpenAIEmbeddings":
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        openai_api_key=settings.OPENAI_API_KEY,
+    )
+
+
+get_embeddings: LazyClient["OpenAIEmbeddings"] = LazyClient("openai_embeddings", _embeddings)
+
+
+def _retrieve(embedding: list) -> list:
+    """Índice em memória quando pronto; senão RPC match_knowledge no Supabase."""
+    if settings.KNOWLEDGE_INDEX_ENABLED:
+        results = knowledge_index.search(embedding)
+        if results is not None:
+            return results
+    return knowledge_repo.search_knowledge(embedding)
+
+
+async def _aretrieve(embedding: list) -> list:
+    if settings.KNOWLEDGE_INDEX_ENABLED:
+        results = knowledge_index.search(embedding)
+        if results is not None:
+            return results
+    return await asyncio.to_thread(knowledge_repo.search_knowledge, embedding)
 
 
 def search_context(query: str) -> Optional[str]:
     """
-    Gera embedding da query e busca chunks relevantes no Supabase pgvector.
+    Gera embedding da query e busca chunks relevantes (índice em memória ou pgvector).
     Retorna contexto concatenado ou None se sem resultado acima do threshold.
     """
-    # TODO: reativar após migrar Supabase para vector(1536)
-    return None
-
-    try:  # noqa: unreachable — mantido para facilitar reativação futura
-        embedding: list = embeddings.embed_query(query)
-        results: list = knowledge_repo.search_knowledge(embedding)
+    try:
+        embedding: list = embedding_cache.get_embedding(
+            query, EMBEDDING_MODEL, get_embeddings().embed_query
+        )
+        results: list = _retrieve(embedding)
 
         if not results:
             return None
@@ -38,3 +66,21 @@ def search_context(query: str) -> Optional[str]:
     except Exception as e:
         logger.error(f"search_context error | query={query[:50]} | {e}")
         return None
+
+
+async def asearch_context(query: str) -> Optional[str]:
+    """Versão asyncio de search_context (aembed_query; RPC de fallback fora do event loop)."""
+    try:
+        embedding: list = await embedding_cache.aget_embedding(
+            query, EMBEDDING_MODEL, get_embeddings().aembed_query
+        )
+        results: list = await _aretrieve(embedding)
+
+        context_parts = [chunk["content"] for chunk in results if chunk.get("content")]
+        if not context_parts:
+            return None
+
+        return "\n\n".join(context_parts)
+    except Exception as e:
+        logger.error(f"search_context error | query={query[:50]} | {e}")
+        return None
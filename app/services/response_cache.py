@@ -0,0 +1,118 @@
+"""
+Cache de respostas dos agentes.
+
+Perguntas recorrentes ("quais documentos preciso?", "aceita financiamento?")
+são respondidas do cache em vez de uma nova chamada ao LLM:
+- Partição por (agente, versão do prompt) — a versão é o hash do system
+  prompt, então qualquer mudança no prompt invalida as respostas antigas
+- Só acerto exato pelo texto normalizado ("Aceita financiamento?!" e
+  "aceita financiamento" são a mesma chave). Não há busca por similaridade:
+  n-gramas de caracteres aproximam "2 quartos" de "3 quartos" e "aceita" de
+  "não aceita", e o cliente receberia o preço errado ou a resposta oposta
+- TTL por entrada e despejo LRU com no máximo RESPONSE_CACHE_MAX_ENTRIES
+  por partição
+- Métricas response_cache_requests_total{agent,result} e response_cache_entries
+
+Os agentes só consultam/gravam em turnos sem histórico do agente: com
+contexto, a mesma pergunta pode pedir outra resposta.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.text import normalize
+
+
+class _Partition:
+    """Entradas de um (agente, versão do prompt): texto normalizado → resposta, em LRU."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def get(self, key: str, now: float) -> Tuple[Optional[str], str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None, "miss"
+        response, expires_at = entry
+        if expires_at < now:
+            del self.entries[key]
+            return None, "expired"
+        self.entries.move_to_end(key)
+        return response, "exact"
+
+    def put(self, key: str, response: str, expires_at: float) -> None:
+        self.entries[key] = (response, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+
+_partitions: Dict[Tuple[str, str], _Partition] = {}
+_prompt_versions: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def prompt_version(system_prompt: str) -> str:
+    """Hash curto do system prompt — muda sempre que o prompt muda."""
+    version = _prompt_versions.get(system_prompt)
+    if version is None:
+        version = hashlib.sha1(system_prompt.encode()).hexdigest()[:12]
+        _prompt_versions[system_prompt] = version
+    return version
+
+
+def _partition(agent: str, system_prompt: str) -> _Partition:
+    partition_key = (agent, prompt_version(system_prompt))
+    partition = _partitions.get(partition_key)
+    if partition is None:
+        # Prompt novo para o agente: descarta as partições das versões anteriores
+        for stale in [k for k in _partitions if k[0] == agent]:
+            del _partitions[stale]
+        partition = _Partition(settings.RESPONSE_CACHE_MAX_ENTRIES)
+        _partitions[partition_key] = partition
+    return partition
+
+
+def lookup(agent: str, system_prompt: str, message: str) -> Optional[str]:
+    """Retorna a resposta em cache para a mesma mensagem (normalizada), ou None."""
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    key = normalize(message)
+    if not key:
+        return None
+
+    with _lock:
+        response, result = _partition(agent, system_prompt).get(key, time.time())
+    metrics.inc("response_cache_requests_total", agent=agent, result=result)
+    return response
+
+
+def store(agent: str, system_prompt: str, message: str, response: str, name: str = "") -> None:
+    """
+    Guarda a resposta do LLM para a mensagem. Respostas que citam o nome do
+    usuário não são guardadas (não servem para outro cliente).
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return
+    key = normalize(message)
+    if not key or not response or (name and name.lower() in response.lower()):
+        return
+
+    with _lock:
+        partition = _partition(agent, system_prompt)
+        partition.put(key, response, time.time() + settings.RESPONSE_CACHE_TTL_SECONDS)
+        size = len(partition.entries)
+    metrics.set_gauge("response_cache_entries", size, agent=agent)
+
+
+def invalidate(agent: Optional[str] = None) -> None:
+    """Esvazia o cache de um agente (ou de todos)."""
+    with _lock:
+        for key in [k for k in _partitions if agent is None or k[0] == agent]:
+            del _partitions[key]
@@ -1,50 +1,212 @@
-from typing import Optional
+"""
+Envio de mensagens via Evolution API.
+
+Clientes HTTP compartilhados pelo processo (keep-alive): um httpx.Client para
+o caminho síncrono e um httpx.AsyncClient para o event loop do agente, com
+limites de pool configuráveis. Falhas transitórias (rede, 429, 5xx) são
+repetidas com backoff exponencial com jitter; cada requisição alimenta as
+métricas evolution_request_seconds / evolution_requests_total.
+
+O agente envia via queue_message / aqueue_message, que passam pela fila de
+saída (app.workers.outbound_worker: rate limit por instância, prioridade para
+escalações, ordem por número) e só chamam a API diretamente se a fila estiver
+desabilitada ou o Redis indisponível.
+"""
+
+import asyncio
 import json
+import random
+import threading
+import time
+from typing import Optional
+
 import httpx
 from loguru import logger
+
+from app.core import metrics
 from app.core.config import settings
 
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_client_lock = threading.Lock()
 
-def send_message(phone_jid: str, text: str) -> bool:
-    """
-    Envia mensagem de texto via Evolution API.
-    Faz até 2 tentativas em caso de falha.
-    phone_jid deve conter o JID completo (ex: 5521920130578@s.whatsapp.net).
-    """
+
+def _client_options() -> dict:
+    return {
+        "headers": {
+            "apikey": settings.EVOLUTION_API_KEY,
+            "Content-Type": "application/json",
+        },
+        "timeout": httpx.Timeout(
+            settings.EVOLUTION_TIMEOUT_SECONDS,
+            connect=settings.EVOLUTION_CONNECT_TIMEOUT_SECONDS,
+        ),
+        "limits": httpx.Limits(
+            max_connections=settings.EVOLUTION_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.EVOLUTION_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.EVOLUTION_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Cliente síncrono compartilhado (pool de conexões keep-alive)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(**_client_options())
+    return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Cliente asyncio compartilhado — usado apenas no event loop do agente."""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(**_client_options())
+    return _async_client
+
+
+def close_http_client() -> None:
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose_http_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def _request_parts(phone_jid: str, text: str) -> tuple:
     url = (
         f"{settings.EVOLUTION_API_URL}/message/sendText"
         f"/{settings.EVOLUTION_INSTANCE}"
     )
-    headers = {
-        "apikey": settings.EVOLUTION_API_KEY,
-        "Content-Type": "application/json",
-    }
     payload = {
         "number": phone_jid,
         "text": text,
     }
+    return url, json.dumps(payload)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Backoff exponencial com full jitter: U(0, min(máx, base * 2^(tentativa-1)))."""
+    ceiling = min(
+        settings.EVOLUTION_BACKOFF_MAX_SECONDS,
+        settings.EVOLUTION_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1),
+    )
+    return random.uniform(0, ceiling)
+
+
+def _is_retryable(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+def _record(start: float, outcome: str) -> None:
+    metrics.observe("evolution_request_seconds", time.perf_counter() - start, outcome=outcome)
+    metrics.inc("evolution_requests_total", outcome=outcome)
+
+
+def _handle_response(response: httpx.Response, phone_jid: str, url: str, attempt: int) -> Optional[bool]:
+    """True = enviado, False = erro definitivo, None = erro transitório (repetir)."""
+    if response.status_code in (200, 201):
+        logger.info(f"Mensagem enviada | phone_jid={phone_jid} | tentativa={attempt}")
+        return True
+    logger.error(
+        f"Evolution API erro | status={response.status_code} "
+        f"| body={response.text} | url={url} | number={phone_jid}"
+    )
+    return None if _is_retryable(response.status_code) else False
+
+
+def send_message(phone_jid: str, text: str, max_attempts: Optional[int] = None) -> bool:
+    """
+    Envia mensagem de texto via Evolution API.
+    Faz até EVOLUTION_MAX_ATTEMPTS tentativas em falhas transitórias, com backoff.
+    phone_jid deve conter o JID completo (ex: 5521920130578@s.whatsapp.net).
+    """
+    url, content = _request_parts(phone_jid, text)
+    attempts = max_attempts or settings.EVOLUTION_MAX_ATTEMPTS
 
-    for attempt in range(1, 3):
+    for attempt in range(1, attempts + 1):
+        start = time.perf_counter()
         try:
-            with httpx.Client(timeout=10) as client:
-                response = client.post(url, headers=headers, content=json.dumps(payload))
-                if response.status_code in (200, 201):
-                    logger.info(f"Mensagem enviada | phone_jid={phone_jid} | tentativa={attempt}")
-                    return True
-                else:
-                    logger.error(
-                        f"Evolution API erro | status={response.status_code} "
-                        f"| body={response.text} | url={url} | number={phone_jid}"
-                    )
+            response = get_http_client().post(url, content=content)
+            _record(start, str(response.status_code))
+            result = _handle_response(response, phone_jid, url, attempt)
+            if result is not None:
+                return result
         except Exception as e:
+            _record(start, "error")
             logger.warning(
                 f"Erro ao enviar mensagem | phone_jid={phone_jid} | tentativa={attempt} | {e}"
             )
+        if attempt < attempts:
+            time.sleep(_backoff_delay(attempt))
 
     logger.error(f"Falha definitiva ao enviar mensagem | phone_jid={phone_jid}")
     return False
 
 
+async def asend_message(phone_jid: str, text: str, max_attempts: Optional[int] = None) -> bool:
+    """Versão asyncio de send_message (httpx.AsyncClient compartilhado)."""
+    url, content = _request_parts(phone_jid, text)
+    attempts = max_attempts or settings.EVOLUTION_MAX_ATTEMPTS
+
+    for attempt in range(1, attempts + 1):
+        start = time.perf_counter()
+        try:
+            response = await get_async_http_client().post(url, content=content)
+            _record(start, str(response.status_code))
+            result = _handle_response(response, phone_jid, url, attempt)
+            if result is not None:
+                return result
+        except Exception as e:
+            _record(start, "error")
+            logger.warning(
+                f"Erro ao enviar mensagem | phone_jid={phone_jid} | tentativa={attempt} | {e}"
+            )
+        if attempt < attempts:
+            await asyncio.sleep(_backoff_delay(attempt))
+
+    logger.error(f"Falha definitiva ao enviar mensagem | phone_jid={phone_jid}")
+    return False
+
+
+def queue_message(phone_jid: str, text: str, lane: str = "reply") -> bool:
+    """
+    Entrega a mensagem pela fila de saída (lane: "reply" ou "escalation").
+    Sem fila (OUTBOUND_QUEUE_ENABLED=false ou Redis indisponível), envia direto.
+    """
+    if settings.OUTBOUND_QUEUE_ENABLED:
+        from app.workers import outbound_worker
+
+        try:
+            outbound_worker.enqueue(phone_jid, text, lane)
+            return True
+        except Exception as e:
+            logger.warning(f"Fila de saída indisponível, enviando direto | phone_jid={phone_jid} | {e}")
+    return send_message(phone_jid, text)
+
+
+async def aqueue_message(phone_jid: str, text: str, lane: str = "reply") -> bool:
+    """Versão asyncio de queue_message."""
+    if settings.OUTBOUND_QUEUE_ENABLED:
+        from app.workers import outbound_worker
+
+        try:
+            await outbound_worker.aenqueue(phone_jid, text, lane)
+            return True
+        except Exception as e:
+            logger.warning(f"Fila de saída indisponível, enviando direto | phone_jid={phone_jid} | {e}")
+    return await asend_message(phone_jid, text)
+
+
 def forward_to_human(from_phone: str, human_phone: str, context: str) -> None:
     """Encaminha alerta de escalação para o corretor humano via WhatsApp."""
     message = (
@@ -53,7 +215,23 @@ def forward_to_human(from_phone: str, human_phone: str, context: str) -> None:
         f"Última mensagem: {context[:150]}"
     )
     try:
-        send_message(human_phone, message)
+        queue_message(human_phone, message, lane="escalation")
+        logger.info(
+            f"Escalação encaminhada | from={from_phone} | human={human_phone}"
+        )
+    except Exception as e:
+        logger.error(f"Erro ao encaminhar escalação | from={from_phone} | {e}")
+
+
+async def aforward_to_human(from_phone: str, human_phone: str, context: str) -> None:
+    """Versão asyncio de forward_to_human."""
+    message = (
+        f"📲 *Novo atendimento necessário*\n"
+        f"Cliente: {from_phone}\n"
+        f"Última mensagem: {context[:150]}"
+    )
+    try:
+        await aqueue_message(human_phone, message, lane="escalation")
         logger.info(
             f"Escalação encaminhada | from={from_phone} | human={human_phone}"
         )
@@ -0,0 +1,54 @@
+"""
+Event loop único do modo de execução assíncrono (AGENT_EXECUTION_MODE=async).
+
+No processo web o loop do uvicorn é registrado no startup via bind_loop();
+fora dele (worker dedicado, scripts) um loop próprio roda numa thread daemon.
+Todo o trabalho asyncio do agente — grafo, Redis, Postgres e HTTP — roda
+nesse mesmo loop; threads externas entregam corrotinas via submit().
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Coroutine, Optional
+
+from loguru import logger
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def bind_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """Registra um loop já em execução (ex: o do uvicorn) como loop do agente."""
+    global _loop
+    with _loop_lock:
+        _loop = loop
+    logger.info("Event loop do agente vinculado ao loop da aplicação")
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Retorna o loop do agente, criando um loop dedicado em thread se nenhum foi vinculado."""
+    global _loop
+    if _loop is not None and not _loop.is_closed():
+        return _loop
+
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="agent-event-loop", daemon=True
+            )
+            thread.start()
+            _loop = loop
+            logger.info("Event loop dedicado do agente iniciado")
+    return _loop
+
+
+def submit(coro: Coroutine) -> Future:
+    """Agenda a corrotina no loop do agente a partir de qualquer thread."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def call_soon(callback, *args) -> None:
+    """Executa o callback no loop do agente (thread-safe)."""
+    get_loop().call_soon_threadsafe(callback, *args)
@@ -0,0 +1,164 @@
+"""
+ZONA 2 — Consumidores do debounce distribuído
+
+Cada processo (web ou imob-worker) pode rodar um consumidor. O consumidor:
+1. Reivindica os números com prazo vencido em debounce:due e drena seus
+   buffers num único script Lua (atômico entre réplicas, 1 round trip por ciclo)
+2. Despacha o buffer para o pool de execução local:
+   - modo thread → ThreadPoolExecutor com DEBOUNCE_WORKER_CONCURRENCY threads
+   - modo async  → corrotina no event loop único do agente (async_runtime)
+3. Nunca reivindica mais números do que tem capacidade livre — o excedente
+   fica no Redis para outras réplicas
+
+Execução dedicada (serviço imob-worker):
+    python -m app.workers.debounce_scheduler
+"""
+
+import signal
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import List, Set, Tuple
+
+from loguru import logger
+
+from app.core import metrics
+from app.core.config import settings
+from app.workers import async_runtime
+from app.workers.message_worker import _aprocess_buffer, _process_buffer, claim_due_buffers
+
+_executor: ThreadPoolExecutor | None = None
+_slots: threading.BoundedSemaphore | None = None
+# Turnos despachados e ainda não concluídos (thread ou corrotina) — stop() espera por eles
+_inflight: Set[Future] = set()
+_inflight_lock = threading.Lock()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+
+
+def _dispatch(phone: str, raw_items: list) -> None:
+    if settings.AGENT_EXECUTION_MODE == "async":
+        future = async_runtime.submit(_aprocess_buffer(phone, raw_items))
+    else:
+        future = _executor.submit(_process_buffer, phone, raw_items)
+    with _inflight_lock:
+        _inflight.add(future)
+    future.add_done_callback(_on_turn_done)
+
+
+def _on_turn_done(future: Future) -> None:
+    with _inflight_lock:
+        _inflight.discard(future)
+    _slots.release()
+
+
+def _free_slots() -> int:
+    """Reserva todas as vagas livres do pool; as não usadas são devolvidas pelo chamador."""
+    taken = 0
+    while _slots.acquire(blocking=False):
+        taken += 1
+    return taken
+
+
+def _run() -> None:
+    logger.info(
+        f"Consumidor de debounce iniciado | modo={settings.AGENT_EXECUTION_MODE} "
+        f"| concorrência={settings.DEBOUNCE_WORKER_CONCURRENCY}"
+    )
+    while not _stop.is_set():
+        claimed: List[Tuple[str, list]] = []
+        free = _free_slots()
+        try:
+            if free:
+                claimed = claim_due_buffers(free)
+        except Exception as e:
+            logger.error(f"Erro ao reivindicar buffers vencidos | {e}")
+
+        for _ in range(free - len(claimed)):
+            _slots.release()
+
+        for phone, raw_items in claimed:
+            metrics.inc("debounce_claims_total")
+            _dispatch(phone, raw_items)
+
+        if len(claimed) < max(free, 1):
+            _stop.wait(settings.DEBOUNCE_POLL_INTERVAL_SECONDS)
+
+
+def start() -> None:
+    """Inicia o consumidor em thread daemon (idempotente)."""
+    global _thread, _executor, _slots
+    with _thread_lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.DEBOUNCE_WORKER_CONCURRENCY,
+                thread_name_prefix="agent-turn",
+            )
+            _slots = threading.BoundedSemaphore(settings.DEBOUNCE_WORKER_CONCURRENCY)
+        _stop.clear()
+        _thread = threading.Thread(target=_run, name="debounce-consumer", daemon=True)
+        _thread.start()
+
+
+def stop(timeout: float = 30.0) -> None:
+    """
+    Para de reivindicar novos buffers e aguarda (até timeout) os turnos em
+    andamento — inclusive as corrotinas do modo async, que não pertencem ao
+    executor — para que finalize persista/enfileire a resposta antes de os
+    clientes Redis/Postgres serem fechados.
+    """
+    global _thread, _executor
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=timeout)
+        _thread = None
+    with _inflight_lock:
+        inflight = list(_inflight)
+    if inflight:
+        logger.info(f"Aguardando {len(inflight)} turno(s) em andamento")
+        _, pending = wait(inflight, timeout=timeout)
+        if pending:
+            logger.warning(f"{len(pending)} turno(s) não concluído(s) em {timeout:.0f}s no encerramento")
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    logger.info("Consumidor de debounce encerrado")
+
+
+def main() -> None:
+    """Entrypoint do serviço imob-worker: consome buffers até SIGTERM/SIGINT."""
+    from app.agents.graph import warm_up_graphs
+    from app.core import redis_cache, redis_client
+    from app.services import escalation_rules, history_compactor, intent_model, knowledge_index
+    from app.workers import outbound_worker, persistence_worker
+
+    warm_up_graphs()
+    intent_model.get_model()
+    history_compactor.load_tokenizer()
+    redis_cache.start()
+    escalation_rules.start()
+    if settings.RAG_ENABLED and settings.KNOWLEDGE_INDEX_ENABLED:
+        knowledge_index.start()
+    persistence_worker.start()
+    if settings.OUTBOUND_QUEUE_ENABLED:
+        outbound_worker.start()
+    start()
+
+    stop_requested = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop_requested.set())
+    stop_requested.wait()
+
+    stop()
+    knowledge_index.stop()
+    escalation_rules.stop()
+    outbound_worker.stop()
+    persistence_worker.stop()
+    redis_cache.stop()
+    redis_client.close_clients()
+
+
+if __name__ == "__main__":
+    main()
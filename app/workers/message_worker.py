@@ -1,127 +1,193 @@
 """
 ZONA 2 — Buffer e normalização de mensagens
 
-Padrão RPUSH + deduplicação por message_id:
-1. RPUSH buffer:{phone} <json> com TTL de segurança
-2. threading.Timer como mecanismo de delay (sem dependência de RQ Scheduler)
-3. Ao disparar: compara message_id atual com o da última mensagem na lista
-4. Se igual  → consolida todas as mensagens e processa
-5. Se diferente → encerra silenciosamente (outra invocação vai processar)
-6. DEL buffer:{phone} após processamento
+Padrão RPUSH + debounce distribuído em Redis, com scripts Lua:
+1. Enqueue (1 round trip por lote de mensagens do webhook): RPUSH
+   buffer:{phone} <json> + ZADD debounce:due {phone} = agora +
+   MESSAGE_BUFFER_SECONDS (cada nova mensagem empurra o prazo — é o debounce).
+   O buffer não tem TTL: só sai do Redis pelo claim, junto com o número em
+   debounce:due — um consumidor atrasado não perde mensagens
+2. Claim (1 round trip para N números): consumidores (debounce_scheduler, em
+   qualquer processo/réplica) executam um script que, para cada número com
+   prazo vencido, remove-o de debounce:due e lê + deleta o buffer atomicamente.
+   Uma mensagem que chega depois do claim cria um novo buffer e um novo prazo —
+   nada se perde entre a leitura e o DEL.
+3. Consolida todas as mensagens e chama o agente
+
+O estado do debounce vive no Redis: sobrevive a restarts e funciona com vários
+workers uvicorn ou réplicas, sem thread por mensagem.
+
+Métricas: debounce_buffer_wait_seconds (chegada da primeira mensagem do buffer
+→ consolidação), debounce_buffer_missing_total (claim sem buffer) e, a cada scrape de /metrics, debounce_queue_depth (números com
+prazo agendado) e debounce_overdue (prazo já vencido, aguardando consumidor).
 """
 
 import json
-import threading
+import time
+from typing import List, Tuple
 
 from loguru import logger
-from redis import Redis
 
+from app.core import metrics
 from app.core.config import settings
+from app.core.redis_client import async_redis_client, pipelined, redis_client
 from app.models.context import MessageContext
 
-redis_client = Redis.from_url(settings.REDIS_URL, decode_responses=True)
-
-# Controle de timers ativos por número
-_timers: dict[str, threading.Timer] = {}
-_timers_lock = threading.Lock()
-
-
-def enqueue_message(ctx: MessageContext) -> None:
+DUE_KEY = "debounce:due"
+
+# KEYS[1]=debounce:due KEYS[2..n+1]=buffer:{phone} (uma por mensagem)
+# ARGV[1]=due_at, depois payload e phone de cada mensagem
+# → tamanho de cada buffer após o RPUSH
+_ENQUEUE_LUA = """
+local sizes = {}
+for i = 2, #KEYS do
+    sizes[#sizes + 1] = redis.call('RPUSH', KEYS[i], ARGV[2 * i - 2])
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2 * i - 1])
+end
+return sizes
+"""
+_enqueue_script = redis_client.register_script(_ENQUEUE_LUA)
+_aenqueue_script = async_redis_client.register_script(_ENQUEUE_LUA)
+
+# KEYS[1]=debounce:due ARGV[1]=agora ARGV[2]=limite
+# → {{phone, {item, ...}}, ...} apenas para números com prazo vencido
+# (as chaves buffer:{phone} são derivadas no script — Redis single-node, sem cluster)
+_claim_script = redis_client.register_script("""
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local claimed = {}
+for _, phone in ipairs(due) do
+    redis.call('ZREM', KEYS[1], phone)
+    local buffer_key = 'buffer:' .. phone
+    local items = redis.call('LRANGE', buffer_key, 0, -1)
+    redis.call('DEL', buffer_key)
+    table.insert(claimed, {phone, items})
+end
+return claimed
+""")
+
+
+def _enqueue_args(contexts: List[MessageContext]) -> Tuple[list, list]:
+    """KEYS/ARGV do script de enqueue para um lote de mensagens."""
+    now = time.time()
+    # Debounce: o prazo do número é sempre o da mensagem mais recente
+    keys, args = [DUE_KEY], [now + settings.MESSAGE_BUFFER_SECONDS]
+    for ctx in contexts:
+        # Append na lista Redis — preserva ordem de chegada
+        payload = json.dumps({
+            "phone": ctx.phone,
+            "phone_jid": ctx.phone_jid,
+            "name": ctx.name,
+            "content": ctx.content,
+            "message_id": ctx.message_id,
+            "received_at": now,
+        })
+        keys.append(f"buffer:{ctx.phone}")
+        args += [payload, ctx.phone]
+    return keys, args
+
+
+def _log_enqueued(contexts: List[MessageContext], sizes: list) -> None:
+    for ctx, size in zip(contexts, sizes):
+        logger.info(f"Mensagem enfileirada | {ctx.phone} | buffer: {size} msg(s)")
+
+
+def enqueue_messages(contexts: List[MessageContext]) -> None:
     """
     Zona 2 — Entrada do buffer.
-    Registra a mensagem na lista Redis e agenda o processamento com debounce.
+    Registra as mensagens nas listas Redis e (re)agenda o processamento com
+    debounce — um único round trip para o lote inteiro.
     """
-    buffer_key = f"buffer:{ctx.phone}"
-    ttl = settings.MESSAGE_BUFFER_SECONDS + 5
-
-    # Append na lista Redis — preserva ordem de chegada
-    payload = json.dumps({
-        "phone": ctx.phone,
-        "phone_jid": ctx.phone_jid,
-        "name": ctx.name,
-        "content": ctx.content,
-        "message_id": ctx.message_id,
-    })
-    redis_client.rpush(buffer_key, payload)
-    redis_client.expire(buffer_key, ttl)
-
-    # Cancelar timer anterior e registrar o novo (debounce)
-    with _timers_lock:
-        if ctx.phone in _timers:
-            _timers[ctx.phone].cancel()
-            logger.debug(f"Timer anterior cancelado | {ctx.phone}")
-
-        timer = threading.Timer(
-            settings.MESSAGE_BUFFER_SECONDS,
-            _process_buffer,
-            kwargs={"phone": ctx.phone, "trigger_message_id": ctx.message_id},
-        )
-        timer.daemon = True
-        timer.start()
-        _timers[ctx.phone] = timer
+    if not contexts:
+        return
+    keys, args = _enqueue_args(contexts)
+    _log_enqueued(contexts, _enqueue_script(keys=keys, args=args))
 
-    logger.info(
-        f"Mensagem enfileirada | {ctx.phone} | "
-        f"buffer: {redis_client.llen(buffer_key)} msg(s)"
-    )
 
+async def aenqueue_messages(contexts: List[MessageContext]) -> None:
+    """Versão asyncio de enqueue_messages (redis.asyncio — não bloqueia o event loop)."""
+    if not contexts:
+        return
+    keys, args = _enqueue_args(contexts)
+    _log_enqueued(contexts, await _aenqueue_script(keys=keys, args=args))
 
-def _process_buffer(phone: str, trigger_message_id: str) -> None:
-    """
-    Zona 2 — Processamento do buffer após o delay.
-    Deduplica pelo message_id da última mensagem na lista.
-    Consolida e chama o agente apenas se esta invocação é a mais recente.
-    """
-    logger.info(f"Worker processando mensagem | phone={phone}")
-    buffer_key = f"buffer:{phone}"
 
-    # Ler última mensagem sem deletar (peek)
-    raw_items = redis_client.lrange(buffer_key, 0, -1)
-    if not raw_items:
-        logger.warning(f"Buffer vazio ou expirado | phone={phone}")
-        return
+def enqueue_message(ctx: MessageContext) -> None:
+    """Enfileira uma única mensagem (ver enqueue_messages)."""
+    enqueue_messages([ctx])
 
-    last_item = json.loads(raw_items[-1])
-    last_message_id = last_item.get("message_id", "")
 
-    # Deduplicação: só processa se este timer foi disparado pela última mensagem
-    if trigger_message_id and last_message_id and trigger_message_id != last_message_id:
-        logger.debug(
-            f"Invocação ignorada (não é a mais recente) | phone={phone} "
-            f"| trigger={trigger_message_id[:8]} | last={last_message_id[:8]}"
-        )
-        return
+def claim_due_buffers(limit: int) -> List[Tuple[str, list]]:
+    """Reivindica e drena, atomicamente, até `limit` buffers com debounce vencido."""
+    claimed = _claim_script(keys=[DUE_KEY], args=[time.time(), limit])
+    return [(phone, raw_items) for phone, raw_items in claimed]
+
+
+def collect_queue_metrics() -> None:
+    """Coletor de /metrics: profundidade da fila de debounce e números com prazo vencido."""
+    depth, overdue = pipelined(lambda p: p.zcard(DUE_KEY).zcount(DUE_KEY, "-inf", time.time()))
+    metrics.set_gauge("debounce_queue_depth", depth)
+    metrics.set_gauge("debounce_overdue", overdue)
 
-    # Consumir e deletar buffer atomicamente
-    raw_items = redis_client.lrange(buffer_key, 0, -1)
-    redis_client.delete(buffer_key)
 
-    # Limpar referência do timer
-    with _timers_lock:
-        _timers.pop(phone, None)
+metrics.register_collector(collect_queue_metrics)
 
-    # Consolidar mensagens em ordem de chegada
+
+def _consolidate(phone: str, raw_items: list) -> dict | None:
+    """Consolida as mensagens do buffer em ordem de chegada."""
     items = [json.loads(r) for r in raw_items]
     if not items:
-        return
+        metrics.inc("debounce_buffer_missing_total")
+        logger.warning(f"Buffer vazio no claim — mensagens perdidas | phone={phone}")
+        return None
 
     first = items[0]
+    if first.get("received_at"):
+        metrics.observe("debounce_buffer_wait_seconds", time.time() - first["received_at"])
     consolidated_content = " | ".join(i["content"] for i in items)
 
     logger.info(
         f"Processando {len(items)} mensagem(ns) | phone={phone} "
         f"| '{consolidated_content[:60]}'"
     )
+    return {
+        "phone": first["phone"],
+        "phone_jid": first["phone_jid"],
+        "name": first.get("name", ""),
+        "message": consolidated_content,
+        "message_id": items[-1].get("message_id", ""),
+    }
+
+
+def _process_buffer(phone: str, raw_items: list) -> None:
+    """
+    Zona 2 — Processamento do buffer após o debounce.
+    Recebe as mensagens já drenadas pelo consumidor que reivindicou o número.
+    """
+    logger.info(f"Worker processando mensagem | phone={phone}")
 
     try:
+        turn = _consolidate(phone, raw_items)
+        if turn is None:
+            return
+
         from app.agents.graph import run_agent
 
-        run_agent(
-            phone=first["phone"],
-            phone_jid=first["phone_jid"],
-            name=first.get("name", ""),
-            message=consolidated_content,
-            message_id=trigger_message_id,
-        )
+        run_agent(**turn)
+    except Exception as e:
+        logger.error(f"Erro ao processar buffer | phone={phone} | {e}")
+
+
+async def _aprocess_buffer(phone: str, raw_items: list) -> None:
+    """Versão asyncio de _process_buffer (arun_agent no event loop do agente)."""
+    logger.info(f"Worker processando mensagem | phone={phone}")
+
+    try:
+        turn = _consolidate(phone, raw_items)
+        if turn is None:
+            return
+
+        from app.agents.graph import arun_agent
+
+        await arun_agent(**turn)
     except Exception as e:
         logger.error(f"Erro ao processar buffer | phone={phone} | {e}")
@@ -0,0 +1,318 @@
+"""
+Fila de saída das mensagens WhatsApp (Evolution API)
+
+Todo envio do agente (respostas, alertas de escalação, mensagens de erro)
+passa por aqui em vez de chamar a Evolution API diretamente:
+1. enqueue() grava a mensagem na fila do número outbound:queue:{lane}|{jid}
+   e, se o número ainda não está agendado, o coloca em outbound:ready:{lane}
+   (1 script Lua, 1 round trip)
+2. Prioridade por faixa: alertas de escalação saem antes das respostas
+3. Ordem garantida por número: só existe uma mensagem em voo por
+   (faixa, número); a próxima só é liberada após o ack da anterior
+4. Token bucket por EVOLUTION_INSTANCE, no Redis — o limite vale para todos os
+   processos/réplicas que enviam pela mesma instância
+5. Falha no envio → a mensagem continua na cabeça da fila e volta após backoff;
+   após OUTBOUND_MAX_ATTEMPTS tentativas vai para outbound:dead
+6. Mensagens em voo cujo prazo venceu (processo caiu no meio do envio) voltam
+   para a fila — entrega at-least-once
+"""
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_client import redis_client, async_redis_client
+from app.services import whatsapp_service
+
+LANE_ESCALATION = "escalation"
+LANE_REPLY = "reply"
+LANES = (LANE_ESCALATION, LANE_REPLY)  # ordem = prioridade
+
+SCHEDULED_KEY = "outbound:scheduled"
+INFLIGHT_KEY = "outbound:inflight"
+DEAD_KEY = "outbound:dead"
+
+_MAX_RETRY_DELAY = 60.0
+
+# KEYS[1]=outbound:queue:{lane}|{jid} KEYS[2]=outbound:ready:{lane} KEYS[3]=outbound:scheduled
+# ARGV[1]=payload ARGV[2]={lane}|{jid} ARGV[3]=jid → tamanho da fila do número
+_ENQUEUE_LUA = """
+local depth = redis.call('RPUSH', KEYS[1], ARGV[1])
+if redis.call('SADD', KEYS[3], ARGV[2]) == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[3])
+end
+return depth
+"""
+_enqueue_script = redis_client.register_script(_ENQUEUE_LUA)
+_aenqueue_script = async_redis_client.register_script(_ENQUEUE_LUA)
+
+# KEYS[1]=outbound:bucket:{instância} KEYS[2]=outbound:inflight KEYS[3]=outbound:scheduled
+# ARGV[1]=agora ARGV[2]=taxa/s ARGV[3]=burst ARGV[4]=prazo de visibilidade ARGV[5..]=faixas
+# → {lane, jid, item} | {'', espera em segundos} | {} (nada pronto)
+# (as chaves por faixa/número são derivadas no script — Redis single-node, sem cluster)
+_claim_script = redis_client.register_script("""
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)
+for _, member in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], member)
+    local sep = string.find(member, '|', 1, true)
+    redis.call('LPUSH', 'outbound:ready:' .. string.sub(member, 1, sep - 1), string.sub(member, sep + 1))
+end
+
+local lane = nil
+for i = 5, #ARGV do
+    if redis.call('LLEN', 'outbound:ready:' .. ARGV[i]) > 0 then
+        lane = ARGV[i]
+        break
+    end
+end
+if not lane then
+    return {}
+end
+
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or burst)
+local ts = tonumber(redis.call('HGET', KEYS[1], 'ts') or now)
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+if tokens < 1 then
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], 3600)
+    return {'', tostring((1 - tokens) / rate)}
+end
+
+local ready_key = 'outbound:ready:' .. lane
+while true do
+    local jid = redis.call('LPOP', ready_key)
+    if not jid then
+        return {}
+    end
+    local member = lane .. '|' .. jid
+    local item = redis.call('LINDEX', 'outbound:queue:' .. member, 0)
+    if item then
+        redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'ts', now)
+        redis.call('EXPIRE', KEYS[1], 3600)
+        redis.call('ZADD', KEYS[2], ARGV[4], member)
+        return {lane, jid, item}
+    end
+    redis.call('SREM', KEYS[3], member)
+end
+""")
+
+# KEYS[1]=outbound:queue:{lane}|{jid} KEYS[2]=outbound:ready:{lane}
+# KEYS[3]=outbound:scheduled KEYS[4]=outbound:inflight KEYS[5]=outbound:dead
+# ARGV[1]={lane}|{jid} ARGV[2]=jid ARGV[3]=prazo do claim ARGV[4]=item p/ dead-letter (opcional)
+# Só confirma se o claim ainda é nosso (prazo não venceu nem foi reivindicado de novo)
+_ack_script = redis_client.register_script("""
+if tonumber(redis.call('ZSCORE', KEYS[4], ARGV[1])) ~= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZREM', KEYS[4], ARGV[1])
+redis.call('LPOP', KEYS[1])
+if ARGV[4] then
+    redis.call('RPUSH', KEYS[5], ARGV[4])
+end
+if redis.call('LLEN', KEYS[1]) > 0 then
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+else
+    redis.call('SREM', KEYS[3], ARGV[1])
+end
+return 1
+""")
+
+# KEYS[1]=outbound:queue:{lane}|{jid} KEYS[2]=outbound:inflight
+# ARGV[1]={lane}|{jid} ARGV[2]=prazo do claim ARGV[3]=item atualizado ARGV[4]=próxima tentativa
+# A mensagem fica na cabeça da fila; o claim a devolve quando o backoff vence
+_retry_script = redis_client.register_script("""
+if tonumber(redis.call('ZSCORE', KEYS[2], ARGV[1])) ~= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('LSET', KEYS[1], 0, ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[1])
+return 1
+""")
+
+_executor: ThreadPoolExecutor | None = None
+_slots: threading.BoundedSemaphore | None = None
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Entrada
+# ---------------------------------------------------------------------------
+
+def _enqueue_parts(phone_jid: str, text: str, lane: str) -> Tuple[list, list]:
+    if lane not in LANES:
+        raise ValueError(f"Faixa de envio desconhecida: {lane}")
+    member = f"{lane}|{phone_jid}"
+    payload = json.dumps({"text": text, "attempts": 0, "enqueued_at": time.time()})
+    keys = [f"outbound:queue:{member}", f"outbound:ready:{lane}", SCHEDULED_KEY]
+    return keys, [payload, member, phone_jid]
+
+
+def enqueue(phone_jid: str, text: str, lane: str = LANE_REPLY) -> int:
+    """Enfileira a mensagem para envio. Levanta exceção se o Redis estiver indisponível."""
+    start()
+    keys, args = _enqueue_parts(phone_jid, text, lane)
+    depth = _enqueue_script(keys=keys, args=args)
+    metrics.inc("outbound_enqueued_total", lane=lane)
+    logger.info(f"Mensagem na fila de saída | phone_jid={phone_jid} | faixa={lane} | fila: {depth}")
+    return depth
+
+
+async def aenqueue(phone_jid: str, text: str, lane: str = LANE_REPLY) -> int:
+    """Versão asyncio de enqueue (script Lua via redis.asyncio)."""
+    start()
+    keys, args = _enqueue_parts(phone_jid, text, lane)
+    depth = await _aenqueue_script(keys=keys, args=args)
+    metrics.inc("outbound_enqueued_total", lane=lane)
+    logger.info(f"Mensagem na fila de saída | phone_jid={phone_jid} | faixa={lane} | fila: {depth}")
+    return depth
+
+
+# ---------------------------------------------------------------------------
+# Envio
+# ---------------------------------------------------------------------------
+
+def _claim() -> Tuple[Optional[tuple], float]:
+    """
+    Reivindica a próxima mensagem respeitando prioridade e token bucket.
+    Retorna ((lane, jid, item, prazo), 0) ou (None, segundos até tentar de novo).
+    """
+    deadline = time.time() + settings.OUTBOUND_VISIBILITY_TIMEOUT_SECONDS
+    result = _claim_script(
+        keys=[f"outbound:bucket:{settings.EVOLUTION_INSTANCE}", INFLIGHT_KEY, SCHEDULED_KEY],
+        args=[
+            time.time(), settings.OUTBOUND_RATE_PER_SECOND, settings.OUTBOUND_BURST,
+            deadline, *LANES,
+        ],
+    )
+    if not result:
+        return None, settings.OUTBOUND_POLL_INTERVAL_SECONDS
+    if len(result) == 2:
+        metrics.inc("outbound_throttled_total")
+        return None, float(result[1])
+    lane, jid, item = result
+    return (lane, jid, item, deadline), 0.0
+
+
+def _retry_delay(attempts: int) -> float:
+    """Backoff exponencial com jitter entre tentativas da mesma mensagem."""
+    return random.uniform(0.5, 1.0) * min(_MAX_RETRY_DELAY, 2 ** attempts)
+
+
+def _deliver(lane: str, jid: str, item: str, deadline: float) -> None:
+    member = f"{lane}|{jid}"
+    queue_key = f"outbound:queue:{member}"
+    message = json.loads(item)
+
+    # Retries ficam a cargo da fila: a thread não dorme entre tentativas
+    sent = whatsapp_service.send_message(jid, message["text"], max_attempts=1)
+
+    if sent:
+        _ack_script(
+            keys=[queue_key, f"outbound:ready:{lane}", SCHEDULED_KEY, INFLIGHT_KEY, DEAD_KEY],
+            args=[member, jid, deadline],
+        )
+        metrics.inc("outbound_sent_total", lane=lane)
+        metrics.observe("outbound_delivery_seconds", time.time() - message["enqueued_at"], lane=lane)
+        return
+
+    message["attempts"] += 1
+    if message["attempts"] >= settings.OUTBOUND_MAX_ATTEMPTS:
+        message.update({"phone_jid": jid, "lane": lane, "failed_at": time.time()})
+        _ack_script(
+            keys=[queue_key, f"outbound:ready:{lane}", SCHEDULED_KEY, INFLIGHT_KEY, DEAD_KEY],
+            args=[member, jid, deadline, json.dumps(message)],
+        )
+        metrics.inc("outbound_dead_letters_total", lane=lane)
+        logger.error(
+            f"Mensagem enviada para dead-letter após {message['attempts']} tentativa(s) "
+            f"| phone_jid={jid} | faixa={lane}"
+        )
+        return
+
+    retry_at = time.time() + _retry_delay(message["attempts"])
+    _retry_script(keys=[queue_key, INFLIGHT_KEY], args=[member, deadline, json.dumps(message), retry_at])
+    metrics.inc("outbound_retries_total", lane=lane)
+    logger.warning(
+        f"Envio adiado | phone_jid={jid} | faixa={lane} | tentativa={message['attempts']}"
+    )
+
+
+def _deliver_safely(lane: str, jid: str, item: str, deadline: float) -> None:
+    try:
+        _deliver(lane, jid, item, deadline)
+    except Exception as e:
+        # Sem ack: a mensagem volta para a fila quando o prazo de visibilidade vencer
+        logger.error(f"Erro ao entregar mensagem da fila | phone_jid={jid} | {e}")
+
+
+# ---------------------------------------------------------------------------
+# Ciclo de vida do consumidor
+# ---------------------------------------------------------------------------
+
+def _run() -> None:
+    logger.info(
+        f"Fila de saída iniciada | instância={settings.EVOLUTION_INSTANCE} "
+        f"| taxa={settings.OUTBOUND_RATE_PER_SECOND}/s | burst={settings.OUTBOUND_BURST}"
+    )
+    while not _stop.is_set():
+        if not _slots.acquire(timeout=settings.OUTBOUND_POLL_INTERVAL_SECONDS):
+            continue
+        try:
+            claimed, wait_seconds = _claim()
+        except Exception as e:
+            logger.error(f"Erro ao reivindicar mensagem da fila de saída | {e}")
+            claimed, wait_seconds = None, settings.OUTBOUND_POLL_INTERVAL_SECONDS
+
+        if claimed is None:
+            _slots.release()
+            _stop.wait(min(wait_seconds, settings.OUTBOUND_POLL_INTERVAL_SECONDS * 10))
+            continue
+
+        future = _executor.submit(_deliver_safely, *claimed)
+        future.add_done_callback(lambda _: _slots.release())
+
+
+def start() -> None:
+    """Inicia o consumidor da fila de saída em thread daemon (idempotente)."""
+    global _thread, _executor, _slots
+    if _thread is not None and _thread.is_alive():
+        return
+    with _thread_lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.OUTBOUND_CONCURRENCY,
+                thread_name_prefix="outbound",
+            )
+            _slots = threading.BoundedSemaphore(settings.OUTBOUND_CONCURRENCY)
+        _stop.clear()
+        _thread = threading.Thread(target=_run, name="outbound-consumer", daemon=True)
+        _thread.start()
+
+
+def stop(timeout: float = 10.0) -> None:
+    """Para de reivindicar mensagens e aguarda os envios em andamento.
+    O que ainda estiver na fila permanece no Redis para o próximo consumidor."""
+    global _thread, _executor
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=timeout)
+        _thread = None
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    logger.info("Fila de saída encerrada")
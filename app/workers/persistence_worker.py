@@ -0,0 +1,278 @@
+"""
+Persistência write-behind das mensagens no PostgreSQL
+
+Tira os INSERTs de `messages` do caminho do cliente:
+1. enqueue_turn() faz RPUSH das 2 linhas do turno em persist:messages (1 round trip)
+2. Uma thread de flush drena a fila em lotes — por tamanho (PERSIST_BATCH_SIZE)
+   ou por janela de tempo (PERSIST_FLUSH_INTERVAL_SECONDS)
+3. Cada lote é reservado atomicamente (Lua) em persist:inflight com prazo de
+   visibilidade; só é removido após o COMMIT do INSERT multi-linha
+4. Lotes cujo prazo venceu (processo caiu no meio) voltam para a fila —
+   entrega at-least-once, deduplicada no banco por id (ON CONFLICT DO NOTHING)
+5. Sem Redis, as linhas caem numa fila em memória do processo
+6. stop() faz o flush final no shutdown
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import psycopg2
+import psycopg2.extras
+from loguru import logger
+
+from app.core import metrics, postgres_client
+from app.core.config import settings
+from app.core.redis_client import async_redis_client, pipelined, redis_client
+
+QUEUE_KEY = "persist:messages"
+INFLIGHT_KEY = "persist:inflight"
+DEADLINES_KEY = "persist:inflight:deadlines"
+
+_INSERT_SQL = (
+    "INSERT INTO messages (id, phone, role, content, intent, intent_source, created_at) "
+    "VALUES %s ON CONFLICT (id) DO NOTHING"
+)
+_ROW_TEMPLATE = (
+    "(%(id)s, %(phone)s, %(role)s, %(content)s, %(intent)s, %(intent_source)s, %(created_at)s)"
+)
+
+# Reserva até N itens da fila para um lote, registrando o prazo de visibilidade
+_claim_script = redis_client.register_script("""
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items == 0 then
+    return items
+end
+redis.call('LTRIM', KEYS[1], #items, -1)
+redis.call('HSET', KEYS[2], ARGV[2], cjson.encode(items))
+redis.call('ZADD', KEYS[3], ARGV[3], ARGV[2])
+return items
+""")
+
+# Devolve à cabeça da fila, na ordem original, os lotes cujo prazo de visibilidade venceu
+_requeue_script = redis_client.register_script("""
+local ids = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1])
+for _, id in ipairs(ids) do
+    local raw = redis.call('HGET', KEYS[2], id)
+    if raw then
+        local items = cjson.decode(raw)
+        for i = #items, 1, -1 do
+            redis.call('LPUSH', KEYS[1], items[i])
+        end
+    end
+    redis.call('HDEL', KEYS[2], id)
+    redis.call('ZREM', KEYS[3], id)
+end
+return #ids
+""")
+
+_local_queue: deque = deque()
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Entrada
+# ---------------------------------------------------------------------------
+
+def build_turn_rows(
+    phone: str,
+    user_msg: str,
+    bot_response: str,
+    intent: str,
+    intent_source: Optional[str] = None,
+) -> List[dict]:
+    """Monta as linhas do turno com id e created_at definidos no momento da troca."""
+    rows = []
+    for role, content in (("user", user_msg), ("assistant", bot_response)):
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "phone": phone,
+            "role": role,
+            "content": content,
+            "intent": intent,
+            "intent_source": intent_source,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+    return rows
+
+
+def enqueue_turn(
+    phone: str,
+    user_msg: str,
+    bot_response: str,
+    intent: str,
+    intent_source: Optional[str] = None,
+) -> None:
+    """Enfileira o turno para persistência em lote. Nunca bloqueia no PostgreSQL."""
+    start()
+    rows = build_turn_rows(phone, user_msg, bot_response, intent, intent_source)
+    try:
+        depth = redis_client.rpush(QUEUE_KEY, *(json.dumps(r) for r in rows))
+    except Exception as e:
+        logger.warning(f"Fila write-behind indisponível, usando memória | phone={phone} | {e}")
+        _local_queue.extend(rows)
+        depth = len(_local_queue)
+
+    if depth >= settings.PERSIST_BATCH_SIZE:
+        _wake.set()
+
+
+async def aenqueue_turn(
+    phone: str,
+    user_msg: str,
+    bot_response: str,
+    intent: str,
+    intent_source: Optional[str] = None,
+) -> None:
+    """Versão asyncio de enqueue_turn (RPUSH via redis.asyncio)."""
+    start()
+    rows = build_turn_rows(phone, user_msg, bot_response, intent, intent_source)
+    try:
+        depth = await async_redis_client.rpush(QUEUE_KEY, *(json.dumps(r) for r in rows))
+    except Exception as e:
+        logger.warning(f"Fila write-behind indisponível, usando memória | phone={phone} | {e}")
+        _local_queue.extend(rows)
+        depth = len(_local_queue)
+
+    if depth >= settings.PERSIST_BATCH_SIZE:
+        _wake.set()
+
+
+# ---------------------------------------------------------------------------
+# Flush em lote
+# ---------------------------------------------------------------------------
+
+def _insert_batch(rows: List[dict]) -> None:
+    """INSERT multi-linha numa única transação. Levanta exceção em caso de falha."""
+    # Linhas enfileiradas antes da coluna intent_source não têm a chave
+    rows = [{"intent_source": None, **row} for row in rows]
+    with postgres_client.connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                psycopg2.extras.execute_values(
+                    cur, _INSERT_SQL, rows, template=_ROW_TEMPLATE, page_size=len(rows)
+                )
+
+
+def _insert_rows(rows: List[dict]) -> bool:
+    """
+    Persiste o lote. Erros de dado (linha inválida) isolam a linha ruim e
+    descartam só ela; erros transitórios retornam False para reentrega.
+    """
+    try:
+        with metrics.timer("persist_flush_seconds"):
+            _insert_batch(rows)
+        metrics.inc("persist_rows_total", len(rows), result="ok")
+        return True
+    except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+        logger.error(f"Lote com linha inválida, persistindo individualmente | {e}")
+    except Exception as e:
+        logger.error(f"Falha ao persistir lote de {len(rows)} linha(s) | {e}")
+        metrics.inc("persist_flush_errors_total")
+        return False
+
+    for row in rows:
+        try:
+            _insert_batch([row])
+            metrics.inc("persist_rows_total", result="ok")
+        except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+            metrics.inc("persist_rows_total", result="dropped")
+            logger.error(f"Linha descartada | phone={row.get('phone')} | {e}")
+        except Exception as e:
+            logger.error(f"Falha ao persistir linha | phone={row.get('phone')} | {e}")
+            metrics.inc("persist_flush_errors_total")
+            return False
+    return True
+
+
+def _flush_local() -> None:
+    while _local_queue:
+        batch = [
+            _local_queue.popleft()
+            for _ in range(min(settings.PERSIST_BATCH_SIZE, len(_local_queue)))
+        ]
+        if not _insert_rows(batch):
+            _local_queue.extendleft(reversed(batch))
+            return
+
+
+def flush() -> int:
+    """Drena a fila Redis em lotes até esvaziar. Retorna o número de linhas persistidas."""
+    persisted = 0
+    _flush_local()
+
+    try:
+        requeued = _requeue_script(
+            keys=[QUEUE_KEY, INFLIGHT_KEY, DEADLINES_KEY], args=[time.time()]
+        )
+        if requeued:
+            logger.warning(f"{requeued} lote(s) expirado(s) devolvido(s) à fila write-behind")
+
+        while True:
+            batch_id = str(uuid.uuid4())
+            deadline = time.time() + settings.PERSIST_VISIBILITY_TIMEOUT_SECONDS
+            raw_items = _claim_script(
+                keys=[QUEUE_KEY, INFLIGHT_KEY, DEADLINES_KEY],
+                args=[settings.PERSIST_BATCH_SIZE, batch_id, deadline],
+            )
+            if not raw_items:
+                break
+
+            rows = [json.loads(r) for r in raw_items]
+            if not _insert_rows(rows):
+                break  # lote fica reservado e volta à fila após o prazo
+
+            pipelined(lambda p: p.hdel(INFLIGHT_KEY, batch_id).zrem(DEADLINES_KEY, batch_id))
+            persisted += len(rows)
+
+            if len(raw_items) < settings.PERSIST_BATCH_SIZE:
+                break
+    except Exception as e:
+        logger.error(f"Erro no flush write-behind | {e}")
+
+    if persisted:
+        logger.info(f"Write-behind: {persisted} mensagem(ns) persistida(s) no PostgreSQL")
+    return persisted
+
+
+# ---------------------------------------------------------------------------
+# Ciclo de vida da thread de flush
+# ---------------------------------------------------------------------------
+
+def _run() -> None:
+    while not _stop.is_set():
+        _wake.wait(timeout=settings.PERSIST_FLUSH_INTERVAL_SECONDS)
+        _wake.clear()
+        flush()
+
+
+def start() -> None:
+    """Inicia a thread de flush (idempotente)."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _stop.clear()
+            _thread = threading.Thread(target=_run, name="persist-flusher", daemon=True)
+            _thread.start()
+            logger.info("Write-behind de mensagens iniciado")
+
+
+def stop(timeout: float = 10.0) -> None:
+    """Encerra a thread e faz o flush final do que estiver pendente."""
+    global _thread
+    _stop.set()
+    _wake.set()
+    if _thread is not None:
+        _thread.join(timeout=timeout)
+        _thread = None
+    flush()
+    logger.info("Write-behind de mensagens encerrado")
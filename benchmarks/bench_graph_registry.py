@@ -0,0 +1,68 @@
+"""
+Benchmark — custo por turno da obtenção do grafo LangGraph.
+
+Compara o caminho antigo (run_agent chamava _build_graph() a cada mensagem
+consolidada) com o registro compilado uma única vez (get_graph()).
+A execução dos nós é idêntica nos dois caminhos e fica fora da medição.
+
+Uso:
+    python -m benchmarks.bench_graph_registry --turns 200
+"""
+
+import argparse
+import os
+import statistics
+import time
+import tracemalloc
+
+# Valores mínimos para importar o app sem .env (nenhuma conexão é aberta)
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("LANGCHAIN_TRACING_V2", "false")
+
+from app.agents import graph  # noqa: E402
+
+
+def _measure(label: str, fn, turns: int) -> dict:
+    timings = []
+    tracemalloc.start()
+    for _ in range(turns):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    result = {
+        "label": label,
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p99_ms": timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+        "peak_kib": peak / 1024,
+    }
+    print(
+        f"{label:<28} mean={result['mean_ms']:8.3f}ms  p50={result['p50_ms']:8.3f}ms  "
+        f"p99={result['p99_ms']:8.3f}ms  pico_mem={result['peak_kib']:9.1f}KiB"
+    )
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    graph.warm_up_graphs()
+
+    before = _measure("antes: _build_graph()", graph._build_graph, args.turns)
+    after = _measure("depois: get_graph()", graph.get_graph, args.turns)
+
+    speedup = before["mean_ms"] / max(after["mean_ms"], 1e-9)
+    print(f"\nOverhead por turno reduzido em {speedup:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Dublês locais para o harness de carga (benchmarks.load_harness).
+
+- FakeChatModel: modelo de chat determinístico com latência configurável,
+  no lugar de ai_service.get_llm_flash / get_llm_pro. Classificação de intenção
+  responde o JSON esperado pelo intent_node; os agentes recebem respostas
+  de tamanho realista; stream() entrega palavra a palavra
+- FakeEvolutionServer: servidor HTTP local que imita POST
+  /message/sendText/{instance} da Evolution API, registra cada envio e pode
+  injetar latência e erros (429/500) para exercitar retry e fila de saída
+
+Tudo é determinístico dado o texto de entrada: latência e resposta saem do
+crc32 da mensagem, então duas execuções com a mesma semente geram a mesma carga.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_INTENT_KEYWORDS = (
+    ("agendamento", ("visita", "agendar", "marcar", "horario", "horário")),
+    ("documentacao", ("documento", "contrato", "escritura", "rg", "cpf")),
+    ("atendimento_humano", ("corretor", "atendente", "humano", "reclama")),
+    ("qualificacao", ("preço", "preco", "quartos", "bairro", "alugar", "comprar", "financ")),
+    ("cumprimento", ("oi", "olá", "ola", "bom dia", "boa tarde", "boa noite")),
+)
+
+_REPLIES = (
+    "Que ótimo! 😊 Me conta um pouco mais: você procura apartamento ou casa? "
+    "E seria para compra ou aluguel?",
+    "Perfeito, anotei aqui. Qual bairro ou região você prefere? "
+    "Assim consigo separar as opções que mais combinam com você.",
+    "Claro! Para a visita tenho horários de manhã e à tarde. "
+    "Qual dia da semana fica melhor pra você?",
+    "Para dar entrada na documentação vou precisar de RG, CPF e comprovante de renda. "
+    "Pode me enviar quando puder! 📄",
+    "Entendi! Nessa faixa de valor temos algumas opções bem interessantes. "
+    "Quantos quartos você precisa?",
+)
+
+
+def _stable_fraction(text: str) -> float:
+    return (zlib.crc32(text.encode()) % 10_000) / 10_000
+
+
+class FakeChatModel(BaseChatModel):
+    """Modelo de chat determinístico com latência simulada."""
+
+    latency_ms: float = 400.0
+    jitter_ms: float = 150.0
+    tokens_per_second: float = 60.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-bench"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        system = str(messages[0].content) if messages else ""
+        last = str(messages[-1].content) if messages else ""
+        if "classificador de intenções" in system:
+            lowered = last.lower()
+            intent = next(
+                (name for name, words in _INTENT_KEYWORDS if any(w in lowered for w in words)),
+                "indefinido",
+            )
+            return json.dumps({"intencao": intent, "confianca": "alta", "entidades": {}})
+        if "resumo" in system.lower():
+            return "- Cliente procura imóvel; preferências coletadas ao longo da conversa."
+        return _REPLIES[zlib.crc32(last.encode()) % len(_REPLIES)]
+
+    def _delay(self, messages: List[BaseMessage]) -> float:
+        key = str(messages[-1].content) if messages else ""
+        jitter = (2 * _stable_fraction(key) - 1) * self.jitter_ms
+        return max(self.latency_ms + jitter, 0.0) / 1000
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def _words(self, messages: List[BaseMessage]) -> List[str]:
+        text = self._reply(messages)
+        return [word + " " for word in text.split(" ")[:-1]] + [text.split(" ")[-1]]
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        # Latência = tempo até o primeiro token; depois tokens_per_second
+        time.sleep(self._delay(messages))
+        for word in self._words(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+            time.sleep(1 / self.tokens_per_second)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._delay(messages))
+        for word in self._words(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+            await asyncio.sleep(1 / self.tokens_per_second)
+
+
+class FakeEvolutionServer:
+    """
+    Evolution API local. on_send(number, text, recebido_em) é chamado a cada
+    envio aceito (na thread do servidor HTTP).
+    """
+
+    def __init__(
+        self,
+        on_send: Callable[[str, str, float], None],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 30.0,
+        error_rate: float = 0.0,
+    ):
+        self.on_send = on_send
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.accepted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _reply(self, status: int, body: dict) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not self.path.startswith("/message/sendText/"):
+                    self._reply(404, {"error": "not found"})
+                    return
+                payload = json.loads(body or b"{}")
+                time.sleep(fake.latency_ms / 1000)
+
+                # Erro injetado determinístico por conteúdo + contagem de tentativas
+                with fake._lock:
+                    attempt = fake.accepted + fake.rejected
+                if fake.error_rate and _stable_fraction(f"{payload.get('text')}{attempt}") < fake.error_rate:
+                    with fake._lock:
+                        fake.rejected += 1
+                    self._reply(429 if attempt % 2 else 500, {"error": "injected"})
+                    return
+
+                with fake._lock:
+                    fake.accepted += 1
+                fake.on_send(payload.get("number", ""), payload.get("text", ""), time.time())
+                self._reply(201, {"key": {"id": f"BENCH{attempt}"}, "status": "PENDING"})
+
+        return Handler
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-evolution", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
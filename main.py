@@ -1,10 +1,17 @@
+import time
+
+_PROCESS_START = time.perf_counter()
+
+import asyncio
 import os
+import threading
 
 os.environ["LANGCHAIN_TRACING_V2"] = os.getenv("LANGCHAIN_TRACING_V2", "true")
 os.environ["LANGCHAIN_API_KEY"] = os.getenv("LANGCHAIN_API_KEY", "")
 os.environ["LANGCHAIN_PROJECT"] = os.getenv("LANGCHAIN_PROJECT", "agentes-python-prod")
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.api.webhook import router
 from loguru import logger
 
@@ -17,6 +24,125 @@ app = FastAPI(
 app.include_router(router)
 
 
+def _warm_up(profile) -> None:
+    """
+    Compila o grafo, carrega o modelo de intenção e o tokenizer e
+    (STARTUP_PREWARM_CONNECTIONS) constrói os clientes preguiçosos e abre as
+    primeiras conexões Redis/PostgreSQL, para que o primeiro turno não pague
+    esse custo.
+    """
+    from app.core.config import settings
+
+    with profile.step("graph"):
+        from app.agents.graph import warm_up_graphs
+
+        warm_up_graphs()
+    with profile.step("intent_model"):
+        from app.services import intent_model
+
+        intent_model.get_model()
+    with profile.step("tokenizer"):
+        from app.services import history_compactor
+
+        history_compactor.load_tokenizer()
+
+    if settings.STARTUP_PREWARM_CONNECTIONS:
+        from app.core import lazy, postgres_client
+        from app.core.redis_client import redis_client
+        from app.services import ai_service, rag_service, whatsapp_service  # registram os clientes
+
+        clients = ["llm_flash", "llm_pro"]
+        if settings.RAG_ENABLED:
+            clients += ["openai_embeddings", "supabase"]
+        for name, seconds in lazy.prewarm_all(clients).items():
+            profile.record(f"client:{name}", seconds)
+        for name, warm in (
+            ("redis", redis_client.ping),
+            ("postgres", lambda: postgres_client.release_connection(postgres_client.get_connection())),
+            ("evolution_http", whatsapp_service.get_http_client),
+        ):
+            try:
+                with profile.step(f"connect:{name}"):
+                    warm()
+            except Exception as e:
+                logger.warning(f"Pré-aquecimento falhou | {name} | {e}")
+
+
+def _background_warm_up(profile) -> None:
+    try:
+        _warm_up(profile)
+    except Exception as e:
+        logger.error(f"Erro no aquecimento em background | {e}")
+    profile.report()
+
+
+@app.on_event("startup")
+async def startup():
+    """
+    Inicia os workers em background antes de aceitar mensagens. Grafo, modelo
+    e clientes são aquecidos conforme STARTUP_WARMUP_MODE: "blocking" (antes de
+    aceitar requisições), "background" (numa thread — /health responde logo) ou
+    "off" (sob demanda, no primeiro turno).
+    """
+    from app.core.config import settings
+    from app.core.startup import StartupProfile
+
+    profile = StartupProfile(_PROCESS_START)
+    profile.record("import main", _IMPORT_SECONDS)
+
+    with profile.step("workers"):
+        from app.core import redis_cache
+        from app.services import escalation_rules, knowledge_index
+        from app.workers import async_runtime, debounce_scheduler, outbound_worker, persistence_worker
+
+        redis_cache.start()
+        escalation_rules.start()
+        if settings.RAG_ENABLED and settings.KNOWLEDGE_INDEX_ENABLED:
+            knowledge_index.start()
+        persistence_worker.start()
+        if settings.OUTBOUND_QUEUE_ENABLED:
+            outbound_worker.start()
+
+        # Modo async: o agente roda no mesmo event loop do uvicorn
+        if settings.AGENT_EXECUTION_MODE == "async":
+            async_runtime.bind_loop(asyncio.get_running_loop())
+
+        if settings.DEBOUNCE_CONSUMER_IN_WEB:
+            debounce_scheduler.start()
+
+    if settings.STARTUP_WARMUP_MODE == "background":
+        threading.Thread(
+            target=_background_warm_up, args=(profile,), name="startup-warmup", daemon=True
+        ).start()
+        return
+    if settings.STARTUP_WARMUP_MODE == "blocking":
+        await asyncio.to_thread(_warm_up, profile)
+    profile.report()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Conclui os turnos em andamento, esvazia o write-behind e fecha pools e clientes HTTP/Redis."""
+    from app.core import postgres_client, redis_cache, redis_client
+    from app.services import escalation_rules, knowledge_index, whatsapp_service
+    from app.workers import debounce_scheduler, outbound_worker, persistence_worker
+
+    # As paradas síncronas fazem join de threads e flush no Postgres: rodam fora
+    # do event loop, que segue livre para concluir os turnos do modo async
+    await asyncio.to_thread(debounce_scheduler.stop)
+    await asyncio.to_thread(outbound_worker.stop)
+    await asyncio.to_thread(knowledge_index.stop)
+    await asyncio.to_thread(escalation_rules.stop)
+    await asyncio.to_thread(persistence_worker.stop)
+    await asyncio.to_thread(postgres_client.close_pool)
+    await postgres_client.aclose_pool()
+    await asyncio.to_thread(whatsapp_service.close_http_client)
+    await whatsapp_service.aclose_http_client()
+    await asyncio.to_thread(redis_cache.stop)
+    await asyncio.to_thread(redis_client.close_clients)
+    await redis_client.aclose_clients()
+
+
 @app.get("/health")
 async def health():
     """Endpoint de health check para monitoramento do Dokploy."""
@@ -28,4 +154,14 @@ async def health():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Métricas do processo no formato texto do Prometheus (coletores consultam o Redis)."""
+    from app.core import metrics as registry
+
+    return PlainTextResponse(registry.render_prometheus(), media_type=registry.CONTENT_TYPE)
+
+
+_IMPORT_SECONDS = time.perf_counter() - _PROCESS_START
+
 logger.info("Agente Imobiliário IA iniciado.")
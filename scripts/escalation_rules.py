@@ -0,0 +1,66 @@
+"""
+Gerencia as regras de escalação no Redis (recarregadas em até
+ESCALATION_RULES_REFRESH_SECONDS, sem restart).
+
+Formato (JSON):
+    {
+      "threshold": 1.0,
+      "negation_window": 3,
+      "negations": ["nao", "nem", "nunca", "sem"],
+      "rules": [
+        {"pattern": "reclama*", "weight": 1.0},
+        {"pattern": "procon", "weight": 1.0, "negatable": false},
+        {"pattern": "so uma duvida", "weight": -0.5}
+      ]
+    }
+
+Uso:
+    python -m scripts.escalation_rules show
+    python -m scripts.escalation_rules publish regras.json
+    python -m scripts.escalation_rules test "não é urgente, só uma dúvida"
+    python -m scripts.escalation_rules reset
+"""
+
+import argparse
+import json
+import sys
+
+from app.core.redis_client import redis_client
+from app.services import escalation_rules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Regras de escalação (Redis)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("show")
+    p_publish = sub.add_parser("publish")
+    p_publish.add_argument("path", help="arquivo JSON com as regras ('-' = stdin)")
+    p_test = sub.add_parser("test")
+    p_test.add_argument("message")
+    sub.add_parser("reset")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        raw = redis_client.get(escalation_rules.RULES_KEY)
+        config = json.loads(raw) if raw else escalation_rules.DEFAULT_RULES
+        print(f"# origem: {'redis' if raw else 'padrao'}")
+        print(json.dumps(config, ensure_ascii=False, indent=2))
+    elif args.command == "publish":
+        with (sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")) as f:
+            config = json.load(f)
+        count, threshold = escalation_rules.publish(config)
+        print(f"{count} regra(s) publicada(s) | threshold={threshold}")
+    elif args.command == "test":
+        escalation_rules.reload()
+        result = escalation_rules.evaluate(args.message)
+        print(
+            f"escalar={result.escalate} | score={result.score:.2f} "
+            f"| casadas={result.matched} | negadas={result.negated}"
+        )
+    elif args.command == "reset":
+        redis_client.delete(escalation_rules.RULES_KEY)
+        print("Regras removidas do Redis — valem as regras padrão")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Ingestão em lote da base de conhecimento (knowledge_base).
+
+Pipeline em streaming — nenhum arquivo é carregado inteiro em memória além
+do lote corrente:
+1. Lê fontes .txt / .md (por parágrafos) e .csv de imóveis (1 chunk por linha)
+2. Divide em chunks de até --chunk-size caracteres com --overlap
+3. Dedupe por content_hash, no próprio lote e contra o banco
+4. Embeddings em lote via embed_documents (1 chamada por --batch-size chunks)
+5. Upsert em lote (1 requisição por lote, on_conflict=content_hash)
+6. Checkpoint por arquivo (.ingest_checkpoint.json): uma execução
+   interrompida retoma do último lote confirmado
+
+Uso:
+    python -m scripts.ingest_knowledge docs/ imoveis.csv --category catalogo
+    python -m scripts.ingest_knowledge faq.md --batch-size 128 --dry-run
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from typing import Iterator, List, Tuple
+
+from app.repositories import knowledge_repo
+
+_TEXT_EXTENSIONS = {".txt", ".md", ".markdown"}
+_CSV_EXTENSIONS = {".csv"}
+
+Chunk = Tuple[str, int, str]  # (arquivo, índice do chunk no arquivo, conteúdo)
+
+
+# ---------------------------------------------------------------------------
+# Fontes e chunking
+# ---------------------------------------------------------------------------
+
+def iter_files(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in _TEXT_EXTENSIONS | _CSV_EXTENSIONS:
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def split_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """Quebra em pedaços de até chunk_size, preferindo fim de frase/espaço."""
+    text = " ".join(text.split())
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            cut = max(text.rfind(". ", start, end), text.rfind(" ", start, end))
+            if cut > start + chunk_size // 2:
+                end = cut + 1
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [c for c in chunks if c]
+
+
+def _iter_paragraphs(path: str) -> Iterator[str]:
+    """Parágrafos (blocos separados por linha em branco), lidos linha a linha."""
+    block: List[str] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                block.append(line.strip())
+            elif block:
+                yield " ".join(block)
+                block = []
+    if block:
+        yield " ".join(block)
+
+
+def iter_chunks(path: str, chunk_size: int, overlap: int) -> Iterator[str]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in _CSV_EXTENSIONS:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                line = " | ".join(f"{k}: {v}" for k, v in row.items() if k and v)
+                yield from split_text(line, chunk_size, overlap)
+        return
+
+    # Parágrafos curtos são agrupados até chunk_size; longos são divididos
+    pending = ""
+    for paragraph in _iter_paragraphs(path):
+        if len(pending) + len(paragraph) + 1 <= chunk_size:
+            pending = f"{pending}\n{paragraph}" if pending else paragraph
+            continue
+        if pending:
+            yield pending
+        if len(paragraph) <= chunk_size:
+            pending = paragraph
+        else:
+            yield from split_text(paragraph, chunk_size, overlap)
+            pending = ""
+    if pending:
+        yield pending
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint
+# ---------------------------------------------------------------------------
+
+def load_checkpoint(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, state: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _file_signature(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def iter_pending_chunks(files: List[str], checkpoint: dict, args) -> Iterator[Chunk]:
+    """Chunks ainda não confirmados — pula o prefixo já ingerido de cada arquivo."""
+    for path in files:
+        entry = checkpoint.get(path, {})
+        done = entry.get("chunks_done", 0) if entry.get("signature") == _file_signature(path) else 0
+        for index, content in enumerate(iter_chunks(path, args.chunk_size, args.overlap)):
+            if index >= done:
+                yield path, index, content
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+def _batches(chunks: Iterator[Chunk], size: int) -> Iterator[List[Chunk]]:
+    batch: List[Chunk] = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def process_batch(batch: List[Chunk], embed_documents, args) -> Tuple[int, int]:
+    """Dedupe → embed → upsert de um lote. Retorna (inseridos, ignorados)."""
+    if args.dry_run:
+        return 0, 0
+
+    unique = {}
+    for path, index, content in batch:
+        unique.setdefault(knowledge_repo.content_hash(content), (path, index, content))
+
+    existing = knowledge_repo.existing_content_hashes(unique)
+    pending = [(h, item) for h, item in unique.items() if h not in existing]
+    skipped = len(batch) - len(pending)
+    if not pending:
+        return 0, skipped
+
+    vectors = embed_documents([content for _, (_, _, content) in pending])
+    rows = [
+        {
+            "content": content,
+            "embedding": vector,
+            "category": args.category,
+            "metadata": {"source": os.path.basename(path), "chunk": index},
+            "content_hash": content_hash,
+        }
+        for (content_hash, (path, index, content)), vector in zip(pending, vectors)
+    ]
+    inserted = knowledge_repo.upsert_knowledge_batch(rows)
+    # Diferença = gravados por outro processo entre a checagem e o upsert
+    return inserted, skipped + len(rows) - inserted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingestão em lote da knowledge_base")
+    parser.add_argument("paths", nargs="+", help="arquivos ou diretórios (.txt, .md, .csv)")
+    parser.add_argument("--category", default=None)
+    parser.add_argument("--chunk-size", type=int, default=800)
+    parser.add_argument("--overlap", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--checkpoint", default=".ingest_checkpoint.json")
+    parser.add_argument("--dry-run", action="store_true", help="só chunking e contagem, sem API")
+    args = parser.parse_args()
+
+    files = list(iter_files(args.paths))
+    checkpoint = load_checkpoint(args.checkpoint)
+    embed_documents = None
+    if not args.dry_run:
+        from app.services.rag_service import get_embeddings
+
+        embed_documents = get_embeddings().embed_documents
+
+    inserted = skipped = processed = 0
+    start = time.perf_counter()
+    for batch in _batches(iter_pending_chunks(files, checkpoint, args), args.batch_size):
+        added, ignored = process_batch(batch, embed_documents, args)
+        inserted += added
+        skipped += ignored
+        processed += len(batch)
+
+        # Confirma o progresso por arquivo só depois do upsert do lote
+        if not args.dry_run:
+            for path, index, _ in batch:
+                signature = _file_signature(path)
+                entry = checkpoint.get(path, {})
+                done = entry.get("chunks_done", 0) if entry.get("signature") == signature else 0
+                checkpoint[path] = {"signature": signature, "chunks_done": max(done, index + 1)}
+            save_checkpoint(args.checkpoint, checkpoint)
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"{processed} chunk(s) | inseridos={inserted} | ignorados={skipped} "
+            f"| {processed / elapsed:.1f} chunks/s"
+        )
+
+    print(
+        f"Concluído: {len(files)} arquivo(s), {processed} chunk(s), "
+        f"{inserted} inserido(s), {skipped} já existente(s) "
+        f"em {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Migração online dos embeddings da knowledge_base: vector(768) → vector(1536).
+
+O schema original usa vector(768) (Gemini), mas o rag_service gera vetores
+de 1536 dimensões (text-embedding-3-small). A migração roda por fases, sem
+downtime — o match_knowledge antigo segue respondendo até o switch:
+
+  prepare   cria a coluna embedding_v2 vector(1536), a função
+            match_knowledge_v2 e um trigger que zera embedding_v2 quando o
+            conteúdo muda (o backfill reprocessa a linha)
+  backfill  re-embeda em lotes (embed_documents) as linhas com
+            embedding_v2 nulo, em ordem de id (keyset) — retomável
+  index     cria o índice HNSW (CREATE INDEX CONCURRENTLY, sem lock de escrita)
+  switch    numa única transação, troca match_knowledge para vector(1536)
+            sobre embedding_v2 e recarrega o schema do PostgREST
+  status    contagem de linhas migradas / pendentes e estado do índice
+  cleanup   remove a coluna antiga e o índice IVFFLAT (após validar)
+
+Escrita dupla durante a transição: a aplicação grava novos chunks direto em
+KNOWLEDGE_EMBEDDING_COLUMN (embedding_v2); o backfill só pega linhas com
+embedding_v2 nulo, então escrita ao vivo e backfill convergem.
+
+Uso (SUPABASE_DB_URL = conexão direta ao PostgreSQL do Supabase):
+    python -m scripts.migrate_embeddings prepare
+    python -m scripts.migrate_embeddings backfill --batch-size 128
+    python -m scripts.migrate_embeddings index
+    python -m scripts.migrate_embeddings switch
+"""
+
+import argparse
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extras
+
+from app.core.config import settings
+
+TARGET_DIM = 1536
+NEW_COLUMN = "embedding_v2"
+HNSW_INDEX = "knowledge_base_embedding_v2_hnsw_idx"
+
+_MATCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION {name}(
+    query_embedding  vector(1536),
+    match_threshold  float   DEFAULT 0.75,
+    match_count      int     DEFAULT 3
+)
+RETURNS TABLE (
+    id          UUID,
+    content     TEXT,
+    category    TEXT,
+    similarity  float
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        kb.id,
+        kb.content,
+        kb.category,
+        1 - (kb.embedding_v2 <=> query_embedding) AS similarity
+    FROM knowledge_base kb
+    WHERE kb.embedding_v2 IS NOT NULL
+      AND 1 - (kb.embedding_v2 <=> query_embedding) >= match_threshold
+    ORDER BY kb.embedding_v2 <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+"""
+
+_PREPARE_SQL = f"""
+ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS {NEW_COLUMN} vector({TARGET_DIM});
+ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION knowledge_base_reset_embedding_v2()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.content IS DISTINCT FROM OLD.content
+       AND NEW.{NEW_COLUMN} IS NOT DISTINCT FROM OLD.{NEW_COLUMN} THEN
+        NEW.{NEW_COLUMN} := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS knowledge_base_reset_embedding_v2 ON knowledge_base;
+CREATE TRIGGER knowledge_base_reset_embedding_v2
+    BEFORE UPDATE ON knowledge_base
+    FOR EACH ROW EXECUTE FUNCTION knowledge_base_reset_embedding_v2();
+""" + _MATCH_FUNCTION.format(name="match_knowledge_v2")
+
+# Só grava se o conteúdo não mudou desde a leitura (senão o trigger já zerou).
+# updated_at avança para o refresh incremental do índice em memória ver a linha
+_BACKFILL_UPDATE = f"""
+UPDATE knowledge_base AS kb
+SET {NEW_COLUMN} = v.embedding::vector, updated_at = NOW()
+FROM (VALUES %s) AS v(id, content, embedding)
+WHERE kb.id = v.id::uuid AND kb.content = v.content AND kb.{NEW_COLUMN} IS NULL
+"""
+
+
+@contextmanager
+def _connect(autocommit: bool = False):
+    if not settings.SUPABASE_DB_URL:
+        raise SystemExit("Defina SUPABASE_DB_URL (conexão direta ao PostgreSQL do Supabase)")
+    conn = psycopg2.connect(settings.SUPABASE_DB_URL, connect_timeout=10)
+    conn.autocommit = autocommit
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _counts(cur) -> tuple:
+    cur.execute(
+        f"SELECT count(*), count({NEW_COLUMN}) FROM knowledge_base"
+    )
+    return cur.fetchone()
+
+
+def prepare(args) -> None:
+    with _connect() as conn:
+        with conn, conn.cursor() as cur:
+            cur.execute(_PREPARE_SQL)
+    print(f"Coluna {NEW_COLUMN} vector({TARGET_DIM}), trigger e match_knowledge_v2 prontos")
+
+
+def backfill(args) -> None:
+    from app.services.rag_service import get_embeddings
+
+    embeddings = get_embeddings()
+    migrated = 0
+    last_id = "00000000-0000-0000-0000-000000000000"
+    start = time.perf_counter()
+    with _connect() as conn:
+        while True:
+            with conn, conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT id::text, content FROM knowledge_base "
+                    f"WHERE {NEW_COLUMN} IS NULL AND id > %s::uuid "
+                    f"ORDER BY id LIMIT %s",
+                    (last_id, args.batch_size),
+                )
+                rows = cur.fetchall()
+            if not rows:
+                break
+
+            vectors = embeddings.embed_documents([content for _, content in rows])
+            values = [
+                (row_id, content, "[" + ",".join(f"{x:.7g}" for x in vector) + "]")
+                for (row_id, content), vector in zip(rows, vectors)
+            ]
+            with conn, conn.cursor() as cur:
+                psycopg2.extras.execute_values(cur, _BACKFILL_UPDATE, values, page_size=len(values))
+                migrated += cur.rowcount
+
+            last_id = rows[-1][0]
+            elapsed = time.perf_counter() - start
+            print(f"{migrated} linha(s) migrada(s) | {migrated / elapsed:.1f} linhas/s | último id={last_id}")
+            if args.limit and migrated >= args.limit:
+                break
+
+    print(f"Backfill concluído: {migrated} linha(s) em {time.perf_counter() - start:.1f}s")
+
+
+def index(args) -> None:
+    # CONCURRENTLY não roda dentro de transação
+    with _connect(autocommit=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+            cur.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {HNSW_INDEX} "
+                f"ON knowledge_base USING hnsw ({NEW_COLUMN} vector_cosine_ops) "
+                f"WITH (m = {args.m}, ef_construction = {args.ef_construction})"
+            )
+    print(f"Índice HNSW {HNSW_INDEX} criado")
+
+
+def _index_is_valid(cur) -> bool:
+    cur.execute(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = %s",
+        (HNSW_INDEX,),
+    )
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def switch(args) -> None:
+    with _connect() as conn:
+        with conn, conn.cursor() as cur:
+            total, migrated = _counts(cur)
+            if migrated < total and not args.force:
+                raise SystemExit(
+                    f"{total - migrated} linha(s) sem {NEW_COLUMN} — rode o backfill (ou --force)"
+                )
+            if not _index_is_valid(cur) and not args.force:
+                raise SystemExit(f"Índice {HNSW_INDEX} ausente ou inválido — rode a fase index")
+
+            # DDL transacional: a assinatura antiga some e a nova aparece no mesmo COMMIT
+            cur.execute("DROP FUNCTION IF EXISTS match_knowledge(vector(768), float, int)")
+            cur.execute(_MATCH_FUNCTION.format(name="match_knowledge"))
+            cur.execute("NOTIFY pgrst, 'reload schema'")
+    print("match_knowledge agora usa embedding_v2 vector(1536)")
+
+
+def status(args) -> None:
+    with _connect() as conn:
+        with conn, conn.cursor() as cur:
+            total, migrated = _counts(cur)
+            valid = _index_is_valid(cur)
+            cur.execute(
+                "SELECT pg_get_function_identity_arguments(p.oid) FROM pg_proc p "
+                "WHERE p.proname = 'match_knowledge'"
+            )
+            signatures = [r[0] for r in cur.fetchall()]
+    print(
+        f"Linhas: {total} | migradas: {migrated} | pendentes: {total - migrated} "
+        f"| HNSW válido: {valid} | match_knowledge({'; '.join(signatures)})"
+    )
+
+
+def cleanup(args) -> None:
+    if not args.confirm:
+        raise SystemExit("cleanup remove a coluna embedding antiga — repita com --confirm")
+    with _connect() as conn:
+        with conn, conn.cursor() as cur:
+            cur.execute("DROP INDEX IF EXISTS knowledge_base_embedding_idx")
+            cur.execute("ALTER TABLE knowledge_base DROP COLUMN IF EXISTS embedding")
+            cur.execute("DROP FUNCTION IF EXISTS match_knowledge_v2(vector(1536), float, int)")
+    print("Coluna embedding vector(768) e índice IVFFLAT removidos")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migração online dos embeddings da knowledge_base")
+    sub = parser.add_subparsers(dest="phase", required=True)
+
+    sub.add_parser("prepare").set_defaults(func=prepare)
+
+    p_backfill = sub.add_parser("backfill")
+    p_backfill.add_argument("--batch-size", type=int, default=128)
+    p_backfill.add_argument("--limit", type=int, default=0, help="parar após N linhas (0 = todas)")
+    p_backfill.set_defaults(func=backfill)
+
+    p_index = sub.add_parser("index")
+    p_index.add_argument("--m", type=int, default=16)
+    p_index.add_argument("--ef-construction", type=int, default=64)
+    p_index.add_argument("--maintenance-work-mem", default="256MB")
+    p_index.set_defaults(func=index)
+
+    p_switch = sub.add_parser("switch")
+    p_switch.add_argument("--force", action="store_true")
+    p_switch.set_defaults(func=switch)
+
+    sub.add_parser("status").set_defaults(func=status)
+
+    p_cleanup = sub.add_parser("cleanup")
+    p_cleanup.add_argument("--confirm", action="store_true")
+    p_cleanup.set_defaults(func=cleanup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
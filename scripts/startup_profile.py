@@ -0,0 +1,93 @@
+"""
+Tempo de import por módulo — onde vai o cold start.
+
+Executa um interpretador novo com `python -X importtime`, importa os módulos
+alvo e agrega o tempo próprio (self) de cada import por pacote: os de
+terceiros pelo nome de topo (langchain_openai, supabase, ...) e os do app
+por app.<camada>.<módulo>. Mostra também o tempo de cada alvo.
+
+Uso:
+    python -m scripts.startup_profile
+    python -m scripts.startup_profile --target main --target app.agents.graph --top 30
+    python -m scripts.startup_profile --warm-up   # inclui _warm_up do main (clientes e conexões)
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def _group(module: str) -> str:
+    parts = module.split(".")
+    return ".".join(parts[:3]) if parts[0] == "app" else parts[0]
+
+
+def _run(targets: List[str], warm_up: bool) -> Tuple[str, Dict[str, float]]:
+    code = [
+        "import json, time",
+        "timings = {}",
+    ]
+    for target in targets:
+        code += [
+            "start = time.perf_counter()",
+            f"__import__({target!r})",
+            f"timings[{target!r}] = time.perf_counter() - start",
+        ]
+    if warm_up:
+        code += [
+            "import main",
+            "from app.core.startup import StartupProfile",
+            "start = time.perf_counter()",
+            "main._warm_up(StartupProfile(start))",
+            "timings['main._warm_up'] = time.perf_counter() - start",
+        ]
+    code.append("print(json.dumps(timings))")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "\n".join(code)],
+        capture_output=True, text=True, env=dict(os.environ), cwd=os.getcwd(),
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr[-2000:])
+    return result.stderr, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tempo de import por módulo (cold start)")
+    parser.add_argument("--target", action="append", help="módulo a importar (repetível)")
+    parser.add_argument("--warm-up", action="store_true", help="mede também main._warm_up")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+    targets = args.target or ["main"]
+
+    stderr, timings = _run(targets, args.warm_up)
+    by_group: Dict[str, float] = defaultdict(float)
+    count: Dict[str, int] = defaultdict(int)
+    total = 0.0
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, module = int(match.group(1)), match.group(4)
+        by_group[_group(module)] += self_us / 1000
+        count[_group(module)] += 1
+        total += self_us / 1000
+
+    print(f"{'alvo':<40} {'ms':>9}")
+    for target, seconds in timings.items():
+        print(f"{target:<40} {seconds * 1000:>9.1f}")
+    print()
+    print(f"{'pacote':<40} {'ms':>9} {'%':>6} {'módulos':>8}")
+    for group, ms in sorted(by_group.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{group:<40} {ms:>9.1f} {ms / total * 100:>5.1f}% {count[group]:>8}")
+    print(f"{'total (imports)':<40} {total:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Treino do modelo local de intenção a partir da tabela messages.
+
+1. Exporta as mensagens de usuário rotuladas pelo LLM
+   (intent_source = 'llm' ou nulo — linhas anteriores à coluna). Rótulos
+   da camada "modelo" ficam de fora: o modelo não treina nas próprias
+   previsões
+2. Separa treino/validação/teste estratificados por intenção
+3. Treina a regressão softmax (app.services.intent_model) e calibra a
+   temperatura na validação
+4. Relatório contra os rótulos do LLM no teste: acurácia, precisão/recall
+   por intenção, cobertura e acurácia acima de INTENT_MODEL_MIN_CONFIDENCE,
+   calibração por faixa alta/media/baixa e latência por mensagem
+5. Salva o modelo (.npz) e o relatório (.json) lado a lado
+
+Uso:
+    python -m scripts.train_intent_model --output models/intent_model.npz
+    python -m scripts.train_intent_model --csv export.csv   # sem banco
+    python -m scripts.train_intent_model --export-csv export.csv --limit 50000
+"""
+
+import argparse
+import csv
+import json
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+from app.core.config import settings
+from app.services.intent_model import DEFAULT_DIM, calibrate, confidence_label, train
+
+_EXPORT_SQL = (
+    "SELECT content, intent FROM messages "
+    "WHERE role = 'user' AND intent IS NOT NULL "
+    "AND (intent_source = 'llm' OR intent_source IS NULL) "
+    "ORDER BY created_at DESC LIMIT %s"
+)
+
+Dataset = List[Tuple[str, str]]
+
+
+def export_rows(limit: int) -> Dataset:
+    from app.core import postgres_client
+
+    rows = postgres_client.execute_query(_EXPORT_SQL, (limit,))
+    return [(r["content"], r["intent"]) for r in rows if r["content"]]
+
+
+def read_csv(path: str) -> Dataset:
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(r["content"], r["intent"]) for r in csv.DictReader(f) if r["content"]]
+
+
+def write_csv(path: str, rows: Dataset) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["content", "intent"])
+        writer.writerows(rows)
+
+
+def split(rows: Dataset, seed: int) -> Tuple[Dataset, Dataset, Dataset]:
+    """70/15/15 estratificado por intenção."""
+    by_intent = defaultdict(list)
+    for row in rows:
+        by_intent[row[1]].append(row)
+
+    rng = random.Random(seed)
+    train_rows, val_rows, test_rows = [], [], []
+    for items in by_intent.values():
+        rng.shuffle(items)
+        n_val = n_test = max(1, int(len(items) * 0.15)) if len(items) >= 7 else 0
+        test_rows += items[:n_test]
+        val_rows += items[n_test:n_test + n_val]
+        train_rows += items[n_test + n_val:]
+    return train_rows, val_rows, test_rows
+
+
+def evaluate(model, rows: Dataset) -> dict:
+    texts = [t for t, _ in rows]
+    truth = [label for _, label in rows]
+    probabilities = model.predict_proba(texts)
+    best = probabilities.argmax(axis=1)
+    predicted = [model.labels[i] for i in best]
+    confidence = probabilities.max(axis=1)
+
+    per_intent = {}
+    for intent in sorted(set(truth) | set(model.labels)):
+        tp = sum(p == t == intent for p, t in zip(predicted, truth))
+        n_pred = predicted.count(intent)
+        n_true = truth.count(intent)
+        per_intent[intent] = {
+            "suporte": n_true,
+            "precisao": round(tp / n_pred, 4) if n_pred else None,
+            "recall": round(tp / n_true, 4) if n_true else None,
+        }
+
+    served = [
+        (p, t) for p, t, c in zip(predicted, truth, confidence)
+        if c >= settings.INTENT_MODEL_MIN_CONFIDENCE
+    ]
+    levels = defaultdict(list)
+    for p, t, c in zip(predicted, truth, confidence):
+        levels[confidence_label(float(c))].append(p == t)
+
+    latencies = []
+    for text in texts[:2000]:
+        start = time.perf_counter()
+        model.predict(text)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    latencies.sort()
+
+    return {
+        "amostras": len(rows),
+        "acuracia": round(sum(p == t for p, t in zip(predicted, truth)) / max(len(rows), 1), 4),
+        "por_intencao": per_intent,
+        "limiar_servico": settings.INTENT_MODEL_MIN_CONFIDENCE,
+        "cobertura": round(len(served) / max(len(rows), 1), 4),
+        "acuracia_servida": (
+            round(sum(p == t for p, t in served) / len(served), 4) if served else None
+        ),
+        "calibracao": {
+            level: {"amostras": len(hits), "acuracia": round(sum(hits) / len(hits), 4)}
+            for level, hits in sorted(levels.items())
+        },
+        "latencia_us": {
+            "p50": round(statistics.median(latencies), 1) if latencies else None,
+            "p99": round(latencies[int(len(latencies) * 0.99) - 1], 1) if latencies else None,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Treina o modelo local de intenção")
+    parser.add_argument("--output", default=settings.INTENT_MODEL_PATH)
+    parser.add_argument("--csv", help="treinar a partir de um CSV (content,intent) em vez do banco")
+    parser.add_argument("--export-csv", help="salvar as linhas exportadas do banco neste CSV")
+    parser.add_argument("--limit", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    parser.add_argument("--epochs", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = read_csv(args.csv) if args.csv else export_rows(args.limit)
+    if args.export_csv:
+        write_csv(args.export_csv, rows)
+    print(f"{len(rows)} mensagem(ns) rotulada(s) | {dict(Counter(i for _, i in rows))}")
+    if len(rows) < 50:
+        raise SystemExit("Dados insuficientes para treinar (mínimo 50 mensagens)")
+
+    train_rows, val_rows, test_rows = split(rows, args.seed)
+
+    start = time.perf_counter()
+    model = train([t for t, _ in train_rows], [i for _, i in train_rows], args.dim, args.epochs)
+    temperature = calibrate(model, [t for t, _ in val_rows], [i for _, i in val_rows])
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "treinado_em": datetime.now(timezone.utc).isoformat(),
+        "treino": len(train_rows),
+        "validacao": len(val_rows),
+        "dim": args.dim,
+        "epocas": args.epochs,
+        "temperatura": round(temperature, 3),
+        "tempo_treino_s": round(elapsed, 2),
+        "teste": evaluate(model, test_rows),
+    }
+    model.metadata = {k: v for k, v in report.items() if k != "teste"}
+    model.save(args.output)
+
+    report_path = args.output.rsplit(".", 1)[0] + ".json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"Modelo salvo em {args.output} | relatório em {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,15 +11,47 @@ CREATE EXTENSION IF NOT EXISTS vector;
 CREATE TABLE IF NOT EXISTS knowledge_base (
     id          UUID        PRIMARY KEY DEFAULT gen_random_uuid(),
     content     TEXT        NOT NULL,
-    embedding   vector(768),
+    embedding   vector(768),   -- legado (Gemini); removido após scripts/migrate_embeddings.py cleanup
+    embedding_v2 vector(1536), -- text-embedding-3-small (KNOWLEDGE_EMBEDDING_COLUMN)
     category    TEXT,
     metadata    JSONB,
-    created_at  TIMESTAMPTZ DEFAULT NOW()
+    content_hash TEXT,      -- sha256 do conteúdo (dedupe da ingestão em lote)
+    created_at  TIMESTAMPTZ DEFAULT NOW(),
+    updated_at  TIMESTAMPTZ DEFAULT NOW()  -- refresh incremental do índice em memória
 );
 
+-- Bancos existentes: dedupe por hash de conteúdo para upsert idempotente
+ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS content_hash TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS knowledge_base_content_hash_idx
+    ON knowledge_base (content_hash);
+
+-- Bancos existentes: coluna de 1536 dimensões (backfill via scripts/migrate_embeddings.py)
+ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS embedding_v2 vector(1536);
+
+-- updated_at acompanha qualquer UPDATE (inclusive o backfill de embedding_v2):
+-- o índice em memória da aplicação (app/services/knowledge_index.py) busca
+-- incrementalmente por keyset (updated_at, id) > última linha vista
+ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+CREATE INDEX IF NOT EXISTS knowledge_base_updated_at_idx ON knowledge_base (updated_at, id);
+
+CREATE OR REPLACE FUNCTION knowledge_base_touch_updated_at()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS knowledge_base_touch_updated_at ON knowledge_base;
+CREATE TRIGGER knowledge_base_touch_updated_at
+    BEFORE UPDATE ON knowledge_base
+    FOR EACH ROW EXECUTE FUNCTION knowledge_base_touch_updated_at();
+
 -- Função de busca semântica por similaridade coseno
 CREATE OR REPLACE FUNCTION match_knowledge(
-    query_embedding  vector(768),
+    query_embedding  vector(1536),
     match_threshold  float   DEFAULT 0.75,
     match_count      int     DEFAULT 3
 )
@@ -37,19 +69,21 @@ BEGIN
         kb.id,
         kb.content,
         kb.category,
-        1 - (kb.embedding <=> query_embedding) AS similarity
+        1 - (kb.embedding_v2 <=> query_embedding) AS similarity
     FROM knowledge_base kb
-    WHERE 1 - (kb.embedding <=> query_embedding) >= match_threshold
-    ORDER BY kb.embedding <=> query_embedding
+    WHERE kb.embedding_v2 IS NOT NULL
+      AND 1 - (kb.embedding_v2 <=> query_embedding) >= match_threshold
+    ORDER BY kb.embedding_v2 <=> query_embedding
     LIMIT match_count;
 END;
 $$;
 
--- Índice IVFFLAT para busca vetorial aproximada (ANN)
-CREATE INDEX IF NOT EXISTS knowledge_base_embedding_idx
+-- Índice HNSW para busca vetorial aproximada (ANN) — não exige dados prévios
+-- como o IVFFLAT legado (knowledge_base_embedding_idx, sobre a coluna de 768)
+CREATE INDEX IF NOT EXISTS knowledge_base_embedding_v2_hnsw_idx
     ON knowledge_base
-    USING ivfflat (embedding vector_cosine_ops)
-    WITH (lists = 100);
+    USING hnsw (embedding_v2 vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
 
 
 -- ============================================================
@@ -72,9 +106,13 @@ CREATE TABLE IF NOT EXISTS messages (
     role        TEXT        NOT NULL CHECK (role IN ('user', 'assistant')),
     content     TEXT        NOT NULL,
     intent      TEXT,
+    intent_source TEXT,     -- camada que classificou: exata | padrao | lexico | modelo | llm | fallback
     created_at  TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Bancos existentes: coluna usada para treinar o modelo local só com rótulos do LLM
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS intent_source TEXT;
+
 -- Índices para performance em consultas por número e ordenação temporal
 CREATE INDEX IF NOT EXISTS messages_phone_idx
     ON messages (phone);
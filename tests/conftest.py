@@ -0,0 +1,56 @@
+"""
+Configuração comum dos testes: variáveis obrigatórias do Settings com valores
+locais (nenhum teste fala com serviços reais) e Redis em memória (fakeredis,
+com Lua) no lugar dos clientes compartilhados.
+"""
+
+import os
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test.test.test")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("LANGCHAIN_TRACING_V2", "false")
+
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from redis.commands.core import Script
+
+from app.core import redis_client as redis_client_module
+
+
+@pytest.fixture
+def fake_redis():
+    """Servidor fakeredis novo por teste (cliente com decode_responses)."""
+    server = fakeredis.FakeServer()
+    return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+@pytest.fixture
+def bind_redis(fake_redis, monkeypatch):
+    """
+    Aponta um módulo para o fake_redis: redis_client, os scripts Lua
+    registrados (atributos *_script síncronos) e o cliente padrão de pipelined.
+    """
+    monkeypatch.setattr(redis_client_module, "redis_client", fake_redis)
+
+    def bind(module):
+        monkeypatch.setattr(module, "redis_client", fake_redis, raising=False)
+        for name, value in vars(module).copy().items():
+            if isinstance(value, Script):
+                monkeypatch.setattr(module, name, fake_redis.register_script(value.script))
+        return fake_redis
+
+    return bind
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio controlado: clock.now é o time.time() dos módulos ligados com clock.bind(módulo)."""
+    state = SimpleNamespace(now=1_000_000.0)
+    state.bind = lambda module: monkeypatch.setattr(
+        module, "time", SimpleNamespace(time=lambda: state.now, perf_counter=lambda: state.now)
+    )
+    return state
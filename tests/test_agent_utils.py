@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessageChunk, HumanMessage, SystemMessage
+
+from app.agents.nodes import agent_utils
+from app.agents.nodes.agent_utils import (
+    ainvoke_llm,
+    build_agent_messages,
+    invoke_llm,
+    set_fallback_response,
+)
+from app.core.config import settings
+from app.services import whatsapp_service
+
+
+def test_rag_context_reaches_the_prompt():
+    messages = build_agent_messages(
+        "prompt", "Ana", [], "aceita pet?", rag_context="O condomínio aceita pets de pequeno porte."
+    )
+
+    assert isinstance(messages[1], SystemMessage)
+    assert "O condomínio aceita pets de pequeno porte." in messages[1].content
+    assert messages[-1] == HumanMessage(content="aceita pet?")
+
+
+def test_without_rag_context_prompt_is_unchanged():
+    messages = build_agent_messages("prompt", "", [], "oi")
+
+    assert [m.content for m in messages] == ["prompt", "oi"]
+
+
+class _BrokenStream:
+    """LLM que entrega duas frases completas e falha no meio da terceira."""
+
+    chunks = ["Temos três opções no Centro. ", "A mais barata custa R$ 1.500,00. ", "A segu"]
+
+    def stream(self, messages):
+        yield from (AIMessageChunk(content=c) for c in self.chunks)
+        raise TimeoutError("stream caiu")
+
+    async def astream(self, messages):
+        for c in self.chunks:
+            yield AIMessageChunk(content=c)
+        raise TimeoutError("stream caiu")
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    sent = []
+    monkeypatch.setattr(settings, "STREAMING_REPLIES_ENABLED", True)
+    monkeypatch.setattr(settings, "STREAMING_MIN_CHARS", 1)
+    monkeypatch.setattr(whatsapp_service, "queue_message", lambda jid, text: sent.append(text))
+
+    async def aqueue(jid, text):
+        sent.append(text)
+
+    monkeypatch.setattr(whatsapp_service, "aqueue_message", aqueue)
+    return sent
+
+
+def _state():
+    return {"phone": "5511999", "phone_jid": "5511999@s.whatsapp.net", "message": "opções?"}
+
+
+def test_stream_failure_after_partial_send_skips_agent_fallback(outbox):
+    state = _state()
+
+    with pytest.raises(TimeoutError):
+        invoke_llm(_BrokenStream(), [], state)
+    set_fallback_response(state, "Desculpe, tive um problema técnico.")
+
+    assert outbox == [
+        "Temos três opções no Centro.",
+        "A mais barata custa R$ 1.500,00.",
+        agent_utils._INTERRUPTED_REPLY,
+    ]
+    assert state["response_streamed"] is True
+    assert state["response"] == "\n".join(outbox)
+
+
+def test_async_stream_failure_after_partial_send_skips_agent_fallback(outbox):
+    state = _state()
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(ainvoke_llm(_BrokenStream(), [], state))
+    set_fallback_response(state, "Desculpe, tive um problema técnico.")
+
+    assert outbox[-1] == agent_utils._INTERRUPTED_REPLY
+    assert state["response"] == "\n".join(outbox)
+
+
+def test_stream_failure_before_any_part_uses_agent_fallback(outbox):
+    class FailsImmediately(_BrokenStream):
+        chunks = []
+
+    state = _state()
+
+    with pytest.raises(TimeoutError):
+        invoke_llm(FailsImmediately(), [], state)
+    set_fallback_response(state, "Desculpe, tive um problema técnico.")
+
+    assert outbox == []
+    assert state["response"] == "Desculpe, tive um problema técnico."
@@ -0,0 +1,24 @@
+import asyncio
+import threading
+
+from app.core.config import settings
+from app.workers import debounce_scheduler
+
+
+def test_stop_waits_for_async_turns_in_flight(monkeypatch):
+    monkeypatch.setattr(settings, "AGENT_EXECUTION_MODE", "async")
+    monkeypatch.setattr(debounce_scheduler, "_slots", threading.BoundedSemaphore(1))
+    finished = []
+
+    async def slow_turn(phone, raw_items):
+        await asyncio.sleep(0.2)
+        finished.append(phone)
+
+    monkeypatch.setattr(debounce_scheduler, "_aprocess_buffer", slow_turn)
+    debounce_scheduler._slots.acquire()
+    debounce_scheduler._dispatch("5511", [])
+
+    debounce_scheduler.stop(timeout=5)
+
+    assert finished == ["5511"]
+    assert not debounce_scheduler._inflight
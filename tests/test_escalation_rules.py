@@ -0,0 +1,46 @@
+import pytest
+
+from app.services.escalation_rules import DEFAULT_RULES, RuleSet
+
+RULES = RuleSet(DEFAULT_RULES)
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "não, quero um humano agora",
+        "Não. Quero falar com um atendente",
+        "nem sei mais o que fazer; me passa pra um humano!",
+        "não quero robô, quero humano",
+        "não quero falar com robô, quero um atendente",
+        "isso é urgente",
+    ],
+)
+def test_escalates(message):
+    assert RULES.evaluate(message).escalate
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "não é urgente",
+        "sem reclamação, só uma dúvida",
+        "bom dia, tudo bem?",
+    ],
+)
+def test_does_not_escalate(message):
+    assert not RULES.evaluate(message).escalate
+
+
+def test_negation_window_stops_at_clause_punctuation():
+    rules = RuleSet({"negations": ["nao"], "rules": [{"pattern": "urgent*"}]})
+
+    assert rules.evaluate("não é urgente").negated == ["urgent*"]
+    assert rules.evaluate("não, é urgente").matched == ["urgent*"]
+
+
+def test_human_request_is_not_negatable():
+    evaluation = RULES.evaluate("não, quero um humano agora")
+
+    assert evaluation.matched == ["humano*"]
+    assert evaluation.negated == []
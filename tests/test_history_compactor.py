@@ -0,0 +1,80 @@
+import json
+import threading
+
+import pytest
+
+from app.services import history_compactor
+
+
+def test_count_tokens_never_blocks_on_the_tokenizer_load(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(history_compactor, "_encoding_loaded", False)
+    monkeypatch.setattr(history_compactor, "_encoding_loading", False)
+    monkeypatch.setattr(history_compactor, "load_tokenizer", lambda: release.wait(5))
+
+    # Carga "travada" (download do BPE): o turno estima por caracteres
+    assert history_compactor.count_tokens("a" * 40) == 11
+    release.set()
+
+
+def test_failed_load_falls_back_to_character_estimate(monkeypatch):
+    def broken(_model):
+        raise OSError("sem rede")
+
+    import tiktoken
+
+    monkeypatch.setattr(tiktoken, "encoding_for_model", broken)
+    monkeypatch.setattr(history_compactor, "_encoding", None)
+    monkeypatch.setattr(history_compactor, "_encoding_loaded", False)
+
+    assert history_compactor.load_tokenizer() is False
+    assert history_compactor.count_tokens("a" * 40) == 11
+
+
+def _msgs(n, start=0, ts=None):
+    msgs = [{"role": "user", "content": f"mensagem {i} " * 20} for i in range(start, start + n)]
+    if ts is not None:
+        for i, m in enumerate(msgs):
+            m["ts"] = ts + i
+    return msgs
+
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    calls = []
+    monkeypatch.setattr(history_compactor._executor, "submit", lambda *args: calls.append(args))
+    return calls
+
+
+def test_legacy_messages_get_stable_ordered_ts():
+    history = _msgs(4) + _msgs(2, start=4, ts=1.7e9)
+    window = history_compactor._with_ts([dict(m) for m in history[1:]])
+    full = history_compactor._with_ts([dict(m) for m in history])
+
+    assert [m["ts"] for m in full] == sorted(m["ts"] for m in full)
+    assert 0.0 < full[0]["ts"] < full[3]["ts"] < 1.7e9
+    # Janela menor (ex.: lrange -max_msgs) dá o mesmo ts para a mesma mensagem
+    assert [m["ts"] for m in window] == [m["ts"] for m in full[1:]]
+
+
+def test_unsummarized_older_messages_stay_in_the_prompt(scheduled):
+    history = _msgs(6) + _msgs(2, start=6, ts=1.7e9)  # conversa de antes do deploy
+
+    compact = history_compactor._compact("5511", "greeting", history, None, 100, 50, 60)
+
+    assert compact.summary is None
+    assert [m["content"] for m in compact.messages] == [m["content"] for m in history]
+    [(_, phone, agent, boundary_ts, _)] = scheduled
+    assert (phone, agent) == ("5511", "greeting")
+    assert 1.0 < boundary_ts <= 1.7e9 + 1
+
+
+def test_summarized_messages_leave_the_prompt(scheduled):
+    history = _msgs(6, ts=1.7e9)
+    raw_summary = json.dumps({"text": "resumo", "until_ts": 1.7e9 + 3})
+
+    compact = history_compactor._compact("5511", "greeting", history, raw_summary, 100, 50, 60)
+
+    assert compact.summary == "resumo"
+    assert [m["ts"] for m in compact.messages][0] > 1.7e9 + 3
+    assert len(compact.messages) < len(history)
@@ -0,0 +1,123 @@
+import pytest
+
+from app.repositories import knowledge_repo
+from app.services import knowledge_index, rag_service
+
+
+class _Table:
+    """knowledge_base em memória com a semântica de fetch_knowledge_page ((updated_at, id) > after)."""
+
+    def __init__(self):
+        self.rows = {}
+        self.served = 0
+
+    def put(self, row_id, embedding, updated_at, content="chunk"):
+        self.rows[row_id] = {
+            "id": row_id, "content": content, "category": None,
+            "embedding": embedding, "updated_at": updated_at,
+        }
+
+    def fetch(self, after=None, limit=1000):
+        rows = sorted(self.rows.values(), key=lambda r: (r["updated_at"], r["id"]))
+        if after:
+            rows = [r for r in rows if (r["updated_at"], r["id"]) > tuple(after)]
+        page = [dict(r) for r in rows[:limit]]
+        self.served += len(page)
+        return page
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = _Table()
+    monkeypatch.setattr(knowledge_repo, "fetch_knowledge_page", table.fetch)
+    monkeypatch.setattr(knowledge_index, "_snapshot", None)
+    return table
+
+
+def test_refresh_picks_up_backfilled_embeddings(table):
+    table.put("a", [1.0, 0.0], "2026-01-01T00:00:00")
+    table.put("b", None, "2026-01-01T00:00:00")  # aguardando backfill
+    knowledge_index.reload()
+    assert [r["id"] for r in knowledge_index.search([0.0, 1.0], threshold=0.5)] == []
+
+    # migrate_embeddings backfill: created_at antigo, updated_at avança
+    table.put("b", [0.0, 1.0], "2026-01-02T00:00:00")
+
+    assert knowledge_index.refresh() == 1
+    assert [r["id"] for r in knowledge_index.search([0.0, 1.0], threshold=0.5)] == ["b"]
+
+
+def test_refresh_applies_edits_and_drops_rows_waiting_for_reembedding(table):
+    table.put("a", [1.0, 0.0], "2026-01-01T00:00:00")
+    table.put("b", [0.0, 1.0], "2026-01-01T00:00:00")
+    knowledge_index.reload()
+
+    table.put("a", None, "2026-01-02T00:00:00", content="conteúdo novo")  # trigger zerou
+
+    assert knowledge_index.refresh() == 1
+    assert knowledge_index.search([1.0, 0.0], threshold=0.5) == []
+
+
+def test_refresh_without_changes_keeps_snapshot(table):
+    table.put("a", [1.0, 0.0], "2026-01-01T00:00:00")
+    knowledge_index.reload()
+    snapshot = knowledge_index._snapshot
+
+    assert knowledge_index.refresh() == 0
+    assert knowledge_index._snapshot is snapshot
+
+
+def test_refresh_does_not_reread_rows_sharing_a_timestamp(table, monkeypatch):
+    # ADD COLUMN ... DEFAULT NOW() / backfill em uma transação: todas com o mesmo updated_at
+    monkeypatch.setattr(knowledge_index, "_PAGE_SIZE", 2)
+    for row_id in "abcde":
+        table.put(row_id, [1.0, 0.0], "2026-01-01T00:00:00")
+    table.put("f", None, "2026-01-01T00:00:00")
+    knowledge_index.reload()
+    assert len(knowledge_index._snapshot.rows) == 5
+
+    table.served = 0
+    assert knowledge_index.refresh() == 0
+    assert table.served == 0
+
+    table.put("g", [0.0, 1.0], "2026-01-01T00:00:00")  # mesmo timestamp, id maior
+    assert knowledge_index.refresh() == 1
+    assert table.served == 1
+
+
+def test_initial_load_retries_after_error(table, monkeypatch):
+    table.put("a", [1.0, 0.0], "2026-01-01T00:00:00")
+    calls = []
+
+    def flaky(after=None, limit=1000):
+        calls.append(after)
+        if len(calls) == 1:
+            raise TimeoutError("supabase")
+        return table.fetch(after, limit)
+
+    monkeypatch.setattr(knowledge_repo, "fetch_knowledge_page", flaky)
+    monkeypatch.setattr(knowledge_index.settings, "KNOWLEDGE_INDEX_REFRESH_SECONDS", 0.01)
+    knowledge_index._stop.clear()
+    thread = knowledge_index.threading.Thread(target=knowledge_index._run, daemon=True)
+    thread.start()
+    try:
+        for _ in range(200):
+            if knowledge_index.is_ready():
+                break
+            knowledge_index.time.sleep(0.01)
+        assert knowledge_index.is_ready()
+    finally:
+        knowledge_index._stop.set()
+        thread.join(1)
+
+
+def test_empty_or_unloaded_index_falls_back_to_rpc(table, monkeypatch):
+    monkeypatch.setattr(rag_service.settings, "KNOWLEDGE_INDEX_ENABLED", True)
+    monkeypatch.setattr(knowledge_repo, "search_knowledge", lambda embedding: ["rpc"])
+
+    assert knowledge_index.search([1.0, 0.0]) is None
+    assert rag_service._retrieve([1.0, 0.0]) == ["rpc"]
+
+    knowledge_index.reload()  # tabela vazia
+    assert knowledge_index.is_ready()
+    assert rag_service._retrieve([1.0, 0.0]) == ["rpc"]
@@ -0,0 +1,46 @@
+import json
+
+import httpx
+import postgrest
+import pytest
+
+from app.repositories import knowledge_repo
+
+
+@pytest.fixture
+def postgrest_requests(monkeypatch):
+    """PostgREST falso: a tabela já tem o hash "dup"; ON CONFLICT DO NOTHING devolve só as novas."""
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        rows = json.loads(request.content)
+        inserted = [{"content_hash": r["content_hash"]} for r in rows if r["content_hash"] != "dup"]
+        return httpx.Response(201, json=inserted)
+
+    client = postgrest.SyncPostgrestClient("http://postgrest.local")
+    client.session = httpx.Client(
+        base_url="http://postgrest.local", transport=httpx.MockTransport(handler)
+    )
+
+    class _Supabase:
+        def table(self, name):
+            return client.from_(name)
+
+    monkeypatch.setattr(knowledge_repo, "get_supabase", lambda: _Supabase())
+    return seen
+
+
+def test_upsert_counts_only_inserted_rows(postgrest_requests):
+    rows = [
+        {"content": "novo", "embedding": [0.1], "content_hash": "new"},
+        {"content": "repetido", "embedding": [0.2], "content_hash": "dup"},
+    ]
+
+    assert knowledge_repo.upsert_knowledge_batch(rows) == 1
+
+    request = postgrest_requests[0]
+    assert request.url.params["on_conflict"] == "content_hash"
+    assert request.url.params["select"] == "content_hash"
+    assert "resolution=ignore-duplicates" in request.headers["prefer"]
+    assert "return=representation" in request.headers["prefer"]
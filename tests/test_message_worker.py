@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.models.context import MessageContext
+from app.workers import message_worker
+
+
+@pytest.fixture
+def redis(bind_redis, clock, monkeypatch):
+    monkeypatch.setattr(settings, "MESSAGE_BUFFER_SECONDS", 5)
+    clock.bind(message_worker)
+    return bind_redis(message_worker)
+
+
+def _ctx(phone: str, content: str) -> MessageContext:
+    return MessageContext(
+        phone=phone, phone_jid=f"{phone}@s.whatsapp.net", name="", content=content,
+        message_id=f"id-{content}",
+    )
+
+
+def _contents(raw_items: list) -> list:
+    return [json.loads(item)["content"] for item in raw_items]
+
+
+def test_later_message_pushes_the_deadline_back(redis, clock):
+    message_worker.enqueue_message(_ctx("5511", "oi"))
+    clock.now += 3
+    message_worker.enqueue_message(_ctx("5511", "tudo bem?"))
+
+    # Prazo da primeira mensagem venceu, mas a segunda empurrou o debounce
+    clock.now += 2.5
+    assert message_worker.claim_due_buffers(10) == []
+
+    clock.now += 2.5
+    [(phone, raw_items)] = message_worker.claim_due_buffers(10)
+    assert phone == "5511"
+    assert _contents(raw_items) == ["oi", "tudo bem?"]
+
+
+def test_batch_enqueue_is_one_call_per_webhook(redis):
+    message_worker.enqueue_messages([_ctx("5511", "a"), _ctx("5522", "b"), _ctx("5511", "c")])
+
+    assert redis.llen("buffer:5511") == 2
+    assert redis.llen("buffer:5522") == 1
+    assert redis.zcard(message_worker.DUE_KEY) == 2
+
+
+def test_buffer_survives_a_late_claim(redis, clock):
+    message_worker.enqueue_message(_ctx("5511", "oi"))
+    clock.now += 3600  # consumidor parado/saturado muito além do debounce
+
+    assert redis.ttl("buffer:5511") == -1
+    [(_, raw_items)] = message_worker.claim_due_buffers(10)
+    assert _contents(raw_items) == ["oi"]
+
+
+def test_claim_of_missing_buffer_is_counted(redis):
+    key = ("debounce_buffer_missing_total", ())
+    before = message_worker.metrics.snapshot()["counters"].get(key, 0)
+
+    assert message_worker._consolidate("5511", []) is None
+    assert message_worker.metrics.snapshot()["counters"][key] == before + 1
+
+
+def test_claim_respects_limit_and_drains_atomically(redis, clock):
+    message_worker.enqueue_messages([_ctx(p, f"msg {p}") for p in ("1", "2", "3")])
+    clock.now += 10
+
+    first = message_worker.claim_due_buffers(2)
+    assert len(first) == 2
+    for phone, raw_items in first:
+        assert _contents(raw_items) == [f"msg {phone}"]
+        assert not redis.exists(f"buffer:{phone}")
+    assert redis.zcard(message_worker.DUE_KEY) == 1
+
+    # Outro consumidor não vê de novo os números já reivindicados
+    [(phone, _)] = message_worker.claim_due_buffers(2)
+    assert phone not in {p for p, _ in first}
+    assert message_worker.claim_due_buffers(2) == []
+
+
+def test_message_after_claim_starts_a_new_buffer(redis, clock):
+    message_worker.enqueue_message(_ctx("5511", "oi"))
+    clock.now += 10
+    message_worker.claim_due_buffers(10)
+
+    message_worker.enqueue_message(_ctx("5511", "ainda aí?"))
+    clock.now += 10
+    [(_, raw_items)] = message_worker.claim_due_buffers(10)
+    assert _contents(raw_items) == ["ainda aí?"]
@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.workers import outbound_worker as ow
+
+JID = "5511@s.whatsapp.net"
+
+
+@pytest.fixture
+def redis(bind_redis, clock, monkeypatch):
+    monkeypatch.setattr(settings, "OUTBOUND_RATE_PER_SECOND", 100.0)
+    monkeypatch.setattr(settings, "OUTBOUND_BURST", 100)
+    monkeypatch.setattr(settings, "OUTBOUND_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "OUTBOUND_VISIBILITY_TIMEOUT_SECONDS", 60)
+    monkeypatch.setattr(ow, "start", lambda: None)
+    monkeypatch.setattr(ow, "_retry_delay", lambda attempts: 5.0)
+    clock.bind(ow)
+    return bind_redis(ow)
+
+
+@pytest.fixture
+def evolution(monkeypatch):
+    """Evolution API falsa: responde conforme evolution.up e registra os envios."""
+    class _Evolution:
+        up = True
+        sent = []
+
+    api = _Evolution()
+
+    def send_message(jid, text, max_attempts=1):
+        if api.up:
+            api.sent.append(text)
+        return api.up
+
+    monkeypatch.setattr(ow.whatsapp_service, "send_message", send_message)
+    return api
+
+
+def _deliver_next():
+    claimed, _ = ow._claim()
+    assert claimed is not None
+    ow._deliver(*claimed)
+    return claimed
+
+
+def test_one_message_in_flight_per_number_and_order_kept(redis, evolution):
+    ow.enqueue(JID, "primeira")
+    ow.enqueue(JID, "segunda")
+
+    claimed, _ = ow._claim()
+    # A segunda só é liberada após o ack da primeira
+    assert ow._claim()[0] is None
+
+    ow._deliver(*claimed)
+    _deliver_next()
+    assert evolution.sent == ["primeira", "segunda"]
+    assert not redis.exists(f"outbound:queue:{ow.LANE_REPLY}|{JID}")
+    assert redis.scard(ow.SCHEDULED_KEY) == 0
+
+
+def test_escalation_lane_goes_first(redis, evolution):
+    ow.enqueue(JID, "resposta")
+    ow.enqueue("5522@s.whatsapp.net", "alerta", lane=ow.LANE_ESCALATION)
+
+    assert _deliver_next()[0] == ow.LANE_ESCALATION
+
+
+def test_failed_send_is_retried_after_backoff(redis, clock, evolution):
+    ow.enqueue(JID, "oi")
+    evolution.up = False
+    _deliver_next()
+
+    # Continua na cabeça da fila, com a tentativa contada, até o backoff vencer
+    assert ow._claim()[0] is None
+    head = json.loads(redis.lindex(f"outbound:queue:{ow.LANE_REPLY}|{JID}", 0))
+    assert head["attempts"] == 1
+
+    clock.now += 5.1
+    evolution.up = True
+    _deliver_next()
+    assert evolution.sent == ["oi"]
+    assert redis.zcard(ow.INFLIGHT_KEY) == 0
+
+
+def test_dead_letter_after_max_attempts(redis, clock, evolution):
+    ow.enqueue(JID, "oi")
+    ow.enqueue(JID, "depois")
+    evolution.up = False
+    for _ in range(settings.OUTBOUND_MAX_ATTEMPTS):
+        _deliver_next()
+        clock.now += 5.1
+
+    [dead] = [json.loads(item) for item in redis.lrange(ow.DEAD_KEY, 0, -1)]
+    assert (dead["text"], dead["attempts"], dead["phone_jid"]) == ("oi", 3, JID)
+
+    # A próxima mensagem do número segue normalmente
+    evolution.up = True
+    _deliver_next()
+    assert evolution.sent == ["depois"]
+
+
+def test_stale_ack_is_ignored(redis, clock, evolution):
+    ow.enqueue(JID, "oi")
+    lane, jid, item, deadline = ow._claim()[0]
+
+    # Prazo venceu e outro consumidor reivindicou a mensagem
+    clock.now = deadline + 1
+    reclaimed = ow._claim()[0]
+    assert reclaimed is not None
+
+    member = f"{lane}|{jid}"
+    keys = [
+        f"outbound:queue:{member}", f"outbound:ready:{lane}",
+        ow.SCHEDULED_KEY, ow.INFLIGHT_KEY, ow.DEAD_KEY,
+    ]
+    assert ow._ack_script(keys=keys, args=[member, jid, deadline]) == 0
+    assert redis.llen(f"outbound:queue:{member}") == 1
+
+
+def test_token_bucket_throttles(redis, monkeypatch, evolution):
+    monkeypatch.setattr(settings, "OUTBOUND_RATE_PER_SECOND", 2.0)
+    monkeypatch.setattr(settings, "OUTBOUND_BURST", 1)
+    ow.enqueue(JID, "a")
+    ow.enqueue("5522@s.whatsapp.net", "b")
+
+    _deliver_next()
+    claimed, wait_seconds = ow._claim()
+    assert claimed is None
+    assert wait_seconds == pytest.approx(0.5)
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.workers import persistence_worker as pw
+
+KEYS = [pw.QUEUE_KEY, pw.INFLIGHT_KEY, pw.DEADLINES_KEY]
+
+
+@pytest.fixture
+def redis(bind_redis, clock, monkeypatch):
+    monkeypatch.setattr(settings, "PERSIST_BATCH_SIZE", 10)
+    monkeypatch.setattr(settings, "PERSIST_VISIBILITY_TIMEOUT_SECONDS", 30)
+    clock.bind(pw)
+    client = bind_redis(pw)
+    rows = pw.build_turn_rows("5511", "oi", "olá", "cumprimento") + pw.build_turn_rows(
+        "5511", "preço?", "R$ 1.500,00", "qualificacao"
+    )
+    client.rpush(pw.QUEUE_KEY, *(json.dumps(r) for r in rows))
+    return client
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """_insert_rows falso: falha enquanto database.down, senão grava em database.rows."""
+    class _Database:
+        down = False
+        rows = []
+
+    db = _Database()
+
+    def insert(rows):
+        if db.down:
+            return False
+        db.rows.extend(rows)
+        return True
+
+    monkeypatch.setattr(pw, "_insert_rows", insert)
+    return db
+
+
+def test_claim_reserves_batch_with_deadline(redis, clock):
+    items = pw._claim_script(keys=KEYS, args=[3, "lote-1", clock.now + 30])
+
+    assert len(items) == 3
+    assert redis.llen(pw.QUEUE_KEY) == 1
+    assert json.loads(redis.hget(pw.INFLIGHT_KEY, "lote-1")) == items
+    assert redis.zscore(pw.DEADLINES_KEY, "lote-1") == clock.now + 30
+
+
+def test_failed_batch_is_requeued_exactly_once_after_deadline(redis, clock, database):
+    database.down = True
+    assert pw.flush() == 0
+    assert redis.llen(pw.QUEUE_KEY) == 0
+    assert redis.hlen(pw.INFLIGHT_KEY) == 1
+
+    # Antes do prazo ninguém devolve o lote
+    assert pw._requeue_script(keys=KEYS, args=[clock.now + 29]) == 0
+
+    clock.now += 31
+    assert pw._requeue_script(keys=KEYS, args=[clock.now]) == 1
+    assert pw._requeue_script(keys=KEYS, args=[clock.now]) == 0
+    assert redis.llen(pw.QUEUE_KEY) == 4
+    assert redis.hlen(pw.INFLIGHT_KEY) == 0
+    assert redis.zcard(pw.DEADLINES_KEY) == 0
+
+    database.down = False
+    assert pw.flush() == 4
+    assert [r["content"] for r in database.rows] == ["oi", "olá", "preço?", "R$ 1.500,00"]
+    assert pw.flush() == 0
+
+
+def test_successful_flush_acks_the_batch(redis, database):
+    assert pw.flush() == 4
+
+    assert redis.llen(pw.QUEUE_KEY) == 0
+    assert redis.hlen(pw.INFLIGHT_KEY) == 0
+    assert redis.zcard(pw.DEADLINES_KEY) == 0
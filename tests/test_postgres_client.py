@@ -0,0 +1,103 @@
+import gc
+
+import pytest
+
+from app.core import postgres_client
+from app.core.postgres_client import _asyncpg_sql, _to_asyncpg_sql
+
+
+def test_placeholders_are_numbered():
+    sql = "INSERT INTO t (a, b) VALUES (%s, %s)"
+
+    assert _to_asyncpg_sql(sql) == "INSERT INTO t (a, b) VALUES ($1, $2)"
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT '%%s', %s", "SELECT '%s', $1"),
+        ("SELECT * FROM t WHERE a LIKE '50%%' AND b = %s",
+         "SELECT * FROM t WHERE a LIKE '50%' AND b = $1"),
+        ("SELECT \"col%%s\" FROM t WHERE id = %s", "SELECT \"col%s\" FROM t WHERE id = $1"),
+        ("SELECT 'it''s', %s", "SELECT 'it''s', $1"),
+        ("SELECT E'a\\'b', %s", "SELECT E'a\\'b', $1"),
+        ("SELECT $$ %%s $$, %s", "SELECT $$ %s $$, $1"),
+        ("SELECT %s -- filtro %%s\n, %s", "SELECT $1 -- filtro %s\n, $2"),
+        ("SELECT a %% 2 FROM t WHERE b = %s", "SELECT a % 2 FROM t WHERE b = $1"),
+    ],
+)
+def test_literals_and_comments_are_not_rewritten(sql, expected):
+    assert _to_asyncpg_sql(sql) == expected
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT '%s' FROM t WHERE id = %s",
+        "SELECT 1 /* %s */ WHERE id = %s",
+        "SELECT * FROM t WHERE id = %(id)s",
+    ],
+)
+def test_ambiguous_placeholders_are_rejected(sql):
+    with pytest.raises(ValueError):
+        _to_asyncpg_sql(sql)
+
+
+def test_sql_without_params_is_left_alone():
+    assert _asyncpg_sql("SELECT '50%%'", None) == "SELECT '50%%'"
+
+
+def test_connection_times_do_not_outlive_the_connection():
+    class _Conn:
+        closed = 0
+
+    conn = _Conn()
+    postgres_client._conn_times[conn] = (0.0, 0.0)
+    assert conn in postgres_client._conn_times
+
+    del conn
+    gc.collect()
+    assert len(postgres_client._conn_times) == 0
+
+
+class _FakePool:
+    def __init__(self, *args, **kwargs):
+        self.closed = False
+
+    def getconn(self):
+        return _FakeConn()
+
+    def putconn(self, conn, close=False):
+        if self.closed:
+            raise postgres_client.PoolError("connection pool is closed")
+
+    def closeall(self):
+        self.closed = True
+
+
+class _FakeConn:
+    closed = 0
+    status = postgres_client.psycopg2.extensions.STATUS_READY
+
+    def close(self):
+        self.closed = 1
+
+
+def test_connection_borrowed_before_close_pool_is_released_safely(monkeypatch):
+    monkeypatch.setattr(postgres_client, "ThreadedConnectionPool", _FakePool)
+    monkeypatch.setattr(postgres_client.settings, "POSTGRES_POOL_MAX_SIZE", 1)
+    monkeypatch.setattr(postgres_client, "_pool", None)
+    monkeypatch.setattr(postgres_client, "_slots", None)
+
+    old_conn = postgres_client.get_connection()
+    postgres_client.close_pool()
+    new_conn = postgres_client.get_connection()
+
+    # Devolver a conexão antiga não mexe (nem estoura) o semáforo do pool novo
+    postgres_client.release_connection(old_conn)
+    assert old_conn.closed
+    assert not postgres_client._slots.acquire(blocking=False)
+
+    postgres_client.release_connection(new_conn)
+    assert postgres_client._slots.acquire(blocking=False)
+    postgres_client.close_pool()
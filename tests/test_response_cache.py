@@ -0,0 +1,61 @@
+import pytest
+
+from app.core.config import settings
+from app.services import response_cache
+
+PROMPT = "Você é o agente de qualificação."
+
+
+@pytest.fixture(autouse=True)
+def _cache(monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", True)
+    response_cache.invalidate()
+    yield
+    response_cache.invalidate()
+
+
+def test_exact_normalized_match_hits():
+    response_cache.store("qualificacao", PROMPT, "Aceita financiamento?", "Sim, aceitamos.")
+
+    assert response_cache.lookup("qualificacao", PROMPT, "aceita  financiamento!!") == "Sim, aceitamos."
+
+
+@pytest.mark.parametrize(
+    "stored, asked",
+    [
+        ("quanto custa o apartamento de 2 quartos?", "quanto custa o apartamento de 3 quartos?"),
+        ("aceita financiamento?", "não aceita financiamento?"),
+    ],
+)
+def test_near_but_different_questions_miss(stored, asked):
+    response_cache.store("qualificacao", PROMPT, stored, "resposta de outra pergunta")
+
+    assert response_cache.lookup("qualificacao", PROMPT, asked) is None
+
+
+def test_prompt_change_invalidates():
+    response_cache.store("qualificacao", PROMPT, "aceita financiamento?", "Sim.")
+
+    assert response_cache.lookup("qualificacao", PROMPT + " v2", "aceita financiamento?") is None
+
+
+def test_expired_entry_misses(monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_TTL_SECONDS", -1)
+    response_cache.store("qualificacao", PROMPT, "aceita financiamento?", "Sim.")
+
+    assert response_cache.lookup("qualificacao", PROMPT, "aceita financiamento?") is None
+
+
+def test_lru_capacity(monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_MAX_ENTRIES", 2)
+    for question in ("primeira", "segunda", "terceira"):
+        response_cache.store("qualificacao", PROMPT, question, question.upper())
+
+    assert response_cache.lookup("qualificacao", PROMPT, "primeira") is None
+    assert response_cache.lookup("qualificacao", PROMPT, "terceira") == "TERCEIRA"
+
+
+def test_reply_with_user_name_is_not_stored():
+    response_cache.store("qualificacao", PROMPT, "oi", "Olá, Maria!", name="Maria")
+
+    assert response_cache.lookup("qualificacao", PROMPT, "oi") is None